@@ -0,0 +1,65 @@
+﻿import re
+import numpy as np
+
+# === Agregação de candles de 1m em intervalos maiores ===
+# 5m/30m/1h/4h/1d (e intervalos personalizados como 15m ou 2h) são agregações exatas dos candles de 1m:
+# abertura do primeiro, máxima/mínima do período, fechamento do último e soma de volumes/trades.
+# Os períodos são alinhados em UTC a partir da época, como na Binance (ex.: 4h começa às 00h, 04h, 08h...).
+
+UNIDADES_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000}
+DURACAO_BASE_MS = UNIDADES_MS["m"]  # Candles de origem: 1m
+
+
+def duracao_intervalo_ms(intervalo):
+    """Duração em ms de um intervalo no formato <n><m|h|d> (ex.: '15m', '2h', '1d')."""
+    encontrado = re.fullmatch(r"(\d+)([mhd])", str(intervalo))
+    if not encontrado or int(encontrado.group(1)) <= 0:
+        raise ValueError(f"Intervalo inválido: {intervalo} (use, por exemplo, 15m, 2h ou 1d)")
+    return int(encontrado.group(1)) * UNIDADES_MS[encontrado.group(2)]
+
+
+def inicio_periodo_ms(timestamp_ms, intervalo):
+    """Início (epoch ms) do período do intervalo que contém timestamp_ms."""
+    duracao = duracao_intervalo_ms(intervalo)
+    return int(timestamp_ms) - int(timestamp_ms) % duracao
+
+
+def agregar_candles(colunas, intervalo, manter_ultimo=False):
+    """
+    Agrega candles de 1m (dict de arrays numpy ordenados por timestamp, colunas das tabelas de candles)
+    no intervalo pedido. Retorna klines (listas no formato gravado por gravar_candles).
+    Só períodos completos (todos os candles de 1m, a partir do início do período) são gerados: o 1m
+    começando no meio de um período ou com buracos não vira um candle errado. Com manter_ultimo, o último
+    período entra mesmo incompleto (é o período em andamento, regravado na próxima atualização).
+    """
+    duracao = duracao_intervalo_ms(intervalo)
+    timestamp = np.asarray(colunas["timestamp"], dtype=np.int64)
+    if len(timestamp) == 0:
+        return []
+
+    periodos = timestamp - timestamp % duracao
+    # Linhas ordenadas: cada período é um bloco contíguo, reduzido com reduceat
+    inicios = np.flatnonzero(np.r_[True, periodos[1:] != periodos[:-1]])
+    fins = np.r_[inicios[1:], len(timestamp)] - 1
+    completos = (timestamp[inicios] == periodos[inicios]) & (fins - inicios + 1 == duracao // DURACAO_BASE_MS)
+    if manter_ultimo:
+        completos[-1] = True
+
+    def somar(nome):
+        return np.add.reduceat(np.asarray(colunas[nome]), inicios)
+
+    abertura = periodos[inicios]
+    agregados = [
+        abertura,
+        np.asarray(colunas["open"])[inicios],
+        np.maximum.reduceat(np.asarray(colunas["high"]), inicios),
+        np.minimum.reduceat(np.asarray(colunas["low"]), inicios),
+        np.asarray(colunas["close"])[fins],
+        somar("volume"),
+        abertura + duracao - 1,
+        somar("quote_asset_volume"),
+        somar("number_of_trades"),
+        somar("taker_buy_base_asset_volume"),
+        somar("taker_buy_quote_asset_volume"),
+    ]
+    return [list(linha) for linha in zip(*(a[completos].tolist() for a in agregados))]
@@ -1,12 +1,11 @@
 ﻿import pandas as pd
 from backtest import backtest_bollinger
 from graficos import gerar_grafico_csv
-from db_utils import listar_pares_disponiveis, listar_intervalos_disponiveis, carregar_candles
+from db_utils import listar_pares_disponiveis, listar_intervalos_disponiveis, carregar_candles, periodo_disponivel
 from relatorio_ia import gerar_relatorio_performance
 from datetime import datetime, timedelta
 import config
 import os
-import sqlite3
 
 # === Pergunta/Atualiza configuração de bandas Bollinger ===
 def definir_bollinger_distancia(db_path):
@@ -208,12 +207,7 @@ def executar_analise(caminho_db):
         # --- BUSCA A ÚLTIMA DATA DISPONÍVEL NO BANCO ---
         default_final_dt = data_inicio_dt + timedelta(hours=24) 
         try:
-            conn_temp = sqlite3.connect(caminho_db)
-            cursor_temp = conn_temp.cursor()
-            tabela_alvo = f"candles_{simbolo.lower()}_{intervalo}"
-            cursor_temp.execute(f"SELECT MAX(timestamp) FROM {tabela_alvo}")
-            max_ts = cursor_temp.fetchone()[0]
-            conn_temp.close()
+            _, max_ts = periodo_disponivel(caminho_db, simbolo, intervalo)
 
             if max_ts:
                 default_final_dt = datetime.fromtimestamp(max_ts / 1000)
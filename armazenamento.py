@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import threading
+
+# === Pragmas aplicados a toda conexão ===
+# WAL permite leituras simultâneas enquanto a importação grava;
+# cache e mmap maiores aceleram varreduras em tabelas grandes de candles.
+# Podem ser sobrescritos pela chave "sqlite_pragmas" do app_config.json ou por configurar_pragmas().
+PRAGMAS_PADRAO = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",      # Seguro com WAL e bem mais rápido que FULL
+    "cache_size": -65536,         # Negativo = KiB (64 MB)
+    "mmap_size": 268435456,       # 256 MB
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,         # ms esperando o lock de escrita antes de 'database is locked'
+}
+
+_pragmas = None
+_conexoes = threading.local()
+
+
+class _ConexaoDaThread(sqlite3.Connection):
+    """
+    Conexão reutilizada pela thread que a abriu.
+    close() não fecha de fato: desfaz a transação pendente (mesmo efeito do close do sqlite3)
+    e devolve a conexão para a próxima chamada de conectar() nesta thread.
+    """
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+        self.row_factory = None
+
+    def fechar(self):
+        super().close()
+
+
+def configurar_pragmas(**valores):
+    """Altera pragmas para as conexões abertas a partir de agora (ex.: configurar_pragmas(cache_size=-262144))."""
+    global _pragmas
+    _pragmas = dict(obter_pragmas(), **valores)
+
+
+def obter_pragmas():
+    global _pragmas
+    if _pragmas is None:
+        from config import ler_config
+        _pragmas = dict(PRAGMAS_PADRAO, **ler_config().get("sqlite_pragmas", {}))
+    return _pragmas
+
+
+def _abrir(db_path):
+    conn = sqlite3.connect(db_path, factory=_ConexaoDaThread)
+    for nome, valor in obter_pragmas().items():
+        conn.execute(f"PRAGMA {nome}={valor}")
+    return conn
+
+
+def conectar(db_path):
+    """
+    Retorna a conexão desta thread para db_path, criando-a (com os pragmas) na primeira vez.
+    Pode ser usada como sqlite3.connect: chamar close() ao final continua correto.
+    Processos filhos (Pool do otimizador) abrem as suas próprias conexões.
+    """
+    pid = os.getpid()
+    if getattr(_conexoes, "pid", None) != pid:
+        _conexoes.pid = pid
+        _conexoes.por_banco = {}
+
+    conn = _conexoes.por_banco.get(db_path)
+    if conn is None:
+        conn = _abrir(db_path)
+        _conexoes.por_banco[db_path] = conn
+    return conn
+
+
+def fechar_conexoes(db_path=None):
+    """Fecha de fato as conexões desta thread (todas ou apenas as de db_path)."""
+    if getattr(_conexoes, "pid", None) != os.getpid():
+        return
+    for caminho in list(_conexoes.por_banco):
+        if db_path is None or caminho == db_path:
+            _conexoes.por_banco.pop(caminho).fechar()
@@ -1,12 +1,14 @@
-﻿from datetime import datetime
+﻿from datetime import datetime, timezone
 from config import interval_map
-from db_utils import listar_pares_disponiveis, importar_candles_binance
+from db_utils import listar_pares_disponiveis
+from downloader import backfill_serie
 import sqlite3
 
 def alimentar_sqlite_com_candles(db_path):
     """
     Interface para importação manual de candles da Binance.
-    Coleta parâmetros do usuário e chama db_utils.importar_candles_binance.
+    Coleta parâmetros do usuário e chama downloader.backfill_serie
+    (download em blocos paralelos; uma importação interrompida continua de onde parou).
     """
     print("\n📥 Importação Manual de Candles Históricos")
 
@@ -50,7 +52,8 @@ def alimentar_sqlite_com_candles(db_path):
     start_str = input("Formato YYYY-MM-DD HH:MM:SS (ex: 2024-01-01 00:00:00): ").strip()
     
     try:
-        datetime.strptime(start_str, "%Y-%m-%d %H:%M:%S")
+        # Datas da Binance são em UTC
+        inicio_ms = int(datetime.strptime(start_str, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp() * 1000)
     except ValueError:
         print("❌ Data inválida. Use o formato YYYY-MM-DD HH:MM:SS.")
         return
@@ -69,7 +72,7 @@ def alimentar_sqlite_com_candles(db_path):
     for symbol in symbols:
         print(f"\n📡 Iniciando importação para {symbol} em {user_choice}...")
         
-        qtd = importar_candles_binance(db_path, symbol, interval, start_str=start_str)
+        qtd = backfill_serie(db_path, symbol, interval, inicio_ms)
         
         print(f"✅ {symbol}: {qtd} candles inseridos.")
 
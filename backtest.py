@@ -1,80 +1,298 @@
 ﻿from indicadores import calcular_bollinger, enriquecer_dados_analise, adicionar_ema_tendencia
+from bisect import bisect_left
 import pandas as pd
+import numpy as np
 import os
 
-def backtest_bollinger(df, distancia_bollinger=0.5, stop_loss_perc=None, taxa_corretagem=0.0, periodo_ema=None, saldo_inicial=1000.0, arquivo_operacoes=None, usar_trailing_stop=False, sair_na_banda_superior=True, mover_alvo_com_preco=False, lucro_minimo_perc=0.0, nota_minima=0, estrategia_adaptativa=False):
+COLUNAS_LOG = ["timestamp", "acao", "preco", "lucro", "saldo", "nota_tendencia", "status_tendencia", "volume_compra", "volume_venda"]
+
+
+def preparar_dados_backtest(df, periodo_ema=None):
     """
-    Realiza backtest de Bollinger.
-    Se estrategia_adaptativa=True, ignora os parametros fixos de saida e decide baseado no RSI.
+    Calcula Bollinger, EMA (opcional), RSI, Nota e Status de Tendência.
+    Retorna o DataFrame enriquecido e o nome da coluna da EMA (ou None).
     """
-    # === Preparação dos Dados ===
     df = calcular_bollinger(df)
-    
+
     # Se houver filtro de tendência configurado para esta execução
     col_ema = None
     if periodo_ema:
         df = adicionar_ema_tendencia(df, periodo_ema)
         col_ema = f'ema_{periodo_ema}'
-        
+
     # Aqui os dados ganham RSI, Nota e Status de Tendência
     df = enriquecer_dados_analise(df)
-    
+    return df, col_ema
+
+
+def extrair_arrays_backtest(df, col_ema=None):
+    """
+    Extrai uma única vez as colunas usadas pela estratégia em arrays NumPy contíguos.
+    Evita criar uma Series por candle (df.iloc[i]) dentro do loop de simulação.
+    """
+    dados = {
+        # .array preserva o tipo original (pd.Timestamp) ao indexar um único elemento
+        "timestamp": df["timestamp"].array,
+        "close": np.ascontiguousarray(df["close"].to_numpy(dtype=np.float64)),
+        "BB_down": np.ascontiguousarray(df["BB_down"].to_numpy(dtype=np.float64)),
+        "BB_up": np.ascontiguousarray(df["BB_up"].to_numpy(dtype=np.float64)),
+        "media": np.ascontiguousarray(df["media"].to_numpy(dtype=np.float64)),
+        "nota": np.ascontiguousarray(df["nota_tendencia"].to_numpy(dtype=np.float64)),
+        "status": df["status_tendencia"].to_numpy(dtype=object),
+        "volume_compra": df["volume_compra"].to_numpy(),
+        "volume_venda": df["volume_venda"].to_numpy(),
+        "ema": None,
+    }
+    if col_ema:
+        dados["ema"] = np.ascontiguousarray(df[col_ema].to_numpy(dtype=np.float64))
+    return dados
+
+
+def simular_operacoes(dados, distancia_bollinger=0.5, stop_loss_perc=None, taxa_corretagem=0.0, saldo_inicial=1000.0, usar_trailing_stop=False, sair_na_banda_superior=True, mover_alvo_com_preco=False, lucro_minimo_perc=0.0, nota_minima=0, estrategia_adaptativa=False, inicio=1, fim=None, registrar_logs=False):
+    """
+    Máquina de estados da estratégia Bollinger sobre arrays (ver extrair_arrays_backtest).
+
+    As condições de ENTRADA não dependem da posição, então são avaliadas de forma
+    vetorizada para todos os candles; o loop só percorre candle a candle enquanto
+    há posição aberta (stop, trailing stop, alvo móvel e saídas adaptativas).
+
+    Retorna (operacoes, logs). 'logs' só é preenchido se registrar_logs=True.
+    """
+    close = dados["close"]
+    nota = dados["nota"]
+    n = len(close) if fim is None else min(fim, len(close))
+
+    margem = distancia_bollinger / 100
+    fator_stop = 1 - (stop_loss_perc / 100) if stop_loss_perc else 0
+    taxa_multiplier = taxa_corretagem / 100
+
+    # === Sinais de compra (vetorizados) ===
+    # Mesma ordem de operações do loop original para manter resultados idênticos
+    sinal_banda = close <= dados["BB_down"] * (1 + margem)
+
+    tendencia_ok = ~(nota < nota_minima)
+    # Regra Universal: Ignorar compras se RSI (Nota) for menor que 20
+    # (cobre também o filtro de segurança da estratégia adaptativa)
+    tendencia_ok &= ~(nota < 20)
+    if dados["ema"] is not None:
+        tendencia_ok &= ~(close <= dados["ema"])
+
+    # Se Adaptativo e Nota <= 40 (Queda/Fraqueza), o alvo é a MÉDIA, não a Banda Superior
+    if estrategia_adaptativa:
+        alvo_referencia = np.where(nota <= 40, dados["media"], dados["BB_up"])
+    else:
+        alvo_referencia = dados["BB_up"]
+
+    alvo_estimado = alvo_referencia * (1 - margem)
+    lucro_bruto_potencial_valor = alvo_estimado - close
+    custo_total_est = (close * taxa_multiplier) + (alvo_estimado * taxa_multiplier)
+    margem_lucro_exigida = close * (lucro_minimo_perc / 100.0)
+    valida_lucro = lucro_bruto_potencial_valor > (custo_total_est + margem_lucro_exigida)
+
+    indices_compra = np.flatnonzero(sinal_banda & tendencia_ok & valida_lucro).tolist()
+
+    # Listas Python são bem mais rápidas que arrays NumPy para acesso escalar no loop
+    precos = close.tolist()
+    notas = nota.tolist()
+    bb_up = dados["BB_up"].tolist()
+    medias = dados["media"].tolist()
+    timestamps = dados["timestamp"]
+    status = dados["status"]
+
+    operacoes = []
+    logs = []
+
+    def registrar(i, acao, preco, lucro, saldo_op):
+        operacoes.append((timestamps[i], acao, preco, lucro, saldo_op, notas[i], status[i]))
+        if registrar_logs:
+            logs.append({
+                "timestamp": timestamps[i], "acao": acao, "preco": preco,
+                "lucro": lucro, "saldo": saldo_op,
+                "volume_compra": dados["volume_compra"][i], "volume_venda": dados["volume_venda"][i],
+                "nota_tendencia": notas[i], "status_tendencia": status[i]
+            })
+
+    saldo = saldo_inicial
+    i = max(inicio, 1)
+
+    while i < n:
+        # --- Procura o próximo candle com sinal de compra ---
+        k = bisect_left(indices_compra, i)
+        if k == len(indices_compra) or indices_compra[k] >= n:
+            break
+        i = indices_compra[k]
+
+        # --- Lógica de COMPRA ---
+        preco = precos[i]
+        custo_taxa = saldo * taxa_multiplier
+        valor_para_investir = saldo - custo_taxa
+        quantidade_ativos = valor_para_investir / preco
+
+        preco_entrada = preco
+        maximo_atingido = preco
+        preco_stop = preco_entrada * fator_stop if stop_loss_perc else 0
+        preco_alvo_dinamico = float(alvo_estimado[i])
+
+        registrar(i, "COMPRA", preco, 0, valor_para_investir)
+
+        # --- Acompanhamento da posição, candle a candle ---
+        i += 1
+        while i < n:
+            preco = precos[i]
+            nota_tendencia = notas[i]
+
+            # === DEFINIÇÃO DINÂMICA DE COMPORTAMENTO ===
+            if estrategia_adaptativa:
+                # Tendência Forte: Tenta alongar o trade / Lateral ou Fraco: Garante o lucro na banda
+                usar_trailing_agora = nota_tendencia > 60
+                sair_banda_agora = not usar_trailing_agora
+            else:
+                usar_trailing_agora = usar_trailing_stop
+                sair_banda_agora = sair_na_banda_superior
+
+            # 1. Trailing Stop (Se ativo neste momento)
+            if stop_loss_perc and usar_trailing_agora:
+                novo_stop_calculado = preco * fator_stop
+                if novo_stop_calculado > preco_stop:
+                    preco_stop = novo_stop_calculado
+
+            # 2. Alvo Móvel
+            if mover_alvo_com_preco and sair_banda_agora:
+                if preco > maximo_atingido:
+                    diferenca = preco - maximo_atingido
+                    preco_alvo_dinamico += diferenca
+                    maximo_atingido = preco
+
+            # --- VERIFICAÇÃO DE SAÍDA PELO STOP ---
+            if stop_loss_perc and preco <= preco_stop:
+                valor_bruto = quantidade_ativos * preco
+                custo_taxa = valor_bruto * taxa_multiplier
+                valor_liquido = valor_bruto - custo_taxa
+
+                lucro_operacao = valor_liquido - (quantidade_ativos * preco_entrada)
+                saldo = valor_liquido
+
+                acao = "STOP LOSS" if lucro_operacao < 0 else "TRAILING STOP"
+                registrar(i, acao, preco, lucro_operacao, saldo)
+                break
+
+            # --- Lógica de VENDA (Alvo / Banda) ---
+            if sair_banda_agora:
+                # Se a nota atual indica fraqueza (<= 40), sai na MÉDIA.
+                if estrategia_adaptativa and nota_tendencia <= 40:
+                    alvo_referencia_saida = medias[i]
+                else:
+                    alvo_referencia_saida = bb_up[i]
+
+                if mover_alvo_com_preco:
+                    target_check = preco_alvo_dinamico
+                else:
+                    target_check = alvo_referencia_saida * (1 - margem)
+
+                if preco >= target_check:
+                    valor_bruto = quantidade_ativos * preco
+                    custo_taxa = valor_bruto * taxa_multiplier
+                    valor_liquido = valor_bruto - custo_taxa
+
+                    lucro_operacao = valor_liquido - (quantidade_ativos * preco_entrada)
+                    saldo = valor_liquido
+
+                    registrar(i, "VENDA", preco, lucro_operacao, saldo)
+                    break
+            i += 1
+
+        # Nenhuma compra é possível no mesmo candle de uma saída
+        i += 1
+
+    return operacoes, logs
+
+
+def preparar_pacote_indicadores(df, periodos_ema=()):
+    """
+    Calcula uma única vez os indicadores de um conjunto de candles para reuso em várias simulações.
+    Bollinger, RSI, Nota e Status não dependem dos parâmetros da estratégia; a EMA é
+    calculada uma vez por período distinto.
+
+    Retorna um dicionário com:
+        df: DataFrame enriquecido (sem colunas de EMA extras além das solicitadas)
+        dados: arrays para simular_operacoes (sem EMA)
+        emas: {periodo: array da EMA}
+    """
+    df, _ = preparar_dados_backtest(df)
+    emas = {}
+    for periodo in periodos_ema:
+        if periodo and periodo not in emas:
+            df = adicionar_ema_tendencia(df, periodo)
+            emas[periodo] = np.ascontiguousarray(df[f'ema_{periodo}'].to_numpy(dtype=np.float64))
+    return {"df": df, "dados": extrair_arrays_backtest(df), "emas": emas}
+
+
+def backtest_com_indicadores(pacote, periodo_ema=None, **parametros):
+    """
+    Executa apenas a simulação de trades sobre um pacote de preparar_pacote_indicadores.
+    Aceita os mesmos parâmetros de simular_operacoes. Retorna a lista de operações.
+    """
+    dados = dict(pacote["dados"])
+    if periodo_ema:
+        if periodo_ema not in pacote["emas"]:
+            raise KeyError(f"EMA {periodo_ema} não foi pré-calculada no pacote de indicadores.")
+        dados["ema"] = pacote["emas"][periodo_ema]
+    operacoes, _ = simular_operacoes(dados, **parametros)
+    return operacoes
+
+
+def _simular_operacoes_pandas(df, col_ema, distancia_bollinger, stop_loss_perc, taxa_corretagem, saldo_inicial, usar_trailing_stop, sair_na_banda_superior, mover_alvo_com_preco, lucro_minimo_perc, nota_minima, estrategia_adaptativa, registrar_logs):
+    """Motor original (df.iloc por candle). Mantido como referência para validação do motor NumPy."""
     operacoes = []
     logs_para_csv = []
-    
+
     posicao = None
     preco_entrada = 0
     preco_stop = 0
-    preco_alvo_dinamico = 0 
-    maximo_atingido = 0     
-    
+    preco_alvo_dinamico = 0
+    maximo_atingido = 0
+
     saldo = saldo_inicial
     quantidade_ativos = 0.0
-    
+
     margem = distancia_bollinger / 100
     fator_stop = 1 - (stop_loss_perc / 100) if stop_loss_perc else 0
-    taxa_multiplier = taxa_corretagem / 100 
-
-    # Variáveis de controle de estado da estratégia (para quando já estiver comprado)
-    modo_saida_atual = "PADRAO" # Apenas para log
+    taxa_multiplier = taxa_corretagem / 100
 
     # === Loop Único de Execução ===
     for i in range(1, len(df)):
         candle = df.iloc[i]
         preco = candle["close"]
         timestamp = candle["timestamp"]
-        
+
         # Captura dados de tendência
         nota_tendencia = candle.get("nota_tendencia", 50)
         status_tendencia = candle.get("status_tendencia", "Indefinido")
-        
+
         # === DEFINIÇÃO DINÂMICA DE COMPORTAMENTO ===
         if estrategia_adaptativa:
             # 1. Filtro de Segurança (Hard Floor)
             # Se adaptativo, nunca compra abaixo de 20 (Franca Queda)
             filtro_adaptativo_ok = (nota_tendencia >= 20)
-            
+
             # 2. Definição de Saída baseada na força atual
             if nota_tendencia > 60:
                 # Tendência Forte: Tenta alongar o trade
                 usar_trailing_agora = True
                 sair_banda_agora = False # Ignora o teto da banda para deixar subir
-                modo_log = "TREND"
             else:
                 # Mercado Lateral ou Fraco: Garante o lucro na banda (ou média)
                 usar_trailing_agora = False
                 sair_banda_agora = True
-                modo_log = "SCALP"
         else:
             # Usa os parâmetros fixos escolhidos pelo usuário
             filtro_adaptativo_ok = True
             usar_trailing_agora = usar_trailing_stop
             sair_banda_agora = sair_na_banda_superior
-            modo_log = "FIXO"
 
         acao = "N/A"
         lucro_operacao = 0
-        
+
         # --- ATUALIZAÇÃO DINÂMICA (Se comprado) ---
         if posicao == "COMPRA":
             # 1. Trailing Stop (Se ativo neste momento)
@@ -82,13 +300,13 @@ def backtest_bollinger(df, distancia_bollinger=0.5, stop_loss_perc=None, taxa_co
                 novo_stop_calculado = preco * fator_stop
                 if novo_stop_calculado > preco_stop:
                     preco_stop = novo_stop_calculado
-            
+
             # 2. Alvo Móvel
             if mover_alvo_com_preco and sair_banda_agora:
                 if preco > maximo_atingido:
                     diferenca = preco - maximo_atingido
-                    preco_alvo_dinamico += diferenca 
-                    maximo_atingido = preco            
+                    preco_alvo_dinamico += diferenca
+                    maximo_atingido = preco
 
         # --- VERIFICAÇÃO DE SAÍDA PELO STOP ---
         if posicao == "COMPRA" and stop_loss_perc:
@@ -96,44 +314,44 @@ def backtest_bollinger(df, distancia_bollinger=0.5, stop_loss_perc=None, taxa_co
                 valor_bruto = quantidade_ativos * preco
                 custo_taxa = valor_bruto * taxa_multiplier
                 valor_liquido = valor_bruto - custo_taxa
-                
-                lucro_operacao = valor_liquido - (quantidade_ativos * preco_entrada) 
+
+                lucro_operacao = valor_liquido - (quantidade_ativos * preco_entrada)
                 saldo = valor_liquido
-                
+
                 posicao = None
-                acao = "STOP LOSS" if lucro_operacao < 0 else "TRAILING STOP" 
-                
+                acao = "STOP LOSS" if lucro_operacao < 0 else "TRAILING STOP"
+
                 operacoes.append((timestamp, acao, preco, lucro_operacao, saldo, nota_tendencia, status_tendencia))
-                
-                if arquivo_operacoes:
+
+                if registrar_logs:
                     logs_para_csv.append({
-                        "timestamp": timestamp, "acao": acao, "preco": preco, 
-                        "lucro": lucro_operacao, "saldo": saldo, 
+                        "timestamp": timestamp, "acao": acao, "preco": preco,
+                        "lucro": lucro_operacao, "saldo": saldo,
                         "volume_compra": candle["volume_compra"], "volume_venda": candle["volume_venda"],
                         "nota_tendencia": nota_tendencia, "status_tendencia": status_tendencia
                     })
-                continue 
+                continue
 
         # --- Lógica de COMPRA ---
         if posicao is None and preco <= candle["BB_down"] * (1 + margem):
-            
+
             tendencia_ok = True
-            
+
             # Filtros Fixos
             if col_ema and preco <= candle[col_ema]:
                 tendencia_ok = False
-            
+
             if nota_tendencia < nota_minima:
                 tendencia_ok = False
-            
+
             # Regra Universal: Ignorar compras se RSI (Nota) for menor que 20
             if nota_tendencia < 20:
                 tendencia_ok = False
-                
+
             # Filtro Adaptativo
             if estrategia_adaptativa and not filtro_adaptativo_ok:
                 tendencia_ok = False
-            
+
             # === CÁLCULO DE POTENCIAL DE LUCRO ===
             # Se Adaptativo e Nota <= 40 (Queda/Fraqueza), o alvo é a MÉDIA, não a Banda Superior
             if estrategia_adaptativa and nota_tendencia <= 40:
@@ -142,88 +360,126 @@ def backtest_bollinger(df, distancia_bollinger=0.5, stop_loss_perc=None, taxa_co
                  alvo_referencia = candle["BB_up"]
 
             alvo_estimado = alvo_referencia * (1 - margem)
-            
+
             lucro_bruto_potencial_valor = alvo_estimado - preco
             custo_total_est = (preco * taxa_multiplier) + (alvo_estimado * taxa_multiplier)
             margem_lucro_exigida = preco * (lucro_minimo_perc / 100.0)
-            
+
             valida_lucro = lucro_bruto_potencial_valor > (custo_total_est + margem_lucro_exigida)
 
             if tendencia_ok and valida_lucro:
                 custo_taxa = saldo * taxa_multiplier
                 valor_para_investir = saldo - custo_taxa
                 quantidade_ativos = valor_para_investir / preco
-                
+
                 posicao = "COMPRA"
                 preco_entrada = preco
-                maximo_atingido = preco 
-                
+                maximo_atingido = preco
+
                 if stop_loss_perc:
                     preco_stop = preco_entrada * fator_stop
-                
+
                 preco_alvo_dinamico = alvo_estimado
 
                 acao = "COMPRA"
                 operacoes.append((timestamp, "COMPRA", preco, 0, valor_para_investir, nota_tendencia, status_tendencia))
-                
-                if arquivo_operacoes:
+
+                if registrar_logs:
                     logs_para_csv.append({
-                        "timestamp": timestamp, "acao": acao, "preco": preco, 
-                        "lucro": 0, "saldo": valor_para_investir, 
+                        "timestamp": timestamp, "acao": acao, "preco": preco,
+                        "lucro": 0, "saldo": valor_para_investir,
                         "volume_compra": candle["volume_compra"], "volume_venda": candle["volume_venda"],
                         "nota_tendencia": nota_tendencia, "status_tendencia": status_tendencia
                     })
-        
+
         # --- Lógica de VENDA (Alvo / Banda) ---
         elif sair_banda_agora and posicao == "COMPRA":
             # Se estiver no modo adaptativo de tendência (Nota > 60), sair_banda_agora será False
             # Se estiver no modo adaptativo fraco (Nota <= 60), ele entra aqui.
-            
+
             # [NOVO] Se a nota atual indica fraqueza (<= 40), sai na MÉDIA.
             # Se a nota melhorou (> 40), sai na BANDA SUPERIOR.
             if estrategia_adaptativa and nota_tendencia <= 40:
                 alvo_referencia_saida = candle["media"]
             else:
                 alvo_referencia_saida = candle["BB_up"]
-            
+
             if mover_alvo_com_preco:
                 target_check = preco_alvo_dinamico
             else:
                 target_check = alvo_referencia_saida * (1 - margem)
-            
+
             if preco >= target_check:
                 valor_bruto = quantidade_ativos * preco
                 custo_taxa = valor_bruto * taxa_multiplier
                 valor_liquido = valor_bruto - custo_taxa
-                
+
                 lucro_operacao = valor_liquido - (quantidade_ativos * preco_entrada)
                 saldo = valor_liquido
-                
+
                 posicao = None
                 acao = "VENDA"
-                
+
                 operacoes.append((timestamp, "VENDA", preco, lucro_operacao, saldo, nota_tendencia, status_tendencia))
-        
-                if arquivo_operacoes:
+
+                if registrar_logs:
                     logs_para_csv.append({
-                        "timestamp": timestamp, "acao": acao, "preco": preco, 
-                        "lucro": lucro_operacao, "saldo": saldo, 
+                        "timestamp": timestamp, "acao": acao, "preco": preco,
+                        "lucro": lucro_operacao, "saldo": saldo,
                         "volume_compra": candle["volume_compra"], "volume_venda": candle["volume_venda"],
                         "nota_tendencia": nota_tendencia, "status_tendencia": status_tendencia
                     })
 
+    return operacoes, logs_para_csv
+
+
+def salvar_log_operacoes(arquivo_operacoes, logs_para_csv):
+    """Grava o log de operações em CSV (separador ';')."""
+    if not arquivo_operacoes or not logs_para_csv:
+        return
+    pasta = os.path.dirname(arquivo_operacoes)
+    if pasta and not os.path.exists(pasta):
+        os.makedirs(pasta, exist_ok=True)
+    df_logs = pd.DataFrame(logs_para_csv)
+
+    cols_existentes = [c for c in COLUNAS_LOG if c in df_logs.columns]
+    df_logs = df_logs[cols_existentes]
+
+    df_logs.to_csv(arquivo_operacoes, index=False, sep=";", encoding="utf-8-sig")
+
+
+def backtest_bollinger(df, distancia_bollinger=0.5, stop_loss_perc=None, taxa_corretagem=0.0, periodo_ema=None, saldo_inicial=1000.0, arquivo_operacoes=None, usar_trailing_stop=False, sair_na_banda_superior=True, mover_alvo_com_preco=False, lucro_minimo_perc=0.0, nota_minima=0, estrategia_adaptativa=False, motor="numpy"):
+    """
+    Realiza backtest de Bollinger.
+    Se estrategia_adaptativa=True, ignora os parametros fixos de saida e decide baseado no RSI.
+    motor="numpy" (padrão) simula sobre arrays; motor="pandas" usa o loop original por df.iloc.
+    """
+    # === Preparação dos Dados ===
+    df, col_ema = preparar_dados_backtest(df, periodo_ema)
+
+    parametros = dict(
+        distancia_bollinger=distancia_bollinger,
+        stop_loss_perc=stop_loss_perc,
+        taxa_corretagem=taxa_corretagem,
+        saldo_inicial=saldo_inicial,
+        usar_trailing_stop=usar_trailing_stop,
+        sair_na_banda_superior=sair_na_banda_superior,
+        mover_alvo_com_preco=mover_alvo_com_preco,
+        lucro_minimo_perc=lucro_minimo_perc,
+        nota_minima=nota_minima,
+        estrategia_adaptativa=estrategia_adaptativa,
+        registrar_logs=bool(arquivo_operacoes),
+    )
+
+    if motor == "pandas":
+        operacoes, logs_para_csv = _simular_operacoes_pandas(df, col_ema, **parametros)
+    elif motor == "numpy":
+        dados = extrair_arrays_backtest(df, col_ema)
+        operacoes, logs_para_csv = simular_operacoes(dados, **parametros)
+    else:
+        raise ValueError(f"Motor de backtest desconhecido: {motor}")
+
     # === Escrita do CSV ===
-    if arquivo_operacoes and logs_para_csv:
-        pasta = os.path.dirname(arquivo_operacoes)
-        if pasta and not os.path.exists(pasta):
-            os.makedirs(pasta, exist_ok=True)
-        df_logs = pd.DataFrame(logs_para_csv)
-        
-        colunas_ordem = ["timestamp", "acao", "preco", "lucro", "saldo", "nota_tendencia", "status_tendencia", "volume_compra", "volume_venda"]
-        
-        cols_existentes = [c for c in colunas_ordem if c in df_logs.columns]
-        df_logs = df_logs[cols_existentes]
-        
-        df_logs.to_csv(arquivo_operacoes, index=False, sep=";", encoding="utf-8-sig")
-
-    return df, operacoes
\ No newline at end of file
+    salvar_log_operacoes(arquivo_operacoes, logs_para_csv)
+
+    return df, operacoes
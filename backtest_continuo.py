@@ -0,0 +1,318 @@
+﻿from indicadores import BollingerIncremental, EMAIncremental, RSIIncremental, nota_e_status
+from db_utils import listar_pares_e_periodos, carregar_candles
+from datetime import datetime
+import pandas as pd
+import config
+import json
+from armazenamento import conectar
+from agregacao import duracao_intervalo_ms
+import time
+
+# Comportamento da estratégia no backtest contínuo (Distância, Stop e Taxa vêm da configuração salva)
+PARAMETROS_CONTINUO = {
+    "periodo_ema": None,
+    "saldo_inicial": 1000.0,
+    "usar_trailing_stop": False,
+    "sair_na_banda_superior": True,
+    "mover_alvo_com_preco": False,
+    "lucro_minimo_perc": 0.0,
+    "nota_minima": 0,
+    "estrategia_adaptativa": False,
+}
+
+def inicializar_tabela_backtest_continuo(db_path):
+    """Cria as tabelas do estado salvo e das operações do backtest contínuo."""
+    conn = conectar(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS backtest_continuo (
+            simbolo TEXT,
+            intervalo TEXT,
+            parametros TEXT,
+            estado TEXT,
+            ultimo_timestamp TEXT,
+            total_candles INTEGER,
+            saldo REAL,
+            atualizado_em TEXT,
+            PRIMARY KEY (simbolo, intervalo)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS backtest_continuo_operacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            simbolo TEXT,
+            intervalo TEXT,
+            timestamp TEXT,
+            acao TEXT,
+            preco REAL,
+            lucro REAL,
+            saldo REAL,
+            nota_tendencia REAL,
+            status_tendencia TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_continuo_operacoes ON backtest_continuo_operacoes (simbolo, intervalo)")
+    conn.commit()
+    conn.close()
+
+def parametros_backtest_continuo(db_path):
+    """Parâmetros atuais da estratégia: configuração salva + PARAMETROS_CONTINUO."""
+    parametros = dict(PARAMETROS_CONTINUO)
+    parametros["distancia_bollinger"] = config.obter_bollinger_distancia(db_path)
+    parametros["stop_loss_perc"] = config.obter_stop_loss(db_path)
+    parametros["taxa_corretagem"] = config.obter_taxa_corretagem(db_path)
+    return parametros
+
+def novo_estado_backtest(parametros):
+    """Estado inicial (nenhum candle processado, sem posição)."""
+    return {
+        "parametros": dict(parametros),
+        "candles": 0,
+        "saldo": parametros["saldo_inicial"],
+        "posicao": None,
+        "ultimo_timestamp": None,
+        "bollinger": BollingerIncremental().para_dict(),
+        "ema": EMAIncremental(parametros["periodo_ema"]).para_dict() if parametros["periodo_ema"] else None,
+        "rsi": RSIIncremental().para_dict(),
+    }
+
+def simular_candles(estado, candles):
+    """
+    Versão orientada a eventos de backtest.simular_operacoes: consome os candles
+    (iterável de (timestamp, close)) um a um, atualizando indicadores e posição.
+    O estado é atualizado no lugar e pode ser salvo a qualquer momento, então
+    continuar a partir dele produz as mesmas operações de uma simulação completa.
+
+    Retorna a lista de operações geradas, no mesmo formato de simular_operacoes.
+    """
+    p = estado["parametros"]
+    margem = p["distancia_bollinger"] / 100
+    stop_loss_perc = p["stop_loss_perc"]
+    fator_stop = 1 - (stop_loss_perc / 100) if stop_loss_perc else 0
+    taxa_multiplier = p["taxa_corretagem"] / 100
+    estrategia_adaptativa = p["estrategia_adaptativa"]
+    mover_alvo_com_preco = p["mover_alvo_com_preco"]
+
+    bollinger = BollingerIncremental.de_dict(estado["bollinger"])
+    ema = EMAIncremental.de_dict(estado["ema"]) if estado["ema"] else None
+    rsi = RSIIncremental.de_dict(estado["rsi"])
+
+    posicao = estado["posicao"]
+    saldo = estado["saldo"]
+    i = estado["candles"]
+    operacoes = []
+
+    def registrar(timestamp, acao, preco, lucro, saldo_op, nota_tendencia):
+        _, status = nota_e_status(nota_tendencia)
+        operacoes.append((timestamp, acao, preco, lucro, saldo_op, nota_tendencia, status))
+
+    for timestamp, preco in candles:
+        preco = float(preco)
+        bandas = bollinger.atualizar(preco)
+        valor_ema = ema.atualizar(preco) if ema else None
+        nota_tendencia, _ = nota_e_status(rsi.atualizar(preco))
+
+        if posicao is not None:
+            # === DEFINIÇÃO DINÂMICA DE COMPORTAMENTO ===
+            if estrategia_adaptativa:
+                usar_trailing_agora = nota_tendencia > 60
+                sair_banda_agora = not usar_trailing_agora
+            else:
+                usar_trailing_agora = p["usar_trailing_stop"]
+                sair_banda_agora = p["sair_na_banda_superior"]
+
+            # 1. Trailing Stop
+            if stop_loss_perc and usar_trailing_agora:
+                novo_stop_calculado = preco * fator_stop
+                if novo_stop_calculado > posicao["preco_stop"]:
+                    posicao["preco_stop"] = novo_stop_calculado
+
+            # 2. Alvo Móvel
+            if mover_alvo_com_preco and sair_banda_agora:
+                if preco > posicao["maximo_atingido"]:
+                    diferenca = preco - posicao["maximo_atingido"]
+                    posicao["preco_alvo_dinamico"] += diferenca
+                    posicao["maximo_atingido"] = preco
+
+            acao = None
+            if stop_loss_perc and preco <= posicao["preco_stop"]:
+                acao = "STOP"
+            elif sair_banda_agora:
+                if estrategia_adaptativa and nota_tendencia <= 40:
+                    alvo_referencia_saida = bandas["media"]
+                else:
+                    alvo_referencia_saida = bandas["BB_up"]
+
+                if mover_alvo_com_preco:
+                    target_check = posicao["preco_alvo_dinamico"]
+                else:
+                    target_check = alvo_referencia_saida * (1 - margem)
+
+                if preco >= target_check:
+                    acao = "VENDA"
+
+            if acao:
+                quantidade_ativos = posicao["quantidade"]
+                valor_bruto = quantidade_ativos * preco
+                custo_taxa = valor_bruto * taxa_multiplier
+                valor_liquido = valor_bruto - custo_taxa
+
+                lucro_operacao = valor_liquido - (quantidade_ativos * posicao["preco_entrada"])
+                saldo = valor_liquido
+                if acao == "STOP":
+                    acao = "STOP LOSS" if lucro_operacao < 0 else "TRAILING STOP"
+                registrar(timestamp, acao, preco, lucro_operacao, saldo, nota_tendencia)
+                posicao = None
+
+        # O primeiro candle nunca gera compra (como em simular_operacoes)
+        elif i >= 1:
+            sinal_banda = preco <= bandas["BB_down"] * (1 + margem)
+            tendencia_ok = not (nota_tendencia < p["nota_minima"]) and not (nota_tendencia < 20)
+            if valor_ema is not None:
+                tendencia_ok = tendencia_ok and not (preco <= valor_ema)
+
+            if sinal_banda and tendencia_ok:
+                if estrategia_adaptativa and nota_tendencia <= 40:
+                    alvo_referencia = bandas["media"]
+                else:
+                    alvo_referencia = bandas["BB_up"]
+                alvo_estimado = alvo_referencia * (1 - margem)
+                custo_total_est = (preco * taxa_multiplier) + (alvo_estimado * taxa_multiplier)
+                margem_lucro_exigida = preco * (p["lucro_minimo_perc"] / 100.0)
+
+                if alvo_estimado - preco > (custo_total_est + margem_lucro_exigida):
+                    custo_taxa = saldo * taxa_multiplier
+                    valor_para_investir = saldo - custo_taxa
+                    posicao = {
+                        "quantidade": valor_para_investir / preco,
+                        "preco_entrada": preco,
+                        "maximo_atingido": preco,
+                        "preco_stop": preco * fator_stop if stop_loss_perc else 0,
+                        "preco_alvo_dinamico": alvo_estimado,
+                    }
+                    registrar(timestamp, "COMPRA", preco, 0, valor_para_investir, nota_tendencia)
+
+        i += 1
+        estado["ultimo_timestamp"] = str(timestamp)
+
+    estado["candles"] = i
+    estado["saldo"] = saldo
+    estado["posicao"] = posicao
+    estado["bollinger"] = bollinger.para_dict()
+    estado["ema"] = ema.para_dict() if ema else None
+    estado["rsi"] = rsi.para_dict()
+    return operacoes
+
+def carregar_estado_backtest(db_path, simbolo, intervalo):
+    """Retorna o estado salvo do par/intervalo ou None."""
+    inicializar_tabela_backtest_continuo(db_path)
+    conn = conectar(db_path)
+    row = conn.execute(
+        "SELECT estado FROM backtest_continuo WHERE simbolo=? AND intervalo=?", (simbolo, intervalo)
+    ).fetchone()
+    conn.close()
+    return json.loads(row[0]) if row else None
+
+def atualizar_backtest_continuo(db_path, simbolo, intervalo, parametros=None):
+    """
+    Simula apenas os candles posteriores ao último processado e salva o novo estado.
+    Se os parâmetros da estratégia mudaram, o histórico é refeito do início.
+    Retorna (novos_candles, novas_operacoes, estado).
+    """
+    parametros = parametros or parametros_backtest_continuo(db_path)
+    estado = carregar_estado_backtest(db_path, simbolo, intervalo)
+    reiniciar = estado is None or estado["parametros"] != parametros
+    if reiniciar:
+        estado = novo_estado_backtest(parametros)
+
+    data_inicio = estado["ultimo_timestamp"] or "1970-01-01 00:00:00"
+    df = carregar_candles(db_path, simbolo, intervalo, data_inicio, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    if not df.empty and estado["ultimo_timestamp"]:
+        df = df[df["timestamp"] > pd.Timestamp(estado["ultimo_timestamp"])]
+    # Só candles fechados: o último candle gravado pode estar aberto e ainda mudar na próxima importação
+    if not df.empty:
+        ultima_abertura_fechada = pd.Timestamp(int(time.time() * 1000) - duracao_intervalo_ms(intervalo), unit="ms")
+        df = df[df["timestamp"] <= ultima_abertura_fechada]
+
+    operacoes = simular_candles(estado, zip(df["timestamp"], df["close"])) if not df.empty else []
+
+    conn = conectar(db_path)
+    if reiniciar:
+        conn.execute("DELETE FROM backtest_continuo_operacoes WHERE simbolo=? AND intervalo=?", (simbolo, intervalo))
+    conn.executemany("""
+        INSERT INTO backtest_continuo_operacoes (
+            simbolo, intervalo, timestamp, acao, preco, lucro, saldo, nota_tendencia, status_tendencia
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(simbolo, intervalo, str(op[0]), *op[1:]) for op in operacoes])
+    conn.execute("""
+        INSERT OR REPLACE INTO backtest_continuo (
+            simbolo, intervalo, parametros, estado, ultimo_timestamp, total_candles, saldo, atualizado_em
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        simbolo, intervalo, json.dumps(parametros), json.dumps(estado),
+        estado["ultimo_timestamp"], estado["candles"], estado["saldo"],
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    ))
+    conn.commit()
+    conn.close()
+    return len(df), len(operacoes), estado
+
+def invalidar_backtest_continuo(db_path, simbolo, intervalo, desde_ms):
+    """
+    Descarta o estado salvo (e as operações) se candles a partir de desde_ms já simulados foram
+    regravados (restauração de backup, reparo de lacunas, backfill): a próxima atualização refaz do início.
+    """
+    estado = carregar_estado_backtest(db_path, simbolo.upper(), intervalo)
+    if estado is None or not estado["ultimo_timestamp"]:
+        return False
+    if int(pd.Timestamp(estado["ultimo_timestamp"]).value // 1_000_000) < desde_ms:
+        return False
+    conn = conectar(db_path)
+    conn.execute("DELETE FROM backtest_continuo WHERE simbolo=? AND intervalo=?", (simbolo.upper(), intervalo))
+    conn.execute("DELETE FROM backtest_continuo_operacoes WHERE simbolo=? AND intervalo=?", (simbolo.upper(), intervalo))
+    conn.commit()
+    conn.close()
+    return True
+
+def atualizar_backtests_continuos(db_path, simbolo=None):
+    """Atualiza o backtest contínuo de todos os intervalos (de um par ou de todos)."""
+    parametros = parametros_backtest_continuo(db_path)
+    pares = listar_pares_e_periodos(db_path)
+    if simbolo:
+        pares = {simbolo.upper(): pares.get(simbolo.upper(), [])}
+
+    start_time = time.time()
+    for par, periodos in pares.items():
+        for periodo in periodos:
+            novos, ops, _ = atualizar_backtest_continuo(db_path, par, periodo, parametros)
+            if novos:
+                print(f"📈 Backtest contínuo {par} ({periodo}): {novos} candles simulados, {ops} novas operações.")
+    print(f"⏱️  Backtests contínuos atualizados em {time.time() - start_time:.2f} segundos.")
+
+def exibir_backtests_continuos(db_path):
+    print("\n📈 === BACKTEST CONTÍNUO (ESTADO ATUAL POR PAR) ===")
+    atualizar_backtests_continuos(db_path)
+
+    conn = conectar(db_path)
+    linhas = conn.execute("""
+        SELECT b.simbolo, b.intervalo, b.ultimo_timestamp, b.total_candles, b.saldo, b.estado,
+               (SELECT COUNT(*) FROM backtest_continuo_operacoes o
+                WHERE o.simbolo = b.simbolo AND o.intervalo = b.intervalo AND o.acao != 'COMPRA')
+        FROM backtest_continuo b
+        ORDER BY b.simbolo, b.intervalo
+    """).fetchall()
+    conn.close()
+
+    if not linhas:
+        print("⚠️ Nenhum backtest contínuo disponível.")
+        input("\nPressione Enter para voltar ao menu...")
+        return
+
+    print(f"\n{'Par':<12} | {'Int':<4} | {'Último Candle':<19} | {'Candles':<8} | {'Trades':<6} | {'Saldo($)':<10} | {'Posição':<10}")
+    print("-" * 90)
+    for simbolo, intervalo, ultimo, total, saldo, estado, trades in linhas:
+        posicao = json.loads(estado)["posicao"]
+        situacao = f"@ {posicao['preco_entrada']:.4f}" if posicao else "-"
+        print(f"{simbolo:<12} | {intervalo:<4} | {ultimo or '-':<19} | {total:<8} | {trades:<6} | {saldo:<10.2f} | {situacao:<10}")
+
+    input("\nPressione Enter para voltar ao menu...")
@@ -0,0 +1,168 @@
+﻿import multiprocessing as mp
+from backtest import preparar_pacote_indicadores
+from db_utils import listar_pares_e_periodos, carregar_candles
+from otimizador import avaliar_combinacao, barras_aquecimento_indicadores, combinacoes_da_grade, perguntar_workers
+from backtest_continuo import parametros_backtest_continuo
+from datetime import datetime
+import signal
+from armazenamento import conectar
+import time
+
+# Grade reduzida para rodar em todos os pares sem explodir o tempo de execução
+GRADE_LOTE = {
+    "distancias": [0.0, 1.0, 2.0],
+    "stops": [1.0, 2.0],
+    "notas": [20, 40],
+    "emas": [90],
+    "lucros": [0.1],
+}
+
+def inicializar_tabela_lote(db_path):
+    """Cria a tabela consolidada dos backtests em lote."""
+    conn = conectar(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS resultados_lote (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data_execucao TEXT,
+            simbolo TEXT,
+            intervalo TEXT,
+            total_candles INTEGER,
+            distancia_banda REAL,
+            stop_loss REAL,
+            nota_minima INTEGER,
+            ema_periodo INTEGER,
+            lucro_minimo REAL,
+            lucro_liquido REAL,
+            win_rate REAL,
+            total_trades INTEGER,
+            profit_factor REAL
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+def _inicializar_worker_lote():
+    # Ctrl+C é tratado apenas pelo processo principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def backtest_tabela(tarefa):
+    """
+    Carrega UM par/intervalo, calcula os indicadores uma vez e avalia todas as combinações.
+    parametros_fixos: taxa, saldo e flags da estratégia (None = PARAMETROS_FIXOS do otimizador).
+    Retorna (simbolo, intervalo, total_candles, resultados).
+    """
+    db_path, simbolo, intervalo, data_inicio, data_fim, combinacoes, parametros_fixos = tarefa
+    periodos_ema = sorted({int(c[3]) for c in combinacoes if c[3]})
+    # Indicadores aquecidos antes de data_inicio, como no otimizador e no walk-forward
+    df = carregar_candles(
+        db_path, simbolo, intervalo, data_inicio, data_fim,
+        barras_aquecimento=barras_aquecimento_indicadores(periodos_ema)
+    )
+    aquecimento = df.attrs.get("barras_aquecimento", 0)
+    if len(df) <= aquecimento:
+        return simbolo, intervalo, 0, []
+
+    pacote = preparar_pacote_indicadores(df, periodos_ema=periodos_ema)
+    inicio = max(1, aquecimento)
+    resultados = [avaliar_combinacao(pacote, c, inicio=inicio, parametros_fixos=parametros_fixos) for c in combinacoes]
+    return simbolo, intervalo, len(df) - aquecimento, resultados
+
+def executar_backtest_lote(db_path):
+    print("\n📦 === BACKTEST EM LOTE (TODOS OS PARES E INTERVALOS) ===")
+
+    pares = listar_pares_e_periodos(db_path)
+    tabelas = [(par, periodo) for par, periodos in pares.items() for periodo in periodos]
+    if not tabelas:
+        print("⚠️ Nenhuma tabela de candles encontrada.")
+        return
+    print(f"📊 {len(pares)} pares | {len(tabelas)} tabelas de candles.")
+
+    # === Parâmetros ===
+    print("\n⚙️  Parâmetros do lote:")
+    print("1 - Configuração atual da estratégia (Distância, Stop, Taxa e comportamento do backtest contínuo)")
+    print(f"2 - Grade reduzida ({len(combinacoes_da_grade(GRADE_LOTE))} combinações por tabela)")
+    escolha = input("Opção (Enter = 1): ").strip()
+
+    if escolha == "2":
+        combinacoes = combinacoes_da_grade(GRADE_LOTE)
+        parametros_fixos = None
+    else:
+        # Mesmos parâmetros da estratégia configurada (inclusive taxa e flags), não os fixos da grade
+        parametros = parametros_backtest_continuo(db_path)
+        combinacoes = [(
+            parametros["distancia_bollinger"],
+            parametros["stop_loss_perc"],
+            parametros["nota_minima"],
+            parametros["periodo_ema"],
+            parametros["lucro_minimo_perc"]
+        )]
+        parametros_fixos = {
+            chave: parametros[chave]
+            for chave in ("taxa_corretagem", "saldo_inicial", "usar_trailing_stop",
+                          "sair_na_banda_superior", "mover_alvo_com_preco", "estrategia_adaptativa")
+        }
+
+    data_inicio = input("Data Inicial (YYYY-MM-DD HH:MM:SS) ou Enter para todo o histórico: ").strip() or "1970-01-01 00:00:00"
+    data_fim = input("Data Final (YYYY-MM-DD HH:MM:SS) ou Enter para Hoje: ").strip() or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    n_workers = perguntar_workers()
+
+    # === Execução paralela: uma tarefa por tabela ===
+    tarefas = [(db_path, par, periodo, data_inicio, data_fim, combinacoes, parametros_fixos) for par, periodo in tabelas]
+    data_execucao = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    registros = []
+    start_time = time.time()
+
+    def consolidar(simbolo, intervalo, total_candles, resultados):
+        for dist, stop, nota, ema, lucro_min, lucro, win_rate, total_trades, profit_factor in resultados:
+            registros.append((
+                data_execucao, simbolo, intervalo, total_candles,
+                float(dist), stop, nota, int(ema) if ema else None, lucro_min,
+                lucro, win_rate, total_trades, profit_factor
+            ))
+        print(f"✅ {simbolo} ({intervalo}): {total_candles} candles, {len(resultados)} simulações.")
+
+    print(f"\n▶️  Iniciando {len(tarefas)} tabelas em {min(n_workers, len(tarefas))} processos...")
+    if n_workers <= 1 or len(tarefas) < 2:
+        for tarefa in tarefas:
+            consolidar(*backtest_tabela(tarefa))
+    else:
+        with mp.Pool(min(n_workers, len(tarefas)), initializer=_inicializar_worker_lote) as pool:
+            # Tabelas têm tamanhos muito diferentes: consome na ordem em que terminam
+            for resultado in pool.imap_unordered(backtest_tabela, tarefas):
+                consolidar(*resultado)
+
+    # === Tabela consolidada ===
+    inicializar_tabela_lote(db_path)
+    if registros:
+        conn = conectar(db_path)
+        conn.executemany("""
+            INSERT INTO resultados_lote (
+                data_execucao, simbolo, intervalo, total_candles,
+                distancia_banda, stop_loss, nota_minima, ema_periodo, lucro_minimo,
+                lucro_liquido, win_rate, total_trades, profit_factor
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, sorted(registros, key=lambda r: (r[1], r[2])))
+        conn.commit()
+        conn.close()
+
+    tempo_total = time.time() - start_time
+    print(f"\n✅ Lote finalizado em {tempo_total:.2f} segundos.")
+    print(f"💾 {len(registros)} resultados salvos na tabela 'resultados_lote' (execução {data_execucao}).")
+
+    # === Melhor resultado por tabela ===
+    melhores = {}
+    for r in registros:
+        chave = (r[1], r[2])
+        if r[11] > 0 and (chave not in melhores or r[9] > melhores[chave][9]):
+            melhores[chave] = r
+
+    if melhores:
+        print(f"\n{'Par':<12} | {'Int':<4} | {'Dist':<5} | {'Stop':<4} | {'Nota':<4} | {'EMA':<4} | {'Lucro($)':<10} | {'Win%':<6} | {'Trades':<6}")
+        print("-" * 80)
+        for r in sorted(melhores.values(), key=lambda r: r[9], reverse=True):
+            ema = r[7] if r[7] else "-"
+            print(f"{r[1]:<12} | {r[2]:<4} | {r[4]:<5} | {r[5]:<4} | {r[6]:<4} | {ema:<4} | {r[9]:<10.2f} | {r[10]:<6.1f} | {r[11]:<6}")
+
+    input("\nPressione Enter para voltar ao menu...")
@@ -0,0 +1,228 @@
+﻿import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from armazenamento import conectar, fechar_conexoes
+from db_utils import carregar_candles, inicializar_catalogo, recalcular_catalogo, importar_candles_binance
+from fontes import FonteSintetica
+from indicadores import calcular_bollinger, adicionar_ema_tendencia, calcular_rsi, enriquecer_dados_analise
+from backtest import backtest_bollinger, preparar_pacote_indicadores
+from otimizador import GRADE_PADRAO, combinacoes_da_grade, executar_grade
+from exportar_json import exportar_candles_para_json_txt
+
+# Duração de cada intervalo em milissegundos
+DURACAO_INTERVALO_MS = {
+    "1m": 60_000,
+    "5m": 300_000,
+    "30m": 1_800_000,
+    "1h": 3_600_000,
+    "4h": 14_400_000,
+    "1d": 86_400_000,
+}
+
+TAMANHOS_PADRAO = [10_000, 100_000, 1_000_000]
+
+def gerar_candles_sinteticos(n, intervalo="1m", seed=42, inicio="2020-01-01 00:00:00", preco_inicial=30000.0, volatilidade=0.002):
+    """
+    Gera n candles OHLCV determinísticos (mesma seed = mesmos candles) no formato da Binance.
+    O preço segue um passeio aleatório geométrico; máxima/mínima envolvem abertura e fechamento.
+    Retorna um DataFrame com as colunas das tabelas candles_<par>_<intervalo>.
+    """
+    rng = np.random.default_rng(seed)
+    passo = DURACAO_INTERVALO_MS[intervalo]
+    t0 = int(pd.Timestamp(inicio).value // 1_000_000)
+
+    timestamp = t0 + np.arange(n, dtype=np.int64) * passo
+    close = preco_inicial * np.exp(np.cumsum(rng.normal(0.0, volatilidade, n)))
+    open_ = np.empty(n)
+    open_[0] = preco_inicial
+    open_[1:] = close[:-1]
+    pavio = np.abs(rng.normal(0.0, volatilidade / 2, (2, n)))
+    high = np.maximum(open_, close) * (1 + pavio[0])
+    low = np.minimum(open_, close) * (1 - pavio[1])
+    volume = rng.gamma(2.0, 5.0, n)
+    trades = rng.poisson(200, n).astype(np.int64) + 1
+    taker_buy = volume * rng.uniform(0.3, 0.7, n)
+
+    return pd.DataFrame({
+        "timestamp": timestamp,
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": volume,
+        "close_time": timestamp + passo - 1,
+        "quote_asset_volume": volume * close,
+        "number_of_trades": trades,
+        "taker_buy_base_asset_volume": taker_buy,
+        "taker_buy_quote_asset_volume": taker_buy * close,
+    })
+
+def criar_banco_sintetico(db_path, n, simbolo="BTCUSDT", intervalo="1m", seed=42, lote=200_000):
+    """Preenche (em lotes) a tabela candles_<par>_<intervalo> de db_path com n candles sintéticos."""
+    tabela = f"candles_{simbolo.lower()}_{intervalo}"
+    conn = conectar(db_path)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {tabela} (
+            timestamp INTEGER PRIMARY KEY,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume REAL,
+            close_time INTEGER,
+            quote_asset_volume REAL,
+            number_of_trades INTEGER,
+            taker_buy_base_asset_volume REAL,
+            taker_buy_quote_asset_volume REAL
+        )
+    ''')
+    inicializar_catalogo(conn)
+    df = gerar_candles_sinteticos(n, intervalo, seed)
+    for inicio in range(0, n, lote):
+        parte = df.iloc[inicio:inicio + lote]
+        conn.executemany(
+            f"INSERT OR IGNORE INTO {tabela} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            parte.itertuples(index=False, name=None)
+        )
+    recalcular_catalogo(conn.cursor(), simbolo, intervalo)
+    conn.commit()
+    conn.close()
+    return df
+
+def medir(medir_memoria, nome, funcao, *args, **kwargs):
+    """
+    Executa funcao e retorna (resultado, {etapa, segundos, pico_mb}). A saída no console é suprimida.
+    O tracemalloc deixa o código bem mais lento, então o tempo vem de uma execução sem rastreamento
+    e o pico de memória de uma segunda execução rastreada (pico_mb = None se medir_memoria=False).
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        resultado = funcao(*args, **kwargs)
+        segundos = time.perf_counter() - inicio
+
+        pico = None
+        if medir_memoria:
+            tracemalloc.start()
+            funcao(*args, **kwargs)
+            pico = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            tracemalloc.stop()
+    return resultado, {"etapa": nome, "segundos": segundos, "pico_mb": pico}
+
+def executar_benchmark(n, intervalo="1m", seed=42, combinacoes_otimizador=20, n_workers=1, medir_memoria=True, medir_ingestao=False):
+    """
+    Mede cada etapa do pipeline sobre um banco temporário com n candles sintéticos.
+    medir_ingestao: mede também a importação de n candles da FonteSintetica (fontes.py) num banco vazio.
+    Retorna a lista de medições na ordem em que as etapas rodaram.
+    """
+    pasta = tempfile.mkdtemp(prefix="benchmark_candles_")
+    db_path = os.path.join(pasta, "candles_benchmark.db")
+    simbolo = "BTCUSDT"
+    medicoes = []
+
+    try:
+        df_gerado, m = medir(medir_memoria, "gerar_banco", criar_banco_sintetico, db_path, n, simbolo, intervalo, seed)
+        medicoes.append(m)
+
+        if medir_ingestao:
+            t0 = int(df_gerado["timestamp"].iloc[0])
+            fonte = FonteSintetica(t0, t0 + (n - 1) * DURACAO_INTERVALO_MS[intervalo])
+            inicio_str = pd.Timestamp(t0, unit="ms").strftime("%Y-%m-%d %H:%M:%S")
+            # Cada execução (a rastreada também) grava num banco novo
+            destinos = iter(os.path.join(pasta, f"candles_ingestao_{i}.db") for i in range(2))
+            _, m = medir(
+                medir_memoria, "ingestao (fonte sintetica)",
+                lambda: importar_candles_binance(next(destinos), simbolo, intervalo, start_str=inicio_str, fonte=fonte)
+            )
+            medicoes.append(m)
+
+        data_inicio = pd.Timestamp(int(df_gerado["timestamp"].iloc[0]), unit="ms").strftime("%Y-%m-%d %H:%M:%S")
+        data_fim = pd.Timestamp(int(df_gerado["timestamp"].iloc[-1]), unit="ms").strftime("%Y-%m-%d %H:%M:%S")
+        del df_gerado
+
+        df, m = medir(medir_memoria, "carregar_candles", carregar_candles, db_path, simbolo, intervalo, data_inicio, data_fim)
+        medicoes.append(m)
+
+        _, m = medir(medir_memoria, "calcular_bollinger", calcular_bollinger, df.copy())
+        medicoes.append(m)
+        _, m = medir(medir_memoria, "adicionar_ema_tendencia", adicionar_ema_tendencia, df.copy(), 90)
+        medicoes.append(m)
+        _, m = medir(medir_memoria, "calcular_rsi", calcular_rsi, df.copy())
+        medicoes.append(m)
+        _, m = medir(medir_memoria, "enriquecer_dados_analise", enriquecer_dados_analise, calcular_bollinger(df.copy()))
+        medicoes.append(m)
+
+        # Inclui a gravação do CSV de operações, como na Análise Técnica
+        arquivo_operacoes = os.path.join(pasta, "operacoes.csv")
+        (df_bt, _), m = medir(
+            medir_memoria, "backtest_bollinger", backtest_bollinger, df.copy(), 0.5, stop_loss_perc=2.0,
+            taxa_corretagem=0.1, periodo_ema=90, arquivo_operacoes=arquivo_operacoes
+        )
+        medicoes.append(m)
+
+        # Fatia do otimizador: as primeiras combinações da grade padrão
+        combinacoes = combinacoes_da_grade(GRADE_PADRAO)[:combinacoes_otimizador]
+        periodos_ema = sorted({int(c[3]) for c in combinacoes if c[3]})
+        pacote, m = medir(medir_memoria, "preparar_pacote_indicadores", preparar_pacote_indicadores, df.copy(), periodos_ema)
+        medicoes.append(m)
+        _, m = medir(medir_memoria, f"otimizador ({len(combinacoes)} comb.)", lambda p=pacote: list(executar_grade(p, combinacoes, n_workers)))
+        medicoes.append(m)
+        del pacote
+
+        # Exportações (JSON grava no diretório atual, como no menu)
+        diretorio_original = os.getcwd()
+        os.chdir(pasta)
+        try:
+            _, m = medir(medir_memoria, "exportar_json", exportar_candles_para_json_txt, db_path, simbolo, intervalo)
+        finally:
+            os.chdir(diretorio_original)
+        medicoes.append(m)
+        # Mesmo formato do CSV gerado por graficos.gerar_grafico_csv
+        _, m = medir(medir_memoria, "exportar_csv", df_bt.to_csv, os.path.join(pasta, "candles.csv"), index=False, encoding="utf-8-sig")
+        medicoes.append(m)
+    finally:
+        fechar_conexoes()
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    return medicoes
+
+def exibir_medicoes(n, medicoes):
+    print(f"\n📊 {n:,} candles")
+    print(f"{'Etapa':<30} | {'Tempo (s)':>10} | {'Pico (MB)':>10}")
+    print("-" * 56)
+    for m in medicoes:
+        pico = f"{m['pico_mb']:>10.1f}" if m["pico_mb"] is not None else f"{'-':>10}"
+        print(f"{m['etapa']:<30} | {m['segundos']:>10.3f} | {pico}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline de análise com candles sintéticos.")
+    parser.add_argument("--candles", type=int, nargs="+", default=TAMANHOS_PADRAO, help="Tamanhos a medir (10k a 5M).")
+    parser.add_argument("--intervalo", default="1m", choices=sorted(DURACAO_INTERVALO_MS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--combinacoes", type=int, default=20, help="Combinações da fatia do otimizador.")
+    parser.add_argument("--workers", type=int, default=1, help="Processos da fatia do otimizador.")
+    parser.add_argument("--sem-memoria", action="store_true", help="Não mede o pico de memória (etapas rodam uma vez só).")
+    parser.add_argument("--ingestao", action="store_true", help="Mede também a importação a partir da fonte sintética.")
+    parser.add_argument("--csv", help="Arquivo CSV para salvar as medições (para comparar versões).")
+    args = parser.parse_args()
+
+    resultados = []
+    for n in args.candles:
+        print(f"⏳ Medindo {n:,} candles...")
+        medicoes = executar_benchmark(n, args.intervalo, args.seed, args.combinacoes, args.workers, not args.sem_memoria, args.ingestao)
+        exibir_medicoes(n, medicoes)
+        resultados += [dict(m, candles=n) for m in medicoes]
+
+    if args.csv:
+        pd.DataFrame(resultados).to_csv(args.csv, index=False)
+        print(f"\n💾 Medições salvas em: {args.csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+﻿import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from armazenamento import conectar
+from config import ler_config
+
+# pyarrow é opcional: sem ele o cache fica desativado e tudo é lido do SQLite
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_DISPONIVEL = True
+except ImportError:
+    PYARROW_DISPONIVEL = False
+
+# === Cache colunar (Parquet) das tabelas de candles ===
+# Estrutura: <pasta_cache>/<PAR>_<intervalo>/<YYYY-MM>.parquet (uma partição por mês) + _meta.json
+# O cache é atualizado depois de cada importação e só é usado quando está em dia com o banco
+# (mesmo último timestamp); caso contrário carregar_candles lê do SQLite normalmente.
+# Ativado pela chave "cache_parquet": true do app_config.json.
+
+COLUNAS_PARQUET = {
+    "timestamp": "int64",
+    "open": "float64",
+    "high": "float64",
+    "low": "float64",
+    "close": "float64",
+    "volume": "float64",
+    "close_time": "int64",
+    "quote_asset_volume": "float64",
+    "number_of_trades": "int64",
+    "taker_buy_base_asset_volume": "float64",
+    "taker_buy_quote_asset_volume": "float64",
+}
+
+
+def cache_parquet_ativo():
+    return PYARROW_DISPONIVEL and bool(ler_config().get("cache_parquet", False))
+
+
+def pasta_cache(db_path, simbolo, intervalo):
+    base = ler_config().get("pasta_cache_parquet") or os.path.join(os.path.dirname(os.path.abspath(db_path)), "cache_parquet")
+    return os.path.join(base, f"{simbolo.upper()}_{intervalo}")
+
+
+def _ler_meta(pasta):
+    try:
+        with open(os.path.join(pasta, "_meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _mes(ms):
+    """Partição (YYYY-MM) de um timestamp em epoch ms."""
+    return pd.Timestamp(int(ms), unit="ms").strftime("%Y-%m")
+
+
+def _inicio_mes_ms(ms):
+    return int(pd.Timestamp(int(ms), unit="ms").to_period("M").start_time.value // 1_000_000)
+
+
+def atualizar_cache_parquet(db_path, simbolo, intervalo, desde_ms=None):
+    """
+    Espelha a tabela candles_<par>_<intervalo> no cache Parquet.
+    Só as partições a partir do mês de desde_ms (ou do último timestamp já em cache) são regravadas;
+    sem cache anterior, a tabela inteira é exportada.
+    """
+    if not PYARROW_DISPONIVEL:
+        return
+    pasta = pasta_cache(db_path, simbolo, intervalo)
+    tabela = f"candles_{simbolo.lower()}_{intervalo}"
+    conn = conectar(db_path)
+
+    tipo = conn.execute(f"SELECT typeof(timestamp) FROM {tabela} LIMIT 1").fetchone()
+    if not tipo or tipo[0] != "integer":
+        conn.close()
+        return
+
+    meta = _ler_meta(pasta)
+    if meta is None:
+        inicio_ms = None
+        if os.path.isdir(pasta):
+            shutil.rmtree(pasta)
+    else:
+        marcos = [m for m in (desde_ms, meta["ultimo_timestamp"]) if m is not None]
+        inicio_ms = _inicio_mes_ms(min(marcos))
+
+    colunas = ", ".join(COLUNAS_PARQUET)
+    if inicio_ms is None:
+        df = pd.read_sql_query(f"SELECT {colunas} FROM {tabela} ORDER BY timestamp", conn, dtype=COLUNAS_PARQUET)
+    else:
+        df = pd.read_sql_query(
+            f"SELECT {colunas} FROM {tabela} WHERE timestamp >= ? ORDER BY timestamp", conn,
+            params=(inicio_ms,), dtype=COLUNAS_PARQUET
+        )
+    ultimo, total = conn.execute(f"SELECT MAX(timestamp), COUNT(*) FROM {tabela}").fetchone()
+    conn.close()
+
+    os.makedirs(pasta, exist_ok=True)
+    # A meta é invalidada antes de mexer nas partições: leitores caem no SQLite durante a gravação
+    # e, se o processo cair no meio, a próxima atualização reconstrói o cache inteiro
+    caminho_meta = os.path.join(pasta, "_meta.json")
+    if os.path.exists(caminho_meta):
+        os.remove(caminho_meta)
+    # Partições regravadas são removidas antes (a tabela pode ter encolhido, ex.: restaurar_backup)
+    if inicio_ms is not None:
+        for arquivo in os.listdir(pasta):
+            if arquivo.endswith(".parquet") and arquivo[:-len(".parquet")] >= _mes(inicio_ms):
+                os.remove(os.path.join(pasta, arquivo))
+    if not df.empty:
+        meses = pd.to_datetime(df["timestamp"], unit="ms").dt.strftime("%Y-%m").to_numpy()
+        # Linhas ordenadas por timestamp: cada mês é um bloco contíguo
+        cortes = np.flatnonzero(meses[1:] != meses[:-1]) + 1
+        for bloco in np.split(np.arange(len(df)), cortes):
+            parte = df.iloc[bloco[0]:bloco[-1] + 1]
+            pq.write_table(
+                pa.Table.from_pandas(parte, preserve_index=False),
+                os.path.join(pasta, f"{meses[bloco[0]]}.parquet")
+            )
+
+    with open(caminho_meta, "w", encoding="utf-8") as f:
+        json.dump({"ultimo_timestamp": ultimo, "total_candles": total}, f)
+
+
+def ler_cache_parquet(db_path, simbolo, intervalo, inicio_ms, fim_ms, colunas, barras_aquecimento=0):
+    """
+    Lê [inicio_ms, fim_ms] (+ barras de aquecimento anteriores) das partições Parquet, apenas com 'colunas'.
+    Retorna (DataFrame com timestamp em epoch ms, barras de aquecimento incluídas),
+    ou None se o cache não existir ou estiver desatualizado em relação ao banco.
+    """
+    pasta = pasta_cache(db_path, simbolo, intervalo)
+    meta = _ler_meta(pasta)
+    if meta is None:
+        return None
+
+    tabela = f"candles_{simbolo.lower()}_{intervalo}"
+    conn = conectar(db_path)
+    ultimo, total = conn.execute(f"SELECT MAX(timestamp), COUNT(*) FROM {tabela}").fetchone()
+    conn.close()
+    # Último candle E quantidade: gravações no meio da série (lacunas, restauração) não mudam o máximo
+    if ultimo != meta["ultimo_timestamp"] or total != meta.get("total_candles"):
+        return None
+
+    particoes = sorted(f[:-len(".parquet")] for f in os.listdir(pasta) if f.endswith(".parquet"))
+    primeira, ultima = _mes(inicio_ms), _mes(fim_ms)
+
+    def ler(particao, filtros):
+        return pq.read_table(os.path.join(pasta, f"{particao}.parquet"), columns=colunas, filters=filtros).to_pandas()
+
+    partes = [
+        ler(p, [("timestamp", ">=", inicio_ms), ("timestamp", "<=", fim_ms)])
+        for p in particoes if primeira <= p <= ultima
+    ]
+
+    # Aquecimento: volta partição a partição (a começar pelo próprio mês inicial) até juntar as barras pedidas
+    aquecimento = []
+    faltam = barras_aquecimento
+    candidatas = [p for p in particoes if p <= primeira]
+    while faltam > 0 and candidatas:
+        anterior = ler(candidatas.pop(), [("timestamp", "<", inicio_ms)]).tail(faltam)
+        aquecimento.insert(0, anterior)
+        faltam -= len(anterior)
+
+    quadros = [q for q in aquecimento + partes if not q.empty]
+    if not quadros:
+        return pd.DataFrame({c: pd.Series(dtype=COLUNAS_PARQUET[c]) for c in colunas}), 0
+    df = pd.concat(quadros, ignore_index=True)
+    return df, len(df) - sum(len(q) for q in partes)
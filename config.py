@@ -1,7 +1,7 @@
 ﻿from binance.client import Client
 import json
 import os
-import sqlite3
+from armazenamento import conectar
 
 # === Chaves da API Binance ===
 api_key = 'SUA_API_KEY'        # 🔐 Substitua pela sua chave real
@@ -62,10 +62,33 @@ def salvar_config(config: dict):
 
 
 # === Configuração de Estratégia (armazenada no SQLite) ===
+# A tabela é inicializada uma única vez por processo e banco; os valores ficam em
+# cache na memória e as alterações são gravadas imediatamente (write-through).
+
+# Valores padrão
+CONFIGURACOES_PADRAO = {
+    'bollinger_distancia': 0.5,
+    'stop_loss_perc': 2.0,
+    'trading_fee_perc': 0.1,
+}
+
+_cache_configuracoes = {}  # db_path -> {chave: valor}
+
 
 def inicializar_tabela_configuracoes(db_path):
     """Garante que a tabela de configurações exista com valores padrão."""
-    conn = sqlite3.connect(db_path)
+    _conexao_configuracoes(db_path)
+
+
+def _conexao_configuracoes(db_path):
+    """
+    Conexão (da thread) para a tabela de configurações.
+    Na primeira chamada do processo cria a tabela, insere os padrões e carrega todos os valores no cache.
+    """
+    conn = conectar(db_path)
+    if db_path in _cache_configuracoes:
+        return conn
+
     cursor = conn.cursor()
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS configuracoes (
@@ -73,86 +96,65 @@ def inicializar_tabela_configuracoes(db_path):
             valor REAL
         )
     """)
-    # Valores padrão
-    configs_iniciais = [
-        ('bollinger_distancia', 0.5),
-        ('stop_loss_perc', 2.0),
-        ('trading_fee_perc', 0.1)
-    ]
-    
     cursor.executemany("""
         INSERT OR IGNORE INTO configuracoes (chave, valor)
         VALUES (?, ?)
-    """, configs_iniciais)
-    
+    """, list(CONFIGURACOES_PADRAO.items()))
     conn.commit()
-    conn.close()
 
+    cursor.execute("SELECT chave, valor FROM configuracoes")
+    _cache_configuracoes[db_path] = dict(cursor.fetchall())
+    return conn
 
-def obter_bollinger_distancia(db_path):
-    inicializar_tabela_configuracoes(db_path)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT valor FROM configuracoes WHERE chave='bollinger_distancia'")
-    row = cursor.fetchone()
-    conn.close()
-    return float(row[0]) if row else 0.5
 
+def obter_configuracao(db_path, chave, padrao=None):
+    """Lê qualquer chave da tabela de configurações (a partir do cache)."""
+    _conexao_configuracoes(db_path)
+    valores = _cache_configuracoes[db_path]
+    if chave in valores:
+        return valores[chave]
+    return padrao if padrao is not None else CONFIGURACOES_PADRAO.get(chave)
 
-def atualizar_bollinger_distancia(db_path, novo_valor: float):
-    inicializar_tabela_configuracoes(db_path)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("""
+
+def salvar_configuracao(db_path, chave, valor):
+    """Grava qualquer chave na tabela de configurações e atualiza o cache."""
+    conn = _conexao_configuracoes(db_path)
+    conn.execute("""
         INSERT INTO configuracoes (chave, valor)
-        VALUES ('bollinger_distancia', ?)
+        VALUES (?, ?)
         ON CONFLICT(chave) DO UPDATE SET valor=excluded.valor
-    """, (novo_valor,))
+    """, (chave, valor))
     conn.commit()
-    conn.close()
+    # Cache com o valor como ficou gravado (a coluna tem afinidade REAL)
+    _cache_configuracoes[db_path][chave] = conn.execute(
+        "SELECT valor FROM configuracoes WHERE chave=?", (chave,)
+    ).fetchone()[0]
+
+
+def limpar_cache_configuracoes():
+    """Descarta o cache (ex.: o banco foi alterado por outro processo)."""
+    _cache_configuracoes.clear()
+
+
+def obter_bollinger_distancia(db_path):
+    return float(obter_configuracao(db_path, 'bollinger_distancia'))
+
+
+def atualizar_bollinger_distancia(db_path, novo_valor: float):
+    salvar_configuracao(db_path, 'bollinger_distancia', novo_valor)
 
 
 def obter_stop_loss(db_path):
-    inicializar_tabela_configuracoes(db_path)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT valor FROM configuracoes WHERE chave='stop_loss_perc'")
-    row = cursor.fetchone()
-    conn.close()
-    return float(row[0]) if row else 2.0
+    return float(obter_configuracao(db_path, 'stop_loss_perc'))
 
 
 def atualizar_stop_loss(db_path, novo_valor: float):
-    inicializar_tabela_configuracoes(db_path)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO configuracoes (chave, valor)
-        VALUES ('stop_loss_perc', ?)
-        ON CONFLICT(chave) DO UPDATE SET valor=excluded.valor
-    """, (novo_valor,))
-    conn.commit()
-    conn.close()
+    salvar_configuracao(db_path, 'stop_loss_perc', novo_valor)
 
 
 def obter_taxa_corretagem(db_path):
-    inicializar_tabela_configuracoes(db_path)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT valor FROM configuracoes WHERE chave='trading_fee_perc'")
-    row = cursor.fetchone()
-    conn.close()
-    return float(row[0]) if row else 0.1
+    return float(obter_configuracao(db_path, 'trading_fee_perc'))
 
 
 def atualizar_taxa_corretagem(db_path, novo_valor: float):
-    inicializar_tabela_configuracoes(db_path)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO configuracoes (chave, valor)
-        VALUES ('trading_fee_perc', ?)
-        ON CONFLICT(chave) DO UPDATE SET valor=excluded.valor
-    """, (novo_valor,))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    salvar_configuracao(db_path, 'trading_fee_perc', novo_valor)
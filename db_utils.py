@@ -1,28 +1,129 @@
 ﻿import sqlite3
 import pandas as pd
+import numpy as np
 from datetime import datetime
-from binance.client import Client
-from binance.exceptions import BinanceAPIException, BinanceRequestException
-import time
-from config import api_key, api_secret, interval_map
+import glob
+import os
+from config import interval_map, ler_config
+from armazenamento import conectar
+from cache_parquet import cache_parquet_ativo, atualizar_cache_parquet, ler_cache_parquet
+from memmap_candles import cache_memmap_ativo, atualizar_memmap, fatia_memmap
+from agregacao import duracao_intervalo_ms, inicio_periodo_ms, agregar_candles
+from fontes import ErroFonteCandles, criar_fonte
+
+
+# === Catálogo de candles ===
+# Uma linha por série (par, intervalo) com primeiro/último timestamp, quantidade de candles e data da
+# última gravação. É mantido na MESMA transação de cada gravação (gravar_candles, restaurar_backup,
+# migrar_para_layout_unificado), então listagens e períodos padrão não varrem o sqlite_master
+# nem consultam MIN/MAX de cada tabela. Bancos antigos têm o catálogo montado na primeira consulta.
+TABELA_CATALOGO = "catalogo_candles"
+
+
+def inicializar_catalogo(conn):
+    """Cria o catálogo; se ele ainda não existia, preenche a partir das tabelas de candles atuais."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (TABELA_CATALOGO,)).fetchone():
+        return
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_CATALOGO} (
+            simbolo TEXT NOT NULL,
+            intervalo TEXT NOT NULL,
+            primeiro_timestamp INTEGER,
+            ultimo_timestamp INTEGER,
+            total_candles INTEGER NOT NULL DEFAULT 0,
+            ultima_atualizacao TEXT,
+            PRIMARY KEY (simbolo, intervalo)
+        )
+    """)
+    reconstruir_catalogo(conn)
 
 
-def listar_pares_disponiveis(db_path):
-    """Lista pares de moedas existentes no banco SQLite."""
-    conn = sqlite3.connect(db_path)
+def reconstruir_catalogo(conn):
+    """Recalcula o catálogo inteiro a partir das tabelas (ex.: depois de gravações feitas fora do aplicativo)."""
+    # Tabelas antigas + (layout unificado) séries da tabela única; uma migração pode ter sido interrompida
+    series = {(par, intervalo) for par, intervalo, _ in _tabelas_candles_por_par(conn)}
+    if layout_unificado(conn):
+        series.update(listar_series_unificadas(conn))
     cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN")
+        cursor.execute(f"DELETE FROM {TABELA_CATALOGO}")
+        for par, intervalo in sorted(series):
+            recalcular_catalogo(cursor, par, intervalo)
+        cursor.execute("COMMIT")
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _timestamp_ms(valor):
+    """Timestamps de tabelas antigas podem estar em texto."""
+    if isinstance(valor, str):
+        return int(pd.Timestamp(valor).value // 1_000_000)
+    return valor
+
+
+def recalcular_catalogo(cursor, simbolo, intervalo):
+    """Regrava a linha da série com MIN/MAX/COUNT da tabela (usado quando candles são removidos)."""
+    primeiro, ultimo, total = cursor.execute(
+        f"SELECT MIN(timestamp), MAX(timestamp), COUNT(*) FROM candles_{simbolo.lower()}_{intervalo}"
+    ).fetchone()
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO {TABELA_CATALOGO}
+            (simbolo, intervalo, primeiro_timestamp, ultimo_timestamp, total_candles, ultima_atualizacao)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (simbolo.upper(), intervalo, _timestamp_ms(primeiro), _timestamp_ms(ultimo), total,
+          datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+
+def _registrar_gravacao_catalogo(cursor, simbolo, intervalo, novos, primeiro, ultimo):
+    """Soma um lote gravado à linha da série (gravações só acrescentam ou sobrescrevem candles)."""
+    cursor.execute(f"""
+        INSERT INTO {TABELA_CATALOGO}
+            (simbolo, intervalo, primeiro_timestamp, ultimo_timestamp, total_candles, ultima_atualizacao)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(simbolo, intervalo) DO UPDATE SET
+            primeiro_timestamp = MIN(COALESCE(primeiro_timestamp, excluded.primeiro_timestamp), excluded.primeiro_timestamp),
+            ultimo_timestamp = MAX(COALESCE(ultimo_timestamp, excluded.ultimo_timestamp), excluded.ultimo_timestamp),
+            total_candles = total_candles + excluded.total_candles,
+            ultima_atualizacao = excluded.ultima_atualizacao
+    """, (simbolo.upper(), intervalo, primeiro, ultimo, novos, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+
+def obter_catalogo(db_path):
+    """Linhas do catálogo (séries com candles) como dicionários, ordenadas por par e intervalo."""
+    conn = conectar(db_path)
+    inicializar_catalogo(conn)
+    conn.row_factory = sqlite3.Row
+    linhas = conn.execute(f"""
+        SELECT * FROM {TABELA_CATALOGO}
+        WHERE total_candles > 0
+        ORDER BY simbolo, intervalo
+    """).fetchall()
+    conn.close()
+    return [dict(linha) for linha in linhas]
 
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tabelas = [row[0] for row in cursor.fetchall()]
-
-    pares = sorted(set(
-        t.split("_")[1].upper()
-        for t in tabelas
-        if t.startswith("candles_") and len(t.split("_")) == 3
-    ))
 
+def periodo_disponivel(db_path, simbolo, intervalo):
+    """(primeiro, último) timestamp em epoch ms da série segundo o catálogo, ou (None, None)."""
+    conn = conectar(db_path)
+    inicializar_catalogo(conn)
+    linha = conn.execute(
+        f"SELECT primeiro_timestamp, ultimo_timestamp FROM {TABELA_CATALOGO} WHERE simbolo=? AND intervalo=? AND total_candles > 0",
+        (simbolo.upper(), intervalo)
+    ).fetchone()
     conn.close()
-    return pares
+    return tuple(linha) if linha else (None, None)
+
+
+def listar_series_candles(db_path):
+    """Retorna a lista de (PAR, intervalo) com candles no banco (lida do catálogo)."""
+    return [(linha["simbolo"], linha["intervalo"]) for linha in obter_catalogo(db_path)]
+
+
+def listar_pares_disponiveis(db_path):
+    """Lista pares de moedas existentes no banco SQLite."""
+    return sorted({par for par, _ in listar_series_candles(db_path)})
 
 
 def listar_intervalos_disponiveis(db_path, simbolo):
@@ -30,15 +131,7 @@ def listar_intervalos_disponiveis(db_path, simbolo):
     Retorna os intervalos disponíveis para um par específico.
     Ex: ['1h', '1d']
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tabelas = [row[0] for row in cursor.fetchall()]
-    conn.close()
-
-    prefix = f"candles_{simbolo.lower()}_"
-    intervalos = sorted({t.split("_")[2] for t in tabelas if t.startswith(prefix)})
-    return intervalos
+    return sorted({periodo for par, periodo in listar_series_candles(db_path) if par == simbolo.upper()})
 
 
 def listar_pares_e_periodos(db_path):
@@ -48,20 +141,10 @@ def listar_pares_e_periodos(db_path):
     """
     pares = {}
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'candles_%'")
-        tabelas = cursor.fetchall()
-
-        for (tabela,) in tabelas:
-            partes = tabela.split("_")
-            if len(partes) == 3:
-                _, par, periodo = partes
-                par = par.upper()
-                if par not in pares:
-                    pares[par] = []
-                pares[par].append(periodo)
-        conn.close()
+        for par, periodo in listar_series_candles(db_path):
+            if par not in pares:
+                pares[par] = []
+            pares[par].append(periodo)
     except Exception as e:
         print(f"❌ Erro ao listar pares: {e}")
 
@@ -100,26 +183,188 @@ def selecionar_par_interativo(db_path):
 
 def banco_possui_tabelas_candles(db_path):
     """Verifica se existem tabelas de candles no banco."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'candles_%'")
-    resultado = cursor.fetchall()
+    return len(listar_series_candles(db_path)) > 0
+
+
+COLUNAS_CANDLES = (
+    "timestamp", "open", "high", "low", "close", "volume",
+    "close_time", "quote_asset_volume", "number_of_trades",
+    "taker_buy_base_asset_volume", "taker_buy_quote_asset_volume"
+)
+
+# Candles por transação em gravar_candles
+TAMANHO_LOTE_INSERCAO = 5000
+
+
+# === Layout unificado (opcional) ===
+# Uma única tabela WITHOUT ROWID com a chave (simbolo_id, intervalo_id, timestamp), no lugar de
+# uma tabela por par/intervalo. Ativado por migrar_para_layout_unificado: cada tabela antiga vira
+# uma VIEW com o mesmo nome (candles_<par>_<intervalo>), então consultas existentes continuam valendo.
+TABELA_UNIFICADA = "candles"
+
+
+def layout_unificado(conn):
+    """True se o banco já usa a tabela única de candles."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (TABELA_UNIFICADA,)
+    ).fetchone() is not None
+
+
+def inicializar_layout_unificado(conn):
+    """Cria a tabela única de candles e as tabelas de dimensão (símbolos e intervalos)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS simbolos (
+            id INTEGER PRIMARY KEY,
+            simbolo TEXT UNIQUE NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS intervalos (
+            id INTEGER PRIMARY KEY,
+            intervalo TEXT UNIQUE NOT NULL
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_UNIFICADA} (
+            simbolo_id INTEGER NOT NULL,
+            intervalo_id INTEGER NOT NULL,
+            timestamp INTEGER NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume REAL,
+            close_time INTEGER,
+            quote_asset_volume REAL,
+            number_of_trades INTEGER,
+            taker_buy_base_asset_volume REAL,
+            taker_buy_quote_asset_volume REAL,
+            PRIMARY KEY (simbolo_id, intervalo_id, timestamp)
+        ) WITHOUT ROWID
+    """)
+
+
+def ids_serie_unificada(conn, simbolo, intervalo):
+    """
+    Retorna (simbolo_id, intervalo_id), cadastrando o par/intervalo se necessário,
+    e garante a VIEW de compatibilidade candles_<par>_<intervalo>.
+    """
+    conn.execute("INSERT OR IGNORE INTO simbolos (simbolo) VALUES (?)", (simbolo.upper(),))
+    conn.execute("INSERT OR IGNORE INTO intervalos (intervalo) VALUES (?)", (intervalo,))
+    simbolo_id = conn.execute("SELECT id FROM simbolos WHERE simbolo=?", (simbolo.upper(),)).fetchone()[0]
+    intervalo_id = conn.execute("SELECT id FROM intervalos WHERE intervalo=?", (intervalo,)).fetchone()[0]
+
+    colunas = ", ".join(COLUNAS_CANDLES)
+    conn.execute(f"""
+        CREATE VIEW IF NOT EXISTS candles_{simbolo.lower()}_{intervalo} AS
+        SELECT {colunas} FROM {TABELA_UNIFICADA}
+        WHERE simbolo_id = {int(simbolo_id)} AND intervalo_id = {int(intervalo_id)}
+    """)
+    return simbolo_id, intervalo_id
+
+
+def listar_series_unificadas(conn):
+    """(PAR, intervalo) com ao menos um candle: uma busca pela chave primária por combinação."""
+    return conn.execute(f"""
+        SELECT s.simbolo, i.intervalo
+        FROM simbolos s CROSS JOIN intervalos i
+        WHERE EXISTS (
+            SELECT 1 FROM {TABELA_UNIFICADA} c
+            WHERE c.simbolo_id = s.id AND c.intervalo_id = i.id
+        )
+        ORDER BY s.simbolo, i.intervalo
+    """).fetchall()
+
+
+def carregar_candles_varios(db_path, simbolos, intervalo, data_inicial, data_final):
+    """
+    Carrega vários pares de um intervalo em UMA consulta (layout unificado).
+    Retorna um DataFrame longo com a coluna 'simbolo' + as colunas de carregar_candles.
+    """
+    conn = conectar(db_path)
+    marcadores = ", ".join("?" * len(simbolos))
+    query = f"""
+        SELECT s.simbolo, c.timestamp, c.open, c.high, c.low, c.close, c.volume
+        FROM {TABELA_UNIFICADA} c
+        JOIN simbolos s ON s.id = c.simbolo_id
+        JOIN intervalos i ON i.id = c.intervalo_id
+        WHERE s.simbolo IN ({marcadores}) AND i.intervalo = ?
+          AND c.timestamp BETWEEN ? AND ?
+        ORDER BY s.simbolo, c.timestamp
+    """
+    params = [s.upper() for s in simbolos] + [intervalo, data_para_epoch_ms(data_inicial), data_para_epoch_ms(data_final)]
+    df = pd.read_sql_query(query, conn, params=params, dtype=dict(TIPOS_COLUNAS_CANDLES, simbolo="object"))
     conn.close()
-    return len(resultado) > 0
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
+    return df
+
 
+def _tabelas_candles_por_par(conn):
+    """Tabelas físicas no layout antigo: [(PAR, intervalo, nome_tabela)]."""
+    tabelas = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'candles_%'").fetchall()
+    return [(t.split("_")[1].upper(), t.split("_")[2], t) for (t,) in tabelas if len(t.split("_")) == 3]
 
-def importar_candles_binance(db_path, symbol, interval, start_str=None, limit=1000):
+
+def migrar_para_layout_unificado(db_path):
     """
-    Função central para buscar candles da Binance e salvar no SQLite.
-    Se start_str for fornecido, busca a partir dessa data.
-    Se não, busca a partir do último registro no banco (ou os últimos 1000 se vazio).
+    Copia cada candles_<par>_<intervalo> para a tabela única e troca a tabela antiga por uma VIEW.
+    Cada tabela é migrada numa transação própria; se interrompida, basta executar de novo.
+    Retorna a quantidade de candles migrados.
     """
-    client = Client(api_key, api_secret)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    table_name = f"candles_{symbol.lower()}_{interval}"
+    conn = conectar(db_path)
+    inicializar_catalogo(conn)
+    inicializar_layout_unificado(conn)
+    conn.commit()
+
+    colunas = ", ".join(COLUNAS_CANDLES[1:])
+    total = 0
+    for par, intervalo, tabela in _tabelas_candles_por_par(conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN")
+            cursor.execute("INSERT OR IGNORE INTO simbolos (simbolo) VALUES (?)", (par,))
+            cursor.execute("INSERT OR IGNORE INTO intervalos (intervalo) VALUES (?)", (intervalo,))
+            simbolo_id = cursor.execute("SELECT id FROM simbolos WHERE simbolo=?", (par,)).fetchone()[0]
+            intervalo_id = cursor.execute("SELECT id FROM intervalos WHERE intervalo=?", (intervalo,)).fetchone()[0]
+
+            # Tabelas antigas podem ter o timestamp em texto: converte para epoch ms
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO {TABELA_UNIFICADA} (simbolo_id, intervalo_id, timestamp, {colunas})
+                SELECT ?, ?,
+                       CASE WHEN typeof(timestamp) = 'integer' THEN timestamp
+                            ELSE CAST(strftime('%s', timestamp) AS INTEGER) * 1000 END,
+                       {colunas}
+                FROM {tabela}
+            """, (simbolo_id, intervalo_id))
+            migrados = cursor.rowcount
+
+            cursor.execute(f"DROP TABLE {tabela}")
+            ids_serie_unificada(conn, par, intervalo)
+            recalcular_catalogo(cursor, par, intervalo)
+            cursor.execute("COMMIT")
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ Erro ao migrar {tabela}: {e}")
+            continue
+
+        total += migrados
+        print(f"✅ {par} ({intervalo}): {migrados} candles migrados.")
+
+    conn.close()
+    return total
+
+
+def criar_tabela_candles(cursor, table_name):
+    """
+    Cria a tabela de candles (schema unificado) se não existir.
+    No layout unificado apenas cadastra o par/intervalo (e a VIEW candles_<par>_<intervalo>).
+    """
+    if layout_unificado(cursor.connection):
+        _, simbolo, intervalo = table_name.split("_")
+        ids_serie_unificada(cursor.connection, simbolo, intervalo)
+        cursor.connection.commit()
+        return
 
-    # Criar a tabela se não existir (Schema unificado)
     cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS {table_name} (
             timestamp INTEGER PRIMARY KEY,
@@ -136,55 +381,248 @@ def importar_candles_binance(db_path, symbol, interval, start_str=None, limit=10
         )
     ''')
 
-    # Determinar data de início se não informada
-    if not start_str:
+
+def gravar_candles(conn, table_name, candles, modo="ignorar", tamanho_lote=TAMANHO_LOTE_INSERCAO):
+    """
+    Grava klines (listas no formato da Binance) em lotes com executemany, uma transação por lote.
+    modo="ignorar": INSERT OR IGNORE (duplicatas são descartadas).
+    modo="upsert": candles já existentes são sobrescritos (corrige o último candle, gravado ainda aberto).
+    Retorna a quantidade de candles NOVOS (sobrescritos não contam).
+    """
+    if modo not in ("ignorar", "upsert"):
+        raise ValueError(f"Modo de gravação inválido: {modo}")
+
+    _, simbolo, intervalo = table_name.split("_")
+    inicializar_catalogo(conn)
+
+    # Destino: a própria tabela ou, no layout unificado, a tabela única com (simbolo_id, intervalo_id)
+    prefixo = ()
+    destino, colunas_chave, filtro = table_name, ("timestamp",), ""
+    if layout_unificado(conn):
+        prefixo = ids_serie_unificada(conn, simbolo, intervalo)
+        conn.commit()
+        destino, colunas_chave = TABELA_UNIFICADA, ("simbolo_id", "intervalo_id", "timestamp")
+        filtro = "simbolo_id = ? AND intervalo_id = ? AND "
+
+    todas_colunas = colunas_chave[:-1] + COLUNAS_CANDLES
+    colunas = ", ".join(todas_colunas)
+    marcadores = ", ".join("?" * len(todas_colunas))
+    if modo == "upsert":
+        atualizacoes = ", ".join(f"{c}=excluded.{c}" for c in COLUNAS_CANDLES[1:])
+        sql = f"INSERT INTO {destino} ({colunas}) VALUES ({marcadores}) ON CONFLICT({', '.join(colunas_chave)}) DO UPDATE SET {atualizacoes}"
+    else:
+        sql = f"INSERT OR IGNORE INTO {destino} ({colunas}) VALUES ({marcadores})"
+    sql_contagem = f"SELECT COUNT(*) FROM {destino} WHERE {filtro}timestamp BETWEEN ? AND ?"
+
+    inserted = 0
+    cursor = conn.cursor()
+    for inicio in range(0, len(candles), tamanho_lote):
+        parte = candles[inicio:inicio + tamanho_lote]
+        lote = [prefixo + tuple(candle[:11]) for candle in parte]
+        faixa = prefixo + (min(c[0] for c in parte), max(c[0] for c in parte))
+        try:
+            cursor.execute("BEGIN")
+            # Novos = linhas na faixa do lote depois - antes (consulta pela chave primária)
+            antes = cursor.execute(sql_contagem, faixa).fetchone()[0]
+            cursor.executemany(sql, lote)
+            novos = cursor.execute(sql_contagem, faixa).fetchone()[0] - antes
+            _registrar_gravacao_catalogo(cursor, simbolo, intervalo, novos, *faixa[-2:])
+            cursor.execute("COMMIT")
+            inserted += novos
+        except Exception:
+            conn.rollback()
+            raise
+    return inserted
+
+
+def importar_candles_binance(db_path, symbol, interval, start_str=None, limit=1000, modo="ignorar", tamanho_lote=TAMANHO_LOTE_INSERCAO, fonte=None):
+    """
+    Função central para buscar candles (da fonte configurada, ver fontes.py) e salvar no SQLite.
+    Se start_str for fornecido, busca a partir dessa data.
+    Se não, busca a partir do último registro no banco (ou os últimos 1000 se vazio).
+    Com modo="upsert" a retomada inclui o último candle gravado, que é corrigido caso
+    tenha sido salvo ainda aberto. Retorna a quantidade de candles novos.
+    """
+    # A partir de uma data com upsert: candles já gravados no período baixado são sobrescritos
+    # (com "ignorar" nada existente muda e não há o que guardar)
+    if start_str and modo == "upsert":
+        backup_antes_de_regravar(db_path, symbol, interval, _timestamp_ms(start_str))
+
+    fonte_propria = fonte is None
+    fonte = fonte or criar_fonte()
+    conn = conectar(db_path)
+    cursor = conn.cursor()
+    table_name = f"candles_{symbol.lower()}_{interval}"
+
+    # Criar a tabela se não existir (Schema unificado)
+    criar_tabela_candles(cursor, table_name)
+
+    # Determinar data de início (UTC) se não informada
+    if start_str:
+        inicio_ms = _timestamp_ms(start_str)
+    else:
         cursor.execute(f"SELECT MAX(timestamp) FROM {table_name}")
         max_ts = cursor.fetchone()[0]
 
         if max_ts:
-            start_dt = datetime.fromtimestamp((max_ts + 1) / 1000)
-            start_str = start_dt.strftime('%Y-%m-%d %H:%M:%S')
-            print(f"🔄 Atualizando {symbol} ({interval}) a partir de {start_str}")
+            inicio_ms = max_ts if modo == "upsert" else max_ts + 1
+            start_dt = datetime.fromtimestamp(inicio_ms / 1000)
+            print(f"🔄 Atualizando {symbol} ({interval}) a partir de {start_dt.strftime('%Y-%m-%d %H:%M:%S')}")
         else:
             print(f"⬇️ Baixando {limit} candles iniciais para {symbol} ({interval})...")
-            start_str = None  # Vai usar o limit do get_historical_klines
+            inicio_ms = int(datetime.now().timestamp() * 1000) - limit * duracao_intervalo_ms(interval)
 
+    # Cada página é gravada ao chegar (o período inteiro não fica em memória)
+    inserted = 0
+    primeiro = None
     try:
-        if start_str:
-            candles = client.get_historical_klines(symbol, interval, start_str=start_str)
-        else:
-            candles = client.get_historical_klines(symbol, interval, limit=limit)
-    except (BinanceAPIException, BinanceRequestException) as e:
-        print(f"❌ Erro na API da Binance para {symbol}: {e}")
+        for candles in fonte.historico(symbol, interval, inicio_ms):
+            inserted += gravar_candles(conn, table_name, candles, modo, tamanho_lote)
+            if primeiro is None:
+                primeiro = int(candles[0][0])
+    except ErroFonteCandles as e:
+        print(f"❌ Erro ao baixar {symbol} ({interval}): {e}")
+    finally:
         conn.close()
-        return 0
+        if fonte_propria:
+            fonte.fechar()
 
-    inserted = 0
-    for candle in candles:
+    if primeiro is not None:
+        atualizar_caches_candles(db_path, symbol, interval, desde_ms=primeiro)
+        # A partir de uma data, candles já simulados pelo backtest contínuo podem ter mudado
+        if start_str:
+            from backtest_continuo import invalidar_backtest_continuo
+            invalidar_backtest_continuo(db_path, symbol, interval, _timestamp_ms(start_str))
+    return inserted
+
+
+def atualizar_caches_candles(db_path, simbolo, intervalo, desde_ms):
+    """Propaga uma gravação (candles a partir de desde_ms) para os caches opcionais (Parquet e memmap)."""
+    if cache_parquet_ativo():
+        atualizar_cache_parquet(db_path, simbolo, intervalo, desde_ms=desde_ms)
+    if cache_memmap_ativo():
+        atualizar_memmap(db_path, simbolo, intervalo, desde_ms=desde_ms)
+
+
+# === Intervalos derivados do 1m ===
+# Com "derivar_intervalos": true no app_config.json (opcional, padrão false) só o 1m é baixado da Binance;
+# os demais intervalos são agregados localmente (ver agregacao.py) a partir do 1m já atualizado.
+# Desligado por padrão: bancos existentes continuam com os intervalos baixados da Binance.
+# "intervalos_personalizados" (ex.: ["15m", "2h"]) cria séries que a Binance não sincroniza aqui.
+INTERVALO_BASE = "1m"
+
+
+def derivar_intervalos_ativo():
+    return bool(ler_config().get("derivar_intervalos", False))
+
+
+def intervalos_personalizados():
+    """Intervalos extras do app_config.json, validados e sem repetir os do interval_map."""
+    intervalos = []
+    for intervalo in ler_config().get("intervalos_personalizados", []):
         try:
-            cursor.execute(f'''
-                INSERT INTO {table_name} (
-                    timestamp, open, high, low, close, volume,
-                    close_time, quote_asset_volume, number_of_trades,
-                    taker_buy_base_asset_volume, taker_buy_quote_asset_volume
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', candle[:11])
-            inserted += 1
-        except sqlite3.IntegrityError:
-            continue  # Ignorar duplicatas
+            duracao_intervalo_ms(intervalo)
+        except ValueError as e:
+            print(f"⚠️ {e}")
+            continue
+        if intervalo not in interval_map and intervalo not in intervalos:
+            intervalos.append(intervalo)
+    return intervalos
 
-    conn.commit()
+
+def atualizar_intervalo_derivado(db_path, simbolo, intervalo, completo_se_vazio=False, tamanho_lote=TAMANHO_LOTE_INSERCAO):
+    """
+    Agrega candles_<par>_1m em candles_<par>_<intervalo>, a partir do último período gravado
+    (recalculado com upsert, pois podia estar incompleto).
+    Retorna a quantidade de candles novos, ou None se o 1m não cobrir o período necessário
+    (tabela destino vazia sem completo_se_vazio, ou 1m começando depois do último período gravado):
+    nesse caso o intervalo deve ser baixado da Binance.
+    """
+    simbolo = simbolo.upper()
+    base = f"candles_{simbolo.lower()}_{INTERVALO_BASE}"
+    destino = f"candles_{simbolo.lower()}_{intervalo}"
+    duracao_intervalo_ms(intervalo)
+
+    conn = conectar(db_path)
+    cursor = conn.cursor()
+    existentes = {nome for (nome,) in cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name IN (?, ?)", (base, destino)
+    )}
+    if base not in existentes:
+        conn.close()
+        return None
+    min_base = cursor.execute(f"SELECT MIN(timestamp) FROM {base}").fetchone()[0]
+    max_destino = None
+    if destino in existentes:
+        max_destino = cursor.execute(f"SELECT MAX(timestamp) FROM {destino}").fetchone()[0]
+
+    if min_base is None or (max_destino is None and not completo_se_vazio):
+        conn.close()
+        return None
+    desde = inicio_periodo_ms(max_destino if max_destino is not None else min_base, intervalo)
+    if max_destino is not None and min_base > desde:
+        conn.close()
+        return None
+
+    linhas = cursor.execute(
+        f"SELECT {', '.join(COLUNAS_CANDLES)} FROM {base} WHERE timestamp >= ? ORDER BY timestamp", (desde,)
+    ).fetchall()
+    colunas = {c: np.array(valores) for c, valores in zip(COLUNAS_CANDLES, zip(*linhas))} if linhas else {"timestamp": []}
+    del linhas
+    # O último período pode estar em andamento: entra incompleto e é refeito na próxima atualização
+    candles = agregar_candles(colunas, intervalo, manter_ultimo=True)
+    criar_tabela_candles(cursor, destino)
+    inserted = gravar_candles(conn, destino, candles, "upsert", tamanho_lote)
     conn.close()
+
+    if candles:
+        atualizar_caches_candles(db_path, simbolo, intervalo, desde_ms=desde)
     return inserted
 
 
+# === Backups antes da atualização ===
+# "incremental" (padrão): a atualização só acrescenta candles e sobrescreve os candles a partir do
+#   último timestamp gravado (upsert), então basta guardar essas linhas + o último timestamp para
+#   voltar ao estado anterior (ver restaurar_backup). O backup tem poucas linhas em vez da tabela inteira.
+#   Gravações que mexem em candles antigos (reparo de lacunas, backfill) guardam a faixa que vão
+#   regravar (backup_antes_de_regravar): a restauração devolve exatamente essa faixa.
+# "arquivo": cópia do banco inteiro para um arquivo separado via API de backup online do SQLite.
+# "completo": cópia integral da tabela (comportamento antigo).
+# Definido pela chave "modo_backup" do app_config.json.
+MODOS_BACKUP = ("incremental", "arquivo", "completo")
+GERACOES_BACKUP = 3
+
+
+def obter_modo_backup():
+    modo = ler_config().get("modo_backup", "incremental")
+    return modo if modo in MODOS_BACKUP else "incremental"
+
+
+def inicializar_tabela_backups(conn):
+    """
+    Registro dos backups incrementais: a faixa de timestamps que a tabela pode ter mudado
+    (de ultimo_timestamp até fim_timestamp; sem fim_timestamp, até o fim da tabela).
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS backups_incrementais (
+            tabela_backup TEXT PRIMARY KEY,
+            tabela TEXT,
+            ultimo_timestamp INTEGER,
+            data_backup TEXT
+        )
+    """)
+    colunas = {linha[1] for linha in conn.execute("PRAGMA table_info(backups_incrementais)")}
+    if "fim_timestamp" not in colunas:
+        conn.execute("ALTER TABLE backups_incrementais ADD COLUMN fim_timestamp INTEGER")
+
+
 def gerenciar_rotatividade_backups(conn, table_name_base):
     """
     Mantém apenas os 3 backups mais recentes de uma tabela específica.
     Remove os backups mais antigos automaticamente.
     """
     cursor = conn.cursor()
-    # Padrão de nome: candles_btc_1h_backup_YYYYMMDD_HHMMSS
+    # Padrão de nome: candles_btc_1h_backup_YYYYMMDD_HHMMSS[_mmm]
     pattern = f"{table_name_base}_backup_%"
     
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE ?", (pattern,))
@@ -194,110 +632,370 @@ def gerenciar_rotatividade_backups(conn, table_name_base):
     backups.sort(reverse=True)
     
     # Se houver mais que 3, apaga os excedentes (do índice 3 em diante)
-    if len(backups) > 3:
-        excedentes = backups[3:]
+    if len(backups) > GERACOES_BACKUP:
+        excedentes = backups[GERACOES_BACKUP:]
+        inicializar_tabela_backups(conn)
         for table_to_drop in excedentes:
             try:
                 cursor.execute(f"DROP TABLE {table_to_drop}")
+                cursor.execute("DELETE FROM backups_incrementais WHERE tabela_backup=?", (table_to_drop,))
                 print(f"♻️  Rotatividade: Backup antigo removido: {table_to_drop}")
             except Exception as e:
                 print(f"⚠️ Erro ao remover backup antigo {table_to_drop}: {e}")
         conn.commit()
 
 
-def atualizar_banco(db_path, symbol=None):
+def gerenciar_rotatividade_arquivos_backup(db_path):
+    """Mantém apenas os 3 arquivos de backup mais recentes do banco (modo 'arquivo')."""
+    base, _ = os.path.splitext(db_path)
+    arquivos = sorted(glob.glob(f"{base}_backup_*.db"), reverse=True)
+    for arquivo in arquivos[GERACOES_BACKUP:]:
+        try:
+            os.remove(arquivo)
+            print(f"♻️  Rotatividade: Backup antigo removido: {arquivo}")
+        except OSError as e:
+            print(f"⚠️ Erro ao remover backup antigo {arquivo}: {e}")
+
+
+def _carimbo_backup():
+    """YYYYMMDD_HHMMSS_mmm: dois backups no mesmo segundo (ex.: atualização seguida de importação) não colidem."""
+    return datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]
+
+
+def backup_arquivo(db_path):
+    """Copia o banco inteiro para <banco>_backup_YYYYMMDD_HHMMSS_mmm.db com a API de backup online do SQLite."""
+    base, _ = os.path.splitext(db_path)
+    destino = f"{base}_backup_{_carimbo_backup()}.db"
+    print(f"\n🗂️ Backup: {db_path} → {destino}")
+    conn_destino = sqlite3.connect(destino)
+    conectar(db_path).backup(conn_destino)
+    conn_destino.close()
+    gerenciar_rotatividade_arquivos_backup(db_path)
+    return destino
+
+
+def backup_tabela(conn, table_name, modo, inicio_ms=None, fim_ms=None):
     """
-    Atualiza TODOS os intervalos configurados para um par (ou seleciona um).
-    Realiza backup antes de atualizar e aplica rotatividade (Mantém 3 últimos).
+    Backup de uma tabela de candles antes da atualização (modos 'incremental' ou 'completo').
+    Incremental: guarda os candles de [inicio_ms, fim_ms] (padrão: do último timestamp em diante).
     """
-    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
+    cursor.execute(f"SELECT MAX(timestamp) FROM {table_name}")
+    ultimo_timestamp = cursor.fetchone()[0]
+    if ultimo_timestamp is None:
+        return None
+    if inicio_ms is None:
+        inicio_ms, fim_ms = ultimo_timestamp, None
+
+    carimbo = _carimbo_backup()
+    backup_table = f"{table_name}_backup_{carimbo}"
+    # Mesmo milissegundo: acrescenta um contador
+    contador = 1
+    while cursor.execute("SELECT 1 FROM sqlite_master WHERE name=?", (backup_table,)).fetchone():
+        contador += 1
+        backup_table = f"{table_name}_backup_{carimbo}_{contador}"
+    print(f"\n🗂️ Backup ({modo}): {table_name} → {backup_table}")
+    if modo == "incremental":
+        inicializar_tabela_backups(conn)
+        cursor.execute(
+            f"CREATE TABLE {backup_table} AS SELECT * FROM {table_name} WHERE timestamp >= ? AND timestamp <= ?",
+            (inicio_ms, ultimo_timestamp if fim_ms is None else fim_ms)
+        )
+        cursor.execute(
+            "INSERT OR REPLACE INTO backups_incrementais (tabela_backup, tabela, ultimo_timestamp, data_backup, fim_timestamp) VALUES (?, ?, ?, ?, ?)",
+            (backup_table, table_name, inicio_ms, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), fim_ms)
+        )
+    else:
+        cursor.execute(f"CREATE TABLE {backup_table} AS SELECT * FROM {table_name}")
+    conn.commit()
+
+    # Chama a função de limpeza automática
+    gerenciar_rotatividade_backups(conn, table_name)
+    return backup_table
+
+
+def backup_antes_de_regravar(db_path, simbolo, intervalo, inicio_ms, fim_ms=None):
+    """
+    Backup (conforme "modo_backup") antes de uma gravação que pode alterar candles já existentes
+    em [inicio_ms, fim_ms] (fim_ms=None: até o fim da tabela), como reparo de lacunas ou backfill.
+    """
+    modo_backup = obter_modo_backup()
+    if modo_backup == "arquivo":
+        return backup_arquivo(db_path)
+    table_name = f"candles_{simbolo.lower()}_{intervalo}"
+    conn = conectar(db_path)
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name=?", (table_name,)
+    ).fetchone()
+    backup_table = backup_tabela(conn, table_name, modo_backup, inicio_ms, fim_ms) if existe else None
+    conn.close()
+    return backup_table
+
+
+def listar_backups(db_path):
+    """Backups de tabelas de candles, do mais recente ao mais antigo: [{tabela_backup, tabela, inicio, fim, data}]."""
+    conn = conectar(db_path)
+    inicializar_tabela_backups(conn)
+    faixas = {
+        tabela_backup: (inicio, fim, data)
+        for tabela_backup, inicio, fim, data in conn.execute(
+            "SELECT tabela_backup, ultimo_timestamp, fim_timestamp, data_backup FROM backups_incrementais"
+        )
+    }
+    nomes = [nome for (nome,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'candles_%_backup_%'"
+    )]
+    conn.commit()
+    conn.close()
+
+    backups = []
+    for nome in nomes:
+        tabela, data = nome.split("_backup_")
+        inicio, fim, data_backup = faixas.get(nome, (None, None, None))
+        backups.append({
+            "tabela_backup": nome, "tabela": tabela, "inicio": inicio, "fim": fim,
+            "data": data_backup or datetime.strptime(data[:15], "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    return sorted(backups, key=lambda b: b["tabela_backup"].split("_backup_")[1], reverse=True)
+
+
+def restaurar_backup(db_path, backup_table):
+    """
+    Volta a tabela de candles ao estado do backup (incremental ou completo).
+    Incremental: remove os candles da faixa salva no backup e regrava as linhas salvas.
+    Vários backups da mesma tabela são desfeitos do mais recente para o mais antigo.
+    """
+    from downloader import TABELA_BLOCOS_BACKFILL, inicializar_blocos_backfill
+    from backtest_continuo import invalidar_backtest_continuo
+
+    conn = conectar(db_path)
+    inicializar_tabela_backups(conn)
+    inicializar_blocos_backfill(conn)
+    registro = conn.execute(
+        "SELECT tabela, ultimo_timestamp, fim_timestamp FROM backups_incrementais WHERE tabela_backup=?", (backup_table,)
+    ).fetchone()
+    if registro:
+        table_name, ultimo_timestamp, fim_timestamp = registro
+    else:
+        table_name, ultimo_timestamp, fim_timestamp = backup_table.split("_backup_")[0], None, None
+    # Faixa regravada pela restauração (backup completo: a tabela inteira)
+    inicio_faixa = -1 if ultimo_timestamp is None else ultimo_timestamp
+    fim_faixa = (1 << 62) if fim_timestamp is None else fim_timestamp
+
+    # No layout unificado a tabela é uma VIEW: grava direto na tabela única
+    inicializar_catalogo(conn)
+    prefixo, destino, filtro = (), table_name, ""
+    if layout_unificado(conn):
+        _, simbolo, intervalo = table_name.split("_")
+        prefixo = ids_serie_unificada(conn, simbolo, intervalo)
+        conn.commit()
+        destino, filtro = TABELA_UNIFICADA, "simbolo_id = ? AND intervalo_id = ? AND "
+    colunas = ", ".join(COLUNAS_CANDLES)
+    colunas_destino = ("simbolo_id, intervalo_id, " if prefixo else "") + colunas
+    marcadores = "?, ?, " if prefixo else ""
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN")
+        cursor.execute(
+            f"DELETE FROM {destino} WHERE {filtro}timestamp BETWEEN ? AND ?", prefixo + (inicio_faixa, fim_faixa)
+        )
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {destino} ({colunas_destino}) SELECT {marcadores}{colunas} FROM {backup_table}",
+            prefixo
+        )
+        _, simbolo, intervalo = table_name.split("_")
+        recalcular_catalogo(cursor, simbolo, intervalo)
+        # Blocos de backfill com candles removidos deixam de contar como concluídos
+        cursor.execute(
+            f"DELETE FROM {TABELA_BLOCOS_BACKFILL} WHERE simbolo = ? AND intervalo = ? AND fim_ms >= ? AND inicio_ms <= ?",
+            (simbolo.upper(), intervalo, inicio_faixa, fim_faixa)
+        )
+        cursor.execute("COMMIT")
+    except Exception:
+        conn.rollback()
+        raise
+    conn.close()
+
+    atualizar_caches_candles(db_path, simbolo, intervalo, desde_ms=max(inicio_faixa, 0))
+    invalidar_backtest_continuo(db_path, simbolo, intervalo, max(inicio_faixa, 0))
+    print(f"✅ {table_name} restaurada a partir de {backup_table}.")
+
+
+def atualizar_banco(db_path, symbol=None, fonte=None):
+    """
+    Atualiza TODOS os intervalos configurados para um par ou uma lista de pares (ou seleciona um).
+    Realiza backup antes de atualizar e aplica rotatividade (Mantém 3 últimos).
+    Os downloads de todos os pares/intervalos rodam em paralelo dentro do limite de peso da Binance
+    (ver downloader.py); os intervalos derivados são agregados do 1m depois.
+    fonte: FonteCandles usada nos downloads (padrão: a configurada, ver fontes.py).
+    """
+    from downloader import baixar_series
 
     # === Selecionar símbolo interativamente, se não informado ===
     if not symbol:
         symbol = selecionar_par_interativo(db_path)
         if not symbol:
             print("❌ Nenhum par selecionado. Operação cancelada.")
-            conn.close()
             return
 
-    conn.close() # Fechar aqui pois importar_candles abre sua própria conexão
-    symbols = [symbol.upper()]
+    symbols = [s.upper() for s in ([symbol] if isinstance(symbol, str) else symbol)]
 
-    for sym in symbols:
-        for interval_key, interval in interval_map.items():
-            table_name = f"candles_{sym.lower()}_{interval_key}"
-            
-            # --- Lógica de Backup com Rotatividade ---
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'")
-            existe = cursor.fetchone()
-
-            if existe:
-                cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-                row_count = cursor.fetchone()[0]
-
-                if row_count > 0:
-                    timestamp_str = datetime.now().strftime('%Y%m%d_%H%M%S')
-                    backup_table = f"{table_name}_backup_{timestamp_str}"
-                    print(f"\n🗂️ Backup: {table_name} → {backup_table}")
-                    cursor.execute(f"CREATE TABLE {backup_table} AS SELECT * FROM {table_name}")
-                    conn.commit()
-                    
-                    # Chama a função de limpeza automática
-                    gerenciar_rotatividade_backups(conn, table_name)
-            
-            conn.close()
-            # ------------------------------------------------
+    # Intervalos personalizados vêm depois do 1m (são sempre agregados localmente)
+    intervalos = list(interval_map) + intervalos_personalizados()
+    derivar = derivar_intervalos_ativo()
 
-            # Chama a função unificada de importação
-            inseridos = importar_candles_binance(db_path, sym, interval)
-            
-            if inseridos > 0:
-                print(f"✅ {sym} ({interval}): {inseridos} novos candles.")
+    modo_backup = obter_modo_backup()
+    if modo_backup == "arquivo":
+        # Uma cópia do banco inteiro cobre todos os intervalos
+        backup_arquivo(db_path)
+    else:
+        # --- Lógica de Backup com Rotatividade ---
+        conn = conectar(db_path)
+        cursor = conn.cursor()
+        for sym in symbols:
+            for interval_key in intervalos:
+                table_name = f"candles_{sym.lower()}_{interval_key}"
+                cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name=?", (table_name,))
+                if cursor.fetchone():
+                    backup_tabela(conn, table_name, modo_backup)
+        conn.close()
+
+    # 1) Download: o 1m (e, sem derivação, todos os intervalos da Binance)
+    # Upsert: o último candle salvo pode ter sido gravado ainda aberto
+    baixar_series(db_path, [
+        (sym, interval_key) for sym in symbols for interval_key in interval_map
+        if interval_key == INTERVALO_BASE or not derivar
+    ], fonte=fonte)
+
+    # 2) Intervalos maiores: agregados do 1m recém-atualizado, sem chamada à API
+    sem_base = []
+    for sym in symbols:
+        for interval_key in intervalos:
+            if interval_key == INTERVALO_BASE or (interval_key in interval_map and not derivar):
+                continue
+            inseridos = atualizar_intervalo_derivado(
+                db_path, sym, interval_key, completo_se_vazio=interval_key not in interval_map
+            )
+            if inseridos is not None:
+                print(f"✅ {sym} ({interval_key}): {inseridos} novos candles (agregados do {INTERVALO_BASE}).")
+            elif interval_key not in interval_map:
+                print(f"⚠️ {sym} ({interval_key}): sem candles de {INTERVALO_BASE} para agregar.")
             else:
-                print(f"ℹ️ {sym} ({interval}): Sem novos dados.")
+                sem_base.append((sym, interval_key))
 
-            time.sleep(1.2)  # Respeitar limite da Binance
+    # 3) Sem 1m suficiente (tabela nova ou 1m mais curto): baixa da Binance
+    baixar_series(db_path, sem_base, fonte=fonte)
 
     print("\n✅ Atualização automática concluída.")
 
 
-def carregar_candles(db_path, simbolo, intervalo, data_inicial, data_final):
+# Tipos lidos diretamente do SQLite (evita inferência de tipos coluna a coluna)
+TIPOS_COLUNAS_CANDLES = {
+    "timestamp": "int64",
+    "open": "float64",
+    "high": "float64",
+    "low": "float64",
+    "close": "float64",
+    "volume": "float64",
+}
+
+
+def data_para_epoch_ms(data):
+    """Converte 'YYYY-MM-DD HH:MM:SS' (ou datetime) em epoch em milissegundos, como gravado pela Binance."""
+    return int(pd.Timestamp(data).value // 1_000_000)
+
+
+def carregar_candles(db_path, simbolo, intervalo, data_inicial, data_final, barras_aquecimento=0):
     """
     Carrega os candles da tabela correspondente ao par e intervalo.
-    Converte automaticamente timestamps numéricos (epoch ms) para datetime.
+    O período é filtrado no próprio SQLite (WHERE timestamp BETWEEN ? AND ? sobre a chave primária),
+    então só as linhas do intervalo pedido são lidas.
+
+    barras_aquecimento: quantidade de candles ANTERIORES a data_inicial incluídos no início do
+    resultado, para que os indicadores (Bollinger, EMA, RSI) já estejam válidos no primeiro candle
+    do período. A quantidade efetivamente incluída fica em df.attrs["barras_aquecimento"].
     """
     nome_tabela = f"candles_{simbolo.lower()}_{intervalo}"
 
     try:
-        conn = sqlite3.connect(db_path)
+        conn = conectar(db_path)
+
+        # Tabelas antigas podem ter o timestamp gravado como texto: mantém o filtro em pandas
+        tipo = conn.execute(f"SELECT typeof(timestamp) FROM {nome_tabela} LIMIT 1").fetchone()
+        if tipo and tipo[0] == "text":
+            conn.close()
+            return _carregar_candles_timestamp_texto(db_path, nome_tabela, data_inicial, data_final)
+
+        inicio_ms = data_para_epoch_ms(data_inicial)
+        fim_ms = data_para_epoch_ms(data_final)
+
+        # Colunas em memmap (opcional): busca binária no timestamp, sem conversão de linhas do SQLite
+        if cache_memmap_ativo():
+            lido = fatia_memmap(db_path, simbolo, intervalo, inicio_ms, fim_ms, list(TIPOS_COLUNAS_CANDLES), barras_aquecimento)
+            if lido is not None:
+                colunas, aquecimento = lido
+                conn.close()
+                df = pd.DataFrame({c: np.array(v) for c, v in colunas.items()})
+                df.attrs["barras_aquecimento"] = aquecimento
+                df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
+                return df
+
+        # Cache Parquet (opcional): lê só as partições/colunas do período, se estiver em dia com o banco
+        if cache_parquet_ativo():
+            lido = ler_cache_parquet(db_path, simbolo, intervalo, inicio_ms, fim_ms, list(TIPOS_COLUNAS_CANDLES), barras_aquecimento)
+            if lido is not None:
+                df, aquecimento = lido
+                conn.close()
+                df = df.astype(TIPOS_COLUNAS_CANDLES)
+                df.attrs["barras_aquecimento"] = aquecimento
+                df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
+                return df
+
+        if barras_aquecimento:
+            inicio_leitura = conn.execute(f"""
+                SELECT MIN(timestamp) FROM (
+                    SELECT timestamp FROM {nome_tabela}
+                    WHERE timestamp < ?
+                    ORDER BY timestamp DESC
+                    LIMIT ?
+                )
+            """, (inicio_ms, int(barras_aquecimento))).fetchone()[0]
+            if inicio_leitura is None:
+                inicio_leitura = inicio_ms
+        else:
+            inicio_leitura = inicio_ms
+
         query = f"""
             SELECT timestamp, open, high, low, close, volume
             FROM {nome_tabela}
+            WHERE timestamp BETWEEN ? AND ?
             ORDER BY timestamp ASC
         """
-        df = pd.read_sql_query(query, conn)
+        df = pd.read_sql_query(query, conn, params=(inicio_leitura, fim_ms), dtype=TIPOS_COLUNAS_CANDLES)
         conn.close()
 
-        if df.empty:
-            return df
-
-        # Detectar e converter epoch (em milissegundos) para datetime
-        if pd.api.types.is_numeric_dtype(df["timestamp"]):
-            df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms", errors="coerce")
-        else:
-            df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-
-        # Filtrar pelo intervalo de datas informado
-        data_inicial_dt = pd.to_datetime(data_inicial)
-        data_final_dt = pd.to_datetime(data_final)
-        df = df[(df["timestamp"] >= data_inicial_dt) & (df["timestamp"] <= data_final_dt)]
-
+        df.attrs["barras_aquecimento"] = int((df["timestamp"] < inicio_ms).sum()) if not df.empty else 0
+        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
         return df
 
     except Exception as e:
         print(f"❌ Erro ao carregar dados da tabela {nome_tabela}: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
+
+
+def _carregar_candles_timestamp_texto(db_path, nome_tabela, data_inicial, data_final):
+    """Leitura completa + filtro em pandas para tabelas com timestamp em texto."""
+    conn = conectar(db_path)
+    query = f"""
+        SELECT timestamp, open, high, low, close, volume
+        FROM {nome_tabela}
+        ORDER BY timestamp ASC
+    """
+    df = pd.read_sql_query(query, conn)
+    conn.close()
+
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+    df = df[(df["timestamp"] >= pd.to_datetime(data_inicial)) & (df["timestamp"] <= pd.to_datetime(data_final))]
+    df.attrs["barras_aquecimento"] = 0
+    return df
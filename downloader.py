@@ -0,0 +1,295 @@
+﻿import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from config import ler_config
+from armazenamento import conectar
+from agregacao import duracao_intervalo_ms
+from db_utils import (
+    criar_tabela_candles, gravar_candles, atualizar_caches_candles, backup_antes_de_regravar, TAMANHO_LOTE_INSERCAO
+)
+from fontes import LIMITE_KLINES, ErroFonteCandles, criar_fonte
+from backtest_continuo import invalidar_backtest_continuo
+
+# === Download concorrente de candles (vários pares/intervalos) ===
+# Cada série (par, intervalo) é paginada por uma thread; todas pedem klines à mesma fonte
+# (ver fontes.py: a FonteBinance divide um limitador de peso calibrado pelo limite por minuto da
+# Binance), e um único gravador consome as páginas de uma fila e grava em lotes (uma conexão SQLite escrevendo).
+# Configuração (app_config.json): "downloads_simultaneos" (e as chaves da fonte, em fontes.py).
+# backfill_serie baixa um período longo de uma série dividido em blocos paralelos (retomável).
+
+DOWNLOADS_SIMULTANEOS = 4
+PAGINAS_POR_BLOCO = 5           # Páginas por bloco do backfill (5 x 1000 = um lote de gravação)
+TABELA_BLOCOS_BACKFILL = "blocos_backfill"
+
+
+def _baixar_serie(fonte, simbolo, intervalo, inicio_ms, fila):
+    """Pagina a série de inicio_ms até o candle atual, enviando cada página ao gravador."""
+    paginas = 0
+    for klines in fonte.historico(simbolo, intervalo, inicio_ms):
+        fila.put((simbolo, intervalo, klines))
+        paginas += 1
+    return paginas
+
+
+def _gravador(db_path, fila, novos, primeiros, tamanho_lote, erros):
+    """Único escritor: junta páginas por série e grava (upsert) quando o lote enche ou a fila esvazia."""
+    conn = conectar(db_path)
+    pendentes = {}
+    acumulados = 0
+    terminou = False
+    try:
+        while not terminou:
+            try:
+                item = fila.get(timeout=0.5)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                terminou = True
+            elif item:
+                simbolo, intervalo, klines = item
+                pendentes.setdefault((simbolo, intervalo), []).extend(klines)
+                acumulados += len(klines)
+                if acumulados < tamanho_lote:
+                    continue
+
+            for (simbolo, intervalo), candles in pendentes.items():
+                tabela = f"candles_{simbolo.lower()}_{intervalo}"
+                novos[(simbolo, intervalo)] += gravar_candles(conn, tabela, candles, "upsert", tamanho_lote)
+                menor = min(int(c[0]) for c in candles)
+                primeiros[(simbolo, intervalo)] = min(primeiros.get((simbolo, intervalo), menor), menor)
+            pendentes = {}
+            acumulados = 0
+    except Exception as e:
+        erros.append(e)
+        # Mantém a fila andando para as threads de download não travarem
+        while fila.get() is not None:
+            pass
+    finally:
+        conn.close()
+
+
+def _threads_download(n_workers):
+    return n_workers or int(ler_config().get("downloads_simultaneos", DOWNLOADS_SIMULTANEOS))
+
+
+def baixar_series(db_path, series, n_workers=None, fonte=None, tamanho_lote=TAMANHO_LOTE_INSERCAO):
+    """
+    Baixa em paralelo as séries [(PAR, intervalo)], cada uma a partir do seu último candle
+    (que é regravado, pois pode ter sido salvo ainda aberto) ou, se vazia, os últimos LIMITE_KLINES candles.
+    fonte: FonteCandles (padrão: a configurada em "fonte_candles").
+    Retorna {(PAR, intervalo): candles novos}.
+    """
+    n_workers = _threads_download(n_workers)
+    series = [(simbolo.upper(), intervalo) for simbolo, intervalo in series]
+    if not series:
+        return {}
+
+    conn = conectar(db_path)
+    cursor = conn.cursor()
+    agora = int(time.time() * 1000)
+    inicios = {}
+    for simbolo, intervalo in series:
+        tabela = f"candles_{simbolo.lower()}_{intervalo}"
+        criar_tabela_candles(cursor, tabela)
+        ultimo = cursor.execute(f"SELECT MAX(timestamp) FROM {tabela}").fetchone()[0]
+        inicios[(simbolo, intervalo)] = ultimo if ultimo else agora - LIMITE_KLINES * duracao_intervalo_ms(intervalo)
+    conn.commit()
+    conn.close()
+
+    fila = queue.Queue(maxsize=n_workers * 4)
+    novos = {serie: 0 for serie in series}
+    primeiros, erros_gravacao = {}, []
+    gravador = threading.Thread(target=_gravador, args=(db_path, fila, novos, primeiros, tamanho_lote, erros_gravacao))
+    gravador.start()
+
+    falhas = {}
+    fonte_propria = fonte is None
+    fonte = fonte or criar_fonte(n_workers)
+    try:
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            tarefas = {
+                executor.submit(_baixar_serie, fonte, simbolo, intervalo, inicios[(simbolo, intervalo)], fila): (simbolo, intervalo)
+                for simbolo, intervalo in series
+            }
+            try:
+                for tarefa, serie in tarefas.items():
+                    try:
+                        tarefa.result()
+                    except ErroFonteCandles as e:
+                        falhas[serie] = e
+            finally:
+                # Ctrl+C ou erro inesperado: descarta as séries ainda na fila; o with só espera as que já estão baixando
+                executor.shutdown(wait=False, cancel_futures=True)
+    finally:
+        fila.put(None)
+        gravador.join()
+        if fonte_propria:
+            fonte.fechar()
+    if erros_gravacao:
+        raise erros_gravacao[0]
+
+    for (simbolo, intervalo), desde in primeiros.items():
+        atualizar_caches_candles(db_path, simbolo, intervalo, desde_ms=desde)
+    for simbolo, intervalo in series:
+        if (simbolo, intervalo) in falhas:
+            print(f"❌ Erro ao baixar {simbolo} ({intervalo}): {falhas[(simbolo, intervalo)]}")
+        elif novos[(simbolo, intervalo)] > 0:
+            print(f"✅ {simbolo} ({intervalo}): {novos[(simbolo, intervalo)]} novos candles.")
+        else:
+            print(f"ℹ️ {simbolo} ({intervalo}): Sem novos dados.")
+    return novos
+
+
+# === Backfill histórico em blocos (retomável) ===
+# [inicio, agora] é dividido em blocos de PAGINAS_POR_BLOCO páginas, alinhados a múltiplos do
+# tamanho do bloco (a mesma grade em qualquer execução). Os blocos são baixados em paralelo e cada
+# um é gravado assim que chega; blocos completos (já fechados) ficam registrados em blocos_backfill,
+# então um backfill interrompido recomeça só pelos blocos que faltam. O registro é feito depois da
+# gravação: se o programa cair entre as duas, o bloco é baixado de novo e regravado (upsert).
+
+def inicializar_blocos_backfill(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_BLOCOS_BACKFILL} (
+            simbolo TEXT NOT NULL,
+            intervalo TEXT NOT NULL,
+            inicio_ms INTEGER NOT NULL,
+            fim_ms INTEGER NOT NULL,
+            candles INTEGER NOT NULL,
+            concluido_em TEXT NOT NULL,
+            PRIMARY KEY (simbolo, intervalo, inicio_ms, fim_ms)
+        ) WITHOUT ROWID
+    """)
+
+
+def dividir_blocos(inicio_ms, fim_ms, duracao, paginas_por_bloco=PAGINAS_POR_BLOCO):
+    """Blocos [início, fim] (ms, inclusivos) que cobrem [inicio_ms, fim_ms]; o primeiro começa em inicio_ms."""
+    tamanho = paginas_por_bloco * LIMITE_KLINES * duracao
+    return [
+        (max(bloco, inicio_ms), min(bloco + tamanho - 1, fim_ms))
+        for bloco in range(inicio_ms // tamanho * tamanho, fim_ms + 1, tamanho)
+    ]
+
+
+def _baixar_bloco(fonte, simbolo, intervalo, inicio_ms, fim_ms, fila):
+    """Pagina um bloco inteiro e o envia ao gravador de uma vez (o bloco só conta como concluído completo)."""
+    klines = [k for pagina in fonte.historico(simbolo, intervalo, inicio_ms, fim_ms) for k in pagina]
+    fila.put((inicio_ms, fim_ms, klines))
+
+
+def _gravador_blocos(db_path, simbolo, intervalo, fila, agora, ultimo_existente, resultado, erros):
+    """
+    Único escritor do backfill: grava cada bloco ao chegar e registra os blocos já fechados.
+    Candles anteriores ao último já gravado (ultimo_existente) estão fechados e só são inseridos;
+    do último em diante são sobrescritos (ele pode ter sido salvo ainda aberto).
+    """
+    tabela = f"candles_{simbolo.lower()}_{intervalo}"
+    conn = conectar(db_path)
+    try:
+        while True:
+            item = fila.get()
+            if item is None:
+                break
+            inicio_ms, fim_ms, klines = item
+            if klines:
+                corte = len(klines) if ultimo_existente is None else next(
+                    (i for i, k in enumerate(klines) if int(k[0]) >= ultimo_existente), len(klines)
+                )
+                # Cada parte do bloco numa transação
+                if corte:
+                    resultado["novos"] += gravar_candles(conn, tabela, klines[:corte], "ignorar", corte)
+                if corte < len(klines):
+                    resultado["novos"] += gravar_candles(conn, tabela, klines[corte:], "upsert", len(klines) - corte)
+                resultado["primeiro"] = min(resultado.get("primeiro", int(klines[0][0])), int(klines[0][0]))
+            # O bloco do candle atual (ainda aberto) não é registrado: a próxima execução o completa
+            if fim_ms < agora:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {TABELA_BLOCOS_BACKFILL} VALUES (?, ?, ?, ?, ?, ?)",
+                    (simbolo, intervalo, inicio_ms, fim_ms, len(klines), datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                )
+                conn.commit()
+            resultado["blocos"] += 1
+    except Exception as e:
+        erros.append(e)
+        while fila.get() is not None:
+            pass
+    finally:
+        conn.close()
+
+
+def backfill_serie(db_path, simbolo, intervalo, inicio_ms, n_workers=None, fonte=None, paginas_por_bloco=PAGINAS_POR_BLOCO):
+    """
+    Baixa o histórico de uma série de inicio_ms até agora em blocos paralelos, retomando um
+    backfill anterior (blocos já registrados são pulados). Retorna a quantidade de candles novos.
+    """
+    n_workers = _threads_download(n_workers)
+    simbolo = simbolo.upper()
+    duracao = duracao_intervalo_ms(intervalo)
+    agora = int(time.time() * 1000)
+
+    tabela = f"candles_{simbolo.lower()}_{intervalo}"
+    conn = conectar(db_path)
+    criar_tabela_candles(conn.cursor(), tabela)
+    ultimo_existente = conn.execute(f"SELECT MAX(timestamp) FROM {tabela}").fetchone()[0]
+    inicializar_blocos_backfill(conn)
+    concluidos = set(conn.execute(
+        f"SELECT inicio_ms, fim_ms FROM {TABELA_BLOCOS_BACKFILL} WHERE simbolo = ? AND intervalo = ?",
+        (simbolo, intervalo)
+    ).fetchall())
+    conn.commit()
+    conn.close()
+
+    blocos = dividir_blocos(int(inicio_ms), agora, duracao, paginas_por_bloco)
+    pendentes = [b for b in blocos if b not in concluidos]
+    # Só candles a partir do último gravado podem ser sobrescritos: o backup guarda apenas essa faixa.
+    # Numa retomada, o backup da primeira execução já guarda o estado anterior
+    if len(pendentes) == len(blocos) and ultimo_existente is not None and ultimo_existente >= inicio_ms:
+        backup_antes_de_regravar(db_path, simbolo, intervalo, ultimo_existente)
+    if len(pendentes) < len(blocos):
+        print(f"🔁 {simbolo} ({intervalo}): retomando backfill, {len(blocos) - len(pendentes)} de {len(blocos)} blocos já concluídos.")
+    print(f"⬇️ {simbolo} ({intervalo}): baixando {len(pendentes)} blocos de até {paginas_por_bloco * LIMITE_KLINES} candles...")
+
+    fila = queue.Queue(maxsize=n_workers * 2)
+    resultado, erros_gravacao = {"novos": 0, "blocos": 0}, []
+    gravador = threading.Thread(target=_gravador_blocos, args=(db_path, simbolo, intervalo, fila, agora, ultimo_existente, resultado, erros_gravacao))
+    gravador.start()
+
+    falha = None
+    fonte_propria = fonte is None
+    fonte = fonte or criar_fonte(n_workers)
+    try:
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            tarefas = [
+                executor.submit(_baixar_bloco, fonte, simbolo, intervalo, inicio, fim, fila)
+                for inicio, fim in pendentes
+            ]
+            try:
+                for tarefa in as_completed(tarefas):
+                    try:
+                        tarefa.result()
+                    except ErroFonteCandles as e:
+                        # Erro definitivo (tentativas esgotadas ou 4xx): não adianta seguir com os demais blocos
+                        falha = e
+                        break
+            finally:
+                # Falha definitiva ou Ctrl+C: descarta os blocos ainda na fila; o with só espera os que já estão baixando
+                executor.shutdown(wait=False, cancel_futures=True)
+    finally:
+        fila.put(None)
+        gravador.join()
+        if fonte_propria:
+            fonte.fechar()
+    if erros_gravacao:
+        raise erros_gravacao[0]
+
+    if "primeiro" in resultado:
+        atualizar_caches_candles(db_path, simbolo, intervalo, desde_ms=resultado["primeiro"])
+    if resultado["novos"]:
+        invalidar_backtest_continuo(db_path, simbolo, intervalo, resultado["primeiro"])
+    if falha is not None:
+        print(f"❌ Erro ao baixar {simbolo} ({intervalo}): {falha}")
+        print(f"⚠️ {resultado['blocos']} de {len(pendentes)} blocos gravados; execute de novo para retomar.")
+    else:
+        print(f"✅ {simbolo} ({intervalo}): {resultado['novos']} novos candles em {len(pendentes)} blocos.")
+    return resultado["novos"]
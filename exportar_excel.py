@@ -1,26 +1,15 @@
-﻿import sqlite3
+﻿from armazenamento import conectar
 import pandas as pd
 import os
-import re
+from db_utils import listar_series_candles
 
 def exportar_candles_para_excel(db_path):
     os.system('cls' if os.name == 'nt' else 'clear')
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    conn = conectar(db_path)
 
-    # Detectar tabelas do tipo candles_<symbol>_<interval>
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tabelas = [row[0] for row in cursor.fetchall()]
-
-    padrao = re.compile(r'^candles_([a-z0-9]+)_([a-z0-9]+)$')
-    disponiveis = []
-
-    for nome in tabelas:
-        match = padrao.match(nome)
-        if match:
-            symbol, intervalo = match.groups()
-            disponiveis.append((symbol.upper(), intervalo))
+    # Pares e intervalos com candles (tabelas candles_<symbol>_<interval> ou layout unificado)
+    disponiveis = listar_series_candles(db_path)
 
     if not disponiveis:
         print("⚠️ Nenhuma tabela de candles encontrada no banco.")
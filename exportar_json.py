@@ -1,18 +1,16 @@
 ﻿import os
-import sqlite3
+from armazenamento import conectar
 import json
 import pandas as pd
 from datetime import datetime, timedelta
-from db_utils import banco_possui_tabelas_candles, listar_pares_e_periodos
+from db_utils import banco_possui_tabelas_candles, listar_pares_e_periodos, listar_series_candles
 
 # === Exporta candles para JSON (.txt) ===
 def exportar_candles_para_json_txt(db_path, par=None, periodo=None, data_inicio=None, data_fim=None):
     try:
-        conn = sqlite3.connect(db_path)
+        conn = conectar(db_path)
 
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'candles_%'")
-        tabelas = [row[0] for row in cursor.fetchall()]
+        tabelas = [f"candles_{par.lower()}_{periodo}" for par, periodo in listar_series_candles(db_path)]
 
         if not tabelas:
             print("⚠️ Nenhuma tabela de candles encontrada no banco.")
@@ -0,0 +1,258 @@
+﻿import json
+import math
+import os
+import random
+import threading
+import time
+import zlib
+import numpy as np
+import requests
+from config import ler_config
+from agregacao import duracao_intervalo_ms
+
+# === Fontes de candles ===
+# Toda a ingestão (importar_candles_binance, downloader, reparo de lacunas) pede klines a uma
+# FonteCandles em vez de falar direto com a Binance. Implementações:
+#   FonteBinance   - API REST (GET /api/v3/klines) com limitador de peso e novas tentativas
+#   FonteReplay    - dumps gravados (<pasta>/<PAR>_<intervalo>.json, lista de klines da API)
+#   FonteSintetica - gerador determinístico, para medir a ingestão sem rede
+# Escolhida pela chave "fonte_candles" ("binance", "replay" ou "sintetica") do app_config.json;
+# "pasta_replay" indica a pasta dos dumps.
+
+URL_API_BINANCE = "https://api.binance.com"
+LIMITE_PESO_POR_MINUTO = 6000   # Limite de peso por IP (janela de 1 minuto) da API spot
+PESO_KLINES = 2                 # Peso de uma requisição GET /api/v3/klines
+LIMITE_KLINES = 1000            # Candles por página (máximo aceito pela Binance)
+TENTATIVAS_DOWNLOAD = 5
+CONEXOES_PADRAO = 4
+FONTES = ("binance", "replay", "sintetica")
+
+
+class ErroFonteCandles(Exception):
+    """Falha definitiva ao obter klines (tentativas esgotadas, par inválido, série sem gravação...)."""
+
+
+class LimitadorPeso:
+    """
+    Token bucket por peso de requisição, compartilhado entre threads.
+    A Binance zera o peso usado a cada janela fixa de 1 minuto: com reposição de (1 - rajada) do
+    limite ao longo da janela e no máximo 'rajada' do limite acumulado, nenhuma janela passa do limite.
+    """
+
+    def __init__(self, peso_por_janela=LIMITE_PESO_POR_MINUTO, janela_segundos=60.0, rajada=0.1):
+        self.peso_por_janela = peso_por_janela
+        self.taxa = peso_por_janela * (1 - rajada) / janela_segundos
+        self.capacidade = max(peso_por_janela * rajada, PESO_KLINES)
+        self.tokens = self.capacidade
+        self.ultimo = time.monotonic()
+        self.pausado_ate = 0.0
+        self.trava = threading.Lock()
+
+    def _repor(self, agora):
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.ultimo) * self.taxa)
+        self.ultimo = agora
+
+    def adquirir(self, peso):
+        """Bloqueia até haver peso disponível (e a pausa imposta pelo servidor terminar)."""
+        while True:
+            with self.trava:
+                agora = time.monotonic()
+                self._repor(agora)
+                if agora >= self.pausado_ate and self.tokens >= peso:
+                    self.tokens -= peso
+                    return
+                espera = max(self.pausado_ate - agora, (peso - self.tokens) / self.taxa)
+            time.sleep(espera)
+
+    def sincronizar(self, peso_usado):
+        """Ajusta pelo peso que o servidor informa já ter contado (X-MBX-USED-WEIGHT-1M)."""
+        with self.trava:
+            self._repor(time.monotonic())
+            self.tokens = min(self.tokens, self.peso_por_janela - peso_usado)
+
+    def pausar(self, segundos):
+        """Suspende todas as threads (HTTP 429/418 com Retry-After)."""
+        with self.trava:
+            self.pausado_ate = max(self.pausado_ate, time.monotonic() + segundos)
+            self.tokens = min(self.tokens, 0.0)
+
+
+def criar_limitador():
+    config = ler_config()
+    return LimitadorPeso(int(config.get("limite_peso_por_minuto", LIMITE_PESO_POR_MINUTO)))
+
+
+def _espera_backoff(tentativa):
+    """Backoff exponencial com jitter: ~0.5s, 1s, 2s... (máx. 30s)."""
+    return min(30.0, 0.5 * 2 ** tentativa) * random.uniform(0.5, 1.0)
+
+
+def requisitar_klines(sessao, limitador, url_base, simbolo, intervalo, inicio_ms, limite=LIMITE_KLINES, tentativas=TENTATIVAS_DOWNLOAD, fim_ms=None):
+    """
+    Uma página de klines a partir de inicio_ms (até fim_ms, se informado), respeitando o limitador.
+    Repete (com backoff) em erros de rede, 5xx e 429/418; outros erros HTTP são definitivos.
+    """
+    parametros = {"symbol": simbolo, "interval": intervalo, "startTime": int(inicio_ms), "limit": limite}
+    if fim_ms is not None:
+        parametros["endTime"] = int(fim_ms)
+    for tentativa in range(tentativas):
+        limitador.adquirir(PESO_KLINES)
+        try:
+            resposta = sessao.get(f"{url_base}/api/v3/klines", params=parametros, timeout=10)
+        except requests.RequestException:
+            if tentativa == tentativas - 1:
+                raise
+            time.sleep(_espera_backoff(tentativa))
+            continue
+
+        peso_usado = resposta.headers.get("X-MBX-USED-WEIGHT-1M")
+        if peso_usado is not None:
+            limitador.sincronizar(int(peso_usado))
+        if resposta.status_code == 200:
+            return resposta.json()
+        if resposta.status_code in (418, 429):
+            limitador.pausar(float(resposta.headers.get("Retry-After", _espera_backoff(tentativa))))
+        elif resposta.status_code < 500:
+            resposta.raise_for_status()
+        elif tentativa < tentativas - 1:
+            time.sleep(_espera_backoff(tentativa))
+    # Tentativas esgotadas (429/418 ou 5xx)
+    raise requests.HTTPError(f"HTTP {resposta.status_code} após {tentativas} tentativas", response=resposta)
+
+
+class FonteCandles:
+    """Interface das fontes: klines no formato da API da Binance, em ordem de abertura."""
+
+    nome = "fonte"
+
+    def klines(self, simbolo, intervalo, inicio_ms, fim_ms=None, limite=LIMITE_KLINES):
+        """Até 'limite' klines com abertura em [inicio_ms, fim_ms] (fim_ms=None: até o candle atual)."""
+        raise NotImplementedError
+
+    def historico(self, simbolo, intervalo, inicio_ms, fim_ms=None):
+        """Percorre [inicio_ms, fim_ms] página a página (uma lista de klines por página)."""
+        while fim_ms is None or inicio_ms <= fim_ms:
+            pagina = self.klines(simbolo, intervalo, inicio_ms, fim_ms)
+            if pagina:
+                yield pagina
+            if len(pagina) < LIMITE_KLINES:
+                return
+            inicio_ms = int(pagina[-1][0]) + 1
+
+    def fechar(self):
+        pass
+
+
+class FonteBinance(FonteCandles):
+    """API REST da Binance; thread-safe (uma sessão HTTP com 'conexoes' conexões reaproveitáveis)."""
+
+    nome = "binance"
+
+    def __init__(self, url_base=None, limitador=None, conexoes=CONEXOES_PADRAO):
+        self.url_base = (url_base or ler_config().get("url_api_binance", URL_API_BINANCE)).rstrip("/")
+        self.limitador = limitador or criar_limitador()
+        self.sessao = requests.Session()
+        self.sessao.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=conexoes))
+        self.sessao.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=conexoes))
+
+    def klines(self, simbolo, intervalo, inicio_ms, fim_ms=None, limite=LIMITE_KLINES):
+        try:
+            return requisitar_klines(
+                self.sessao, self.limitador, self.url_base, simbolo.upper(), intervalo, inicio_ms, limite, fim_ms=fim_ms
+            )
+        except requests.RequestException as e:
+            raise ErroFonteCandles(f"API da Binance: {e}") from e
+
+    def fechar(self):
+        self.sessao.close()
+
+
+class FonteReplay(FonteCandles):
+    """Dumps gravados (ver gravar_dump_klines): cada série é carregada uma vez e paginada em memória."""
+
+    nome = "replay"
+
+    def __init__(self, pasta=None):
+        self.pasta = pasta or ler_config().get("pasta_replay", "replay_klines")
+        self.series = {}
+        self.trava = threading.Lock()
+
+    def _serie(self, simbolo, intervalo):
+        chave = (simbolo.upper(), intervalo)
+        with self.trava:
+            if chave not in self.series:
+                arquivo = os.path.join(self.pasta, f"{chave[0]}_{intervalo}.json")
+                try:
+                    with open(arquivo, "r", encoding="utf-8") as f:
+                        klines = sorted(json.load(f), key=lambda k: k[0])
+                except OSError as e:
+                    raise ErroFonteCandles(f"Sem gravação de {chave[0]} ({intervalo}): {e}") from e
+                self.series[chave] = (np.array([k[0] for k in klines], dtype=np.int64), klines)
+            return self.series[chave]
+
+    def klines(self, simbolo, intervalo, inicio_ms, fim_ms=None, limite=LIMITE_KLINES):
+        timestamps, klines = self._serie(simbolo, intervalo)
+        i = int(np.searchsorted(timestamps, inicio_ms, side="left"))
+        j = len(klines) if fim_ms is None else int(np.searchsorted(timestamps, fim_ms, side="right"))
+        return klines[i:min(j, i + limite)]
+
+
+def kline_sintetico(simbolo, timestamp, duracao):
+    """Kline no formato da API (preços em texto) derivado só de (par, timestamp)."""
+    semente = (zlib.crc32(simbolo.encode()) % 1000) / 10
+    k = timestamp // duracao
+    fechamento = 100 + semente + 10 * math.sin(k / 50) + (k % 7) * 0.1
+    abertura = 100 + semente + 10 * math.sin((k - 1) / 50) + ((k - 1) % 7) * 0.1
+    maxima, minima = max(abertura, fechamento) + 0.5, min(abertura, fechamento) - 0.5
+    volume = 10 + k % 13
+    return [
+        timestamp, f"{abertura:.8f}", f"{maxima:.8f}", f"{minima:.8f}", f"{fechamento:.8f}", f"{volume:.8f}",
+        timestamp + duracao - 1, f"{volume * fechamento:.8f}", int(50 + k % 17),
+        f"{volume / 2:.8f}", f"{volume * fechamento / 2:.8f}", "0"
+    ]
+
+
+class FonteSintetica(FonteCandles):
+    """
+    Candles determinísticos de inicio_ms até fim_ms (None: o momento da consulta) para qualquer par.
+    latencia_segundos simula o tempo de resposta de cada página (medir a concorrência sem rede).
+    """
+
+    nome = "sintetica"
+
+    def __init__(self, inicio_ms=1577836800000, fim_ms=None, latencia_segundos=0.0):
+        self.inicio_ms, self.fim_ms = inicio_ms, fim_ms
+        self.latencia_segundos = latencia_segundos
+
+    def klines(self, simbolo, intervalo, inicio_ms, fim_ms=None, limite=LIMITE_KLINES):
+        if self.latencia_segundos:
+            time.sleep(self.latencia_segundos)
+        duracao = duracao_intervalo_ms(intervalo)
+        ultimo = self.fim_ms if self.fim_ms is not None else int(time.time() * 1000)
+        if fim_ms is not None:
+            ultimo = min(ultimo, fim_ms)
+        primeiro = -(-max(inicio_ms, self.inicio_ms) // duracao) * duracao
+        ultimo = min(ultimo, primeiro + (limite - 1) * duracao)
+        return [kline_sintetico(simbolo.upper(), t, duracao) for t in range(primeiro, ultimo + 1, duracao)]
+
+
+def criar_fonte(conexoes=None):
+    """Fonte configurada em "fonte_candles" (padrão: binance)."""
+    config = ler_config()
+    nome = config.get("fonte_candles", "binance")
+    if nome == "replay":
+        return FonteReplay(config.get("pasta_replay"))
+    if nome == "sintetica":
+        return FonteSintetica()
+    if nome not in FONTES:
+        print(f"⚠️ Fonte de candles desconhecida: {nome}. Usando a API da Binance.")
+    return FonteBinance(conexoes=conexoes or CONEXOES_PADRAO)
+
+
+def gravar_dump_klines(fonte, pasta, simbolo, intervalo, inicio_ms, fim_ms=None):
+    """Grava [inicio_ms, fim_ms] de uma série (de qualquer fonte) no formato lido pela FonteReplay."""
+    klines = [k for pagina in fonte.historico(simbolo, intervalo, inicio_ms, fim_ms) for k in pagina]
+    os.makedirs(pasta, exist_ok=True)
+    with open(os.path.join(pasta, f"{simbolo.upper()}_{intervalo}.json"), "w", encoding="utf-8") as f:
+        json.dump(klines, f)
+    return len(klines)
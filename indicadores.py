@@ -1,5 +1,7 @@
 import pandas as pd
 import numpy as np
+import math
+from collections import deque
 
 def calcular_bollinger(df, periodo=20, num_desvios=2):
     """
@@ -59,27 +61,18 @@ def calcular_rsi(df, periodo=14):
     
     return df
 
-def avaliar_tendencia_nota(df):
+def classificar_nota(notas):
     """
-    Atribui uma nota e um status ao mercado baseado no RSI.
-    
-    Classificacao solicitada:
-    - 01 a 20: Franca Queda
-    - 21 a 40: Queda
-    - 41 a 60: Lateralizando
-    - 61 a 80: Subida
-    - 81 a 99: Franca Subida
+    Classifica notas de tendencia (0-100) nos 5 status de mercado.
+    Aceita Series ou arrays NumPy; retorna um array NumPy de strings.
     """
-    # Define a nota como o valor arredondado do RSI
-    df['nota_tendencia'] = df['rsi'].round(2)
-
     # Logica de classificacao vetorial (numpy select para performance)
     condicoes = [
-        (df['nota_tendencia'] <= 20),
-        (df['nota_tendencia'] > 20) & (df['nota_tendencia'] <= 40),
-        (df['nota_tendencia'] > 40) & (df['nota_tendencia'] <= 60),
-        (df['nota_tendencia'] > 60) & (df['nota_tendencia'] <= 80),
-        (df['nota_tendencia'] > 80)
+        (notas <= 20),
+        (notas > 20) & (notas <= 40),
+        (notas > 40) & (notas <= 60),
+        (notas > 60) & (notas <= 80),
+        (notas > 80)
     ]
 
     escolhas = [
@@ -90,7 +83,23 @@ def avaliar_tendencia_nota(df):
         "Franca Subida"
     ]
 
-    df['status_tendencia'] = np.select(condicoes, escolhas, default="Indefinido")
+    return np.select(condicoes, escolhas, default="Indefinido")
+
+def avaliar_tendencia_nota(df):
+    """
+    Atribui uma nota e um status ao mercado baseado no RSI.
+    
+    Classificacao solicitada:
+    - 01 a 20: Franca Queda
+    - 21 a 40: Queda
+    - 41 a 60: Lateralizando
+    - 61 a 80: Subida
+    - 81 a 99: Franca Subida
+    """
+    # Define a nota como o valor arredondado do RSI
+    df['nota_tendencia'] = df['rsi'].round(2)
+
+    df['status_tendencia'] = classificar_nota(df['nota_tendencia'])
     
     return df
 
@@ -111,4 +120,292 @@ def enriquecer_dados_analise(df):
     df = calcular_rsi(df)
     df = avaliar_tendencia_nota(df)
     
-    return df
\ No newline at end of file
+    return df
+
+# ======================================================================
+# Indicadores incrementais (streaming)
+# ----------------------------------------------------------------------
+# Consomem um candle por vez em O(1) e reproduzem exatamente (bit a bit)
+# os valores das versoes em lote acima. Para isso replicam os algoritmos
+# usados internamente pelo pandas: soma de Kahan na media movel, Welford
+# com Kahan no desvio padrao e a recorrencia do ewm(adjust=False).
+# O estado completo pode ser salvo com para_dict() e restaurado com de_dict().
+# ======================================================================
+
+class _MediaDesvioMovel:
+    """Estado de rolling(window).mean() e rolling(window).std() do pandas (janela fixa)."""
+
+    # Operacao mal condicionada: restam no maximo ~3 digitos significativos
+    _TOL_CONDICIONAMENTO = float(np.finfo(np.float64).eps) * 1e3
+
+    def __init__(self, periodo):
+        self.periodo = periodo
+        self.janela = deque()
+        self.total = 0
+        # Media (soma de Kahan)
+        self.nobs_media = 0
+        self.soma = 0.0
+        self.negativos = 0
+        self.comp_soma_add = 0.0
+        self.comp_soma_rem = 0.0
+        self.iguais_consecutivos = 0
+        self.valor_anterior = 0.0
+        # Variancia (Welford + Kahan)
+        self.nobs_var = 0.0
+        self.media_var = 0.0
+        self.ssqdm = 0.0
+        self.comp_var_add = 0.0
+        self.comp_var_rem = 0.0
+        self.instavel = False
+
+    def _add_media(self, val):
+        if val == val:
+            self.nobs_media += 1
+            y = val - self.comp_soma_add
+            t = self.soma + y
+            self.comp_soma_add = t - self.soma - y
+            self.soma = t
+            if math.copysign(1.0, val) < 0:
+                self.negativos += 1
+            if val == self.valor_anterior:
+                self.iguais_consecutivos += 1
+            else:
+                self.iguais_consecutivos = 1
+            self.valor_anterior = val
+
+    def _remove_media(self, val):
+        if val == val:
+            self.nobs_media -= 1
+            y = - val - self.comp_soma_rem
+            t = self.soma + y
+            self.comp_soma_rem = t - self.soma - y
+            self.soma = t
+            if math.copysign(1.0, val) < 0:
+                self.negativos -= 1
+
+    def _add_var(self, val):
+        if val != val:
+            return
+        ssqdm_anterior = self.ssqdm
+        self.nobs_var = self.nobs_var + 1
+        media_anterior = self.media_var - self.comp_var_add
+        y = val - self.comp_var_add
+        t = y - self.media_var
+        self.comp_var_add = t + self.media_var - y
+        if self.nobs_var:
+            self.media_var = self.media_var + t / self.nobs_var
+        else:
+            self.media_var = 0
+        self.ssqdm = self.ssqdm + (val - media_anterior) * (val - self.media_var)
+        if ssqdm_anterior * self._TOL_CONDICIONAMENTO > self.ssqdm:
+            self.instavel = True
+
+    def _remove_var(self, val):
+        if val == val:
+            ssqdm_anterior = self.ssqdm
+            self.nobs_var = self.nobs_var - 1
+            if self.nobs_var:
+                media_anterior = self.media_var - self.comp_var_rem
+                y = val - self.comp_var_rem
+                t = y - self.media_var
+                self.comp_var_rem = t + self.media_var - y
+                self.media_var = self.media_var - t / self.nobs_var
+                self.ssqdm = self.ssqdm - (val - media_anterior) * (val - self.media_var)
+                if ssqdm_anterior * self._TOL_CONDICIONAMENTO > self.ssqdm:
+                    self.instavel = True
+            else:
+                self.media_var = 0
+                self.ssqdm = 0
+                self.instavel = False
+
+    def atualizar(self, val):
+        """Adiciona um valor e retorna (media, desvio) como em rolling(periodo)."""
+        val = float(val)
+        if self.total == 0:
+            self.valor_anterior = val
+
+        self.janela.append(val)
+        removido = self.janela.popleft() if len(self.janela) > self.periodo else None
+        self.total += 1
+
+        # --- Media ---
+        if removido is not None:
+            self._remove_media(removido)
+        self._add_media(val)
+
+        media = math.nan
+        if self.nobs_media >= self.periodo and self.nobs_media > 0:
+            media = self.soma / self.nobs_media
+            if self.iguais_consecutivos >= self.nobs_media:
+                media = self.valor_anterior
+            elif self.negativos == 0 and media < 0:
+                media = 0.0
+            elif self.negativos == self.nobs_media and media > 0:
+                media = 0.0
+
+        # --- Variancia ---
+        if removido is not None:
+            self._remove_var(removido)
+        if self.total > 1:
+            self._add_var(val)
+        if self.total == 1 or self.instavel:
+            # Primeira janela ou cancelamento catastrofico: recalcula a janela do zero
+            self.media_var = self.ssqdm = self.nobs_var = self.comp_var_add = self.comp_var_rem = 0.0
+            for v in self.janela:
+                self._add_var(v)
+            self.instavel = False
+
+        desvio = math.nan
+        if self.nobs_var >= max(self.periodo, 1) and self.nobs_var > 1:
+            variancia = self.ssqdm / (self.nobs_var - 1.0)
+            desvio = 0.0 if variancia < 0 else math.sqrt(variancia)
+
+        return media, desvio
+
+
+class _EWMIncremental:
+    """Estado de Series.ewm(com=..., adjust=False).mean() do pandas (ignore_na=False)."""
+
+    def __init__(self, com):
+        self.com = float(com)
+        self.alpha = 1. / (1. + self.com)
+        self.fator_antigo = 1. - self.alpha
+        self.peso_novo = self.alpha
+        self.ponderado = math.nan
+        self.iniciado = False
+
+    def atualizar(self, val):
+        val = float(val)
+        if not self.iniciado:
+            self.iniciado = True
+            self.ponderado = val
+            return self.ponderado
+
+        observado = val == val
+        if self.ponderado == self.ponderado:
+            peso_antigo = 1. * self.fator_antigo
+            if observado:
+                # Evita erros numericos em series constantes
+                if self.ponderado != val:
+                    peso_novo = self.peso_novo
+                    if self.com == 1:
+                        peso_novo = 1. - peso_antigo
+                    self.ponderado = peso_antigo * self.ponderado + peso_novo * val
+                    self.ponderado /= (peso_antigo + peso_novo)
+        elif observado:
+            self.ponderado = val
+        return self.ponderado
+
+
+class _IndicadorIncremental:
+    """Base dos indicadores incrementais publicos."""
+
+    def atualizar_lote(self, closes):
+        """Consome varios candles em sequencia; retorna a lista de valores."""
+        return [self.atualizar(close) for close in closes]
+
+
+class BollingerIncremental(_IndicadorIncremental):
+    """
+    Versao incremental de calcular_bollinger.
+    atualizar(close) retorna um dict com 'media', 'desvio', 'BB_up' e 'BB_down'.
+    """
+
+    def __init__(self, periodo=20, num_desvios=2):
+        self.num_desvios = num_desvios
+        self._estado = _MediaDesvioMovel(periodo)
+
+    def atualizar(self, close):
+        media, desvio = self._estado.atualizar(close)
+        return {
+            'media': media,
+            'desvio': desvio,
+            'BB_up': media + (desvio * self.num_desvios),
+            'BB_down': media - (desvio * self.num_desvios),
+        }
+
+    def para_dict(self):
+        return {'num_desvios': self.num_desvios, 'estado': dict(vars(self._estado), janela=list(self._estado.janela))}
+
+    @classmethod
+    def de_dict(cls, dados):
+        obj = cls(dados['estado']['periodo'], dados['num_desvios'])
+        vars(obj._estado).update(dados['estado'])
+        obj._estado.janela = deque(dados['estado']['janela'])
+        return obj
+
+
+class EMAIncremental(_IndicadorIncremental):
+    """Versao incremental de adicionar_ema_tendencia (ewm(span=periodo, adjust=False))."""
+
+    def __init__(self, periodo_ema):
+        self.periodo_ema = periodo_ema
+        self._estado = _EWMIncremental((periodo_ema - 1) / 2)
+
+    def atualizar(self, close):
+        return self._estado.atualizar(close)
+
+    def para_dict(self):
+        return {'periodo_ema': self.periodo_ema, 'estado': dict(vars(self._estado))}
+
+    @classmethod
+    def de_dict(cls, dados):
+        obj = cls(dados['periodo_ema'])
+        vars(obj._estado).update(dados['estado'])
+        return obj
+
+
+class RSIIncremental(_IndicadorIncremental):
+    """
+    Versao incremental de calcular_rsi (Wilder's Smoothing, NaN iniciais = 50).
+    atualizar(close) retorna o RSI ja preenchido.
+    """
+
+    def __init__(self, periodo=14):
+        self.periodo = periodo
+        self.close_anterior = None
+        self._ganhos = _EWMIncremental(periodo - 1)
+        self._perdas = _EWMIncremental(periodo - 1)
+
+    def atualizar(self, close):
+        close = float(close)
+        delta = math.nan if self.close_anterior is None else close - self.close_anterior
+        self.close_anterior = close
+
+        # Mesmo resultado de clip(lower=0) e -1 * clip(upper=0)
+        up = delta if delta != delta else max(delta, 0.0)
+        down = delta if delta != delta else -1 * min(delta, 0.0)
+
+        ewm_up = self._ganhos.atualizar(up)
+        ewm_down = self._perdas.atualizar(down)
+
+        # Divisao com a semantica do NumPy (x/0 = inf, 0/0 = NaN)
+        if ewm_down == 0:
+            rs = math.inf if ewm_up > 0 else math.nan
+        else:
+            rs = ewm_up / ewm_down
+
+        rsi = 100 - (100 / (1 + rs))
+        return 50.0 if rsi != rsi else rsi
+
+    def para_dict(self):
+        return {
+            'periodo': self.periodo,
+            'close_anterior': self.close_anterior,
+            'ganhos': dict(vars(self._ganhos)),
+            'perdas': dict(vars(self._perdas)),
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        obj = cls(dados['periodo'])
+        obj.close_anterior = dados['close_anterior']
+        vars(obj._ganhos).update(dados['ganhos'])
+        vars(obj._perdas).update(dados['perdas'])
+        return obj
+
+
+def nota_e_status(rsi):
+    """Nota (RSI arredondado como Series.round(2)) e status de um unico candle."""
+    nota = float(np.round(np.float64(rsi), 2))
+    return nota, str(classificar_nota(np.array([nota]))[0])
@@ -0,0 +1,159 @@
+﻿import numpy as np
+import pandas as pd
+from config import interval_map
+from armazenamento import conectar
+from agregacao import duracao_intervalo_ms, agregar_candles
+from fontes import ErroFonteCandles, criar_fonte
+from backtest_continuo import invalidar_backtest_continuo
+from memmap_candles import cache_memmap_ativo, abrir_memmap
+from db_utils import (
+    listar_series_candles, gravar_candles, atualizar_caches_candles,
+    COLUNAS_CANDLES, INTERVALO_BASE
+)
+
+# === Lacunas (candles faltando no meio da tabela) ===
+# importar_candles_binance só retoma a partir do MAX(timestamp): buracos no meio (falhas da API,
+# importações manuais com start_str posterior) nunca seriam preenchidos e distorcem Bollinger/RSI.
+# A varredura é um np.diff sobre a coluna de timestamps; o reparo baixa apenas as faixas faltantes.
+
+
+def _formatar(ms):
+    return pd.Timestamp(int(ms), unit="ms").strftime("%Y-%m-%d %H:%M")
+
+
+# Candles por bloco na varredura: blocos completos (COUNT pela chave primária) não são lidos
+BLOCO_VARREDURA = 100_000
+
+
+def _lacunas_em(timestamps, duracao):
+    """np.diff sobre timestamps ordenados: [(primeiro ausente, último ausente, quantidade)]."""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if len(timestamps) < 2:
+        return []
+    saltos = np.diff(timestamps)
+    posicoes = np.flatnonzero(saltos > duracao)
+    anteriores = timestamps[posicoes]
+    faltando = saltos[posicoes] // duracao - 1
+    return [
+        (int(a) + duracao, int(a) + int(f) * duracao, int(f))
+        for a, f in zip(anteriores, faltando) if f > 0
+    ]
+
+
+def encontrar_lacunas(db_path, simbolo, intervalo, tamanho_bloco=BLOCO_VARREDURA):
+    """
+    Retorna [(inicio_ms, fim_ms, candles_faltando)] das faixas sem candles entre o primeiro
+    e o último timestamp da tabela (inicio/fim = primeiro e último candle ausente).
+    Com o memmap em dia a coluna inteira é varrida direto; no SQLite só os blocos com
+    candles faltando (COUNT menor que o esperado) têm os timestamps lidos.
+    """
+    duracao = duracao_intervalo_ms(intervalo)
+    if cache_memmap_ativo():
+        arquivos = abrir_memmap(db_path, simbolo, intervalo, ["timestamp"])
+        if arquivos is not None:
+            return _lacunas_em(arquivos["timestamp"], duracao)
+
+    tabela = f"candles_{simbolo.lower()}_{intervalo}"
+    conn = conectar(db_path)
+    primeiro, ultimo = conn.execute(f"SELECT MIN(timestamp), MAX(timestamp) FROM {tabela}").fetchone()
+    encontradas = set()
+    passo = tamanho_bloco * duracao
+    for inicio in range(primeiro or 0, (ultimo or -1) + 1, passo):
+        fim = min(inicio + passo - 1, ultimo)
+        contagem = conn.execute(f"SELECT COUNT(*) FROM {tabela} WHERE timestamp BETWEEN ? AND ?", (inicio, fim)).fetchone()[0]
+        if contagem == (fim - inicio) // duracao + 1:
+            continue
+        # Inclui o candle anterior e o seguinte ao bloco: lacunas que cruzam a borda também aparecem
+        cursor = conn.execute(f"""
+            SELECT timestamp FROM {tabela}
+            WHERE timestamp BETWEEN COALESCE((SELECT MAX(timestamp) FROM {tabela} WHERE timestamp < ?), ?)
+                                AND COALESCE((SELECT MIN(timestamp) FROM {tabela} WHERE timestamp > ?), ?)
+            ORDER BY timestamp
+        """, (inicio, inicio, fim, fim))
+        timestamps = np.fromiter((linha[0] for linha in cursor), dtype=np.int64)
+        encontradas.update(_lacunas_em(timestamps, duracao))
+    conn.close()
+    return sorted(encontradas)
+
+
+def exibir_lacunas(simbolo, intervalo, lacunas, limite=10):
+    if not lacunas:
+        print(f"✅ {simbolo} ({intervalo}): sem lacunas.")
+        return
+    total = sum(f for _, _, f in lacunas)
+    print(f"⚠️ {simbolo} ({intervalo}): {len(lacunas)} lacunas, {total} candles faltando.")
+    for inicio, fim, faltando in lacunas[:limite]:
+        print(f"   {_formatar(inicio)} → {_formatar(fim)} ({faltando} candles)")
+    if len(lacunas) > limite:
+        print(f"   ... e mais {len(lacunas) - limite} lacunas.")
+
+
+def verificar_lacunas(db_path, simbolo=None):
+    """Varre todas as séries (ou as de um par) e retorna {(PAR, intervalo): lacunas}."""
+    resultado = {}
+    for par, intervalo in sorted(listar_series_candles(db_path)):
+        if simbolo and par != simbolo.upper():
+            continue
+        try:
+            lacunas = encontrar_lacunas(db_path, par, intervalo)
+        except ValueError as e:
+            print(f"⚠️ {par} ({intervalo}): {e}")
+            continue
+        exibir_lacunas(par, intervalo, lacunas)
+        resultado[(par, intervalo)] = lacunas
+    return resultado
+
+
+def _agregar_faixa(conn, simbolo, intervalo, inicio_ms, fim_ms):
+    """Candles de um intervalo personalizado na faixa [inicio_ms, fim_ms], agregados do 1m."""
+    fim_periodo = fim_ms + duracao_intervalo_ms(intervalo) - 1
+    linhas = conn.execute(
+        f"SELECT {', '.join(COLUNAS_CANDLES)} FROM candles_{simbolo.lower()}_{INTERVALO_BASE} "
+        f"WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp", (inicio_ms, fim_periodo)
+    ).fetchall()
+    if not linhas:
+        return []
+    colunas = {c: np.array(valores) for c, valores in zip(COLUNAS_CANDLES, zip(*linhas))}
+    return agregar_candles(colunas, intervalo)
+
+
+def reparar_lacunas(db_path, simbolo, intervalo, lacunas=None, fonte=None):
+    """
+    Preenche as lacunas da série: intervalos da Binance baixam só as faixas faltantes (da fonte
+    configurada, ver fontes.py); intervalos personalizados são reagregados do 1m.
+    Retorna a quantidade de candles inseridos.
+    Lacunas que continuarem vazias são períodos sem negociação na própria corretora.
+    """
+    simbolo = simbolo.upper()
+    if lacunas is None:
+        lacunas = encontrar_lacunas(db_path, simbolo, intervalo)
+    if not lacunas:
+        return 0
+
+    tabela = f"candles_{simbolo.lower()}_{intervalo}"
+    fonte_propria = fonte is None and intervalo in interval_map
+    if fonte_propria:
+        fonte = criar_fonte()
+    conn = conectar(db_path)
+    inseridos = 0
+    for inicio, fim, faltando in lacunas:
+        if intervalo not in interval_map:
+            candles = _agregar_faixa(conn, simbolo, intervalo, inicio, fim)
+        else:
+            try:
+                candles = [k for pagina in fonte.historico(simbolo, interval_map[intervalo], inicio, fim) for k in pagina]
+            except ErroFonteCandles as e:
+                print(f"❌ Erro ao baixar {simbolo} ({intervalo}): {e}")
+                continue
+        # Só insere (nenhum candle existente muda), então o reparo não precisa de backup
+        novos = gravar_candles(conn, tabela, candles, "ignorar")
+        inseridos += novos
+        print(f"🩹 {simbolo} ({intervalo}) {_formatar(inicio)} → {_formatar(fim)}: {novos}/{faltando} candles.")
+    conn.close()
+    if fonte_propria:
+        fonte.fechar()
+
+    if inseridos:
+        atualizar_caches_candles(db_path, simbolo, intervalo, desde_ms=lacunas[0][0])
+        invalidar_backtest_continuo(db_path, simbolo, intervalo, lacunas[0][0])
+    return inseridos
@@ -1,7 +1,9 @@
 ﻿import warnings
 import os
 import sys
-from datetime import datetime, timedelta
+import glob
+import multiprocessing
+from datetime import datetime, timedelta, timezone
 
 # Suprimir avisos desnecessários
 warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -12,9 +14,16 @@ from analise import executar_analise
 # limpeza_backup foi removido pois a rotatividade é automática agora
 from exportar_excel import exportar_candles_para_excel
 from atualizar_candles import alimentar_sqlite_com_candles
-from db_utils import atualizar_banco, banco_possui_tabelas_candles, listar_pares_disponiveis
+from db_utils import (
+    atualizar_banco, banco_possui_tabelas_candles, listar_pares_disponiveis, migrar_para_layout_unificado,
+    listar_backups, restaurar_backup
+)
 from exportar_json import exportar_candles_para_json_txt, listar_pares_e_periodos
-from otimizador import executar_otimizacao
+from otimizador import executar_otimizacao, retomar_otimizacao, exibir_melhores_resultados
+from walk_forward import executar_walk_forward
+from backtest_lote import executar_backtest_lote
+from backtest_continuo import atualizar_backtests_continuos, exibir_backtests_continuos
+from lacunas import verificar_lacunas, reparar_lacunas
 
 # === Limpar Tela ===
 def limpar_tela():
@@ -41,6 +50,43 @@ def configurar_aplicativo():
     else:
         print("⚠️ Caminho não alterado.")
 
+# === Restaurar Backup ===
+def restaurar_backup_interativo():
+    print("\n🗂️ Backups de candles disponíveis (mais recentes primeiro):\n")
+    base, _ = os.path.splitext(db_path)
+    arquivos = sorted(glob.glob(f"{base}_backup_*.db"), reverse=True)
+    backups = listar_backups(db_path)
+    if not backups and not arquivos:
+        print("⚠️ Nenhum backup encontrado.")
+        return
+
+    for i, backup in enumerate(backups, start=1):
+        if backup["inicio"] is None:
+            faixa = "tabela inteira"
+        else:
+            inicio = datetime.fromtimestamp(backup["inicio"] / 1000, timezone.utc).strftime("%Y-%m-%d %H:%M")
+            fim = datetime.fromtimestamp(backup["fim"] / 1000, timezone.utc).strftime("%Y-%m-%d %H:%M") if backup["fim"] is not None else "fim"
+            faixa = f"{inicio} → {fim}"
+        print(f"{i} - {backup['tabela']} | {backup['data']} | {faixa}")
+    if arquivos:
+        print("\n📁 Cópias do banco inteiro (modo 'arquivo'): feche o programa e substitua o banco por uma delas.")
+        for arquivo in arquivos:
+            print(f"   {arquivo}")
+    if not backups:
+        return
+
+    print("\nℹ️ Vários backups da mesma tabela: restaure do mais recente para o mais antigo.")
+    escolha = entrada_segura("Número do backup a restaurar (0 para voltar): ")
+    if not escolha.isdigit() or not 1 <= int(escolha) <= len(backups):
+        print("❌ Restauração cancelada.")
+        return
+    backup = backups[int(escolha) - 1]
+    confirmacao = entrada_segura(f"Restaurar {backup['tabela']} a partir de {backup['tabela_backup']}? (s/n): ").lower()
+    if confirmacao == "s":
+        restaurar_backup(db_path, backup["tabela_backup"])
+    else:
+        print("❌ Restauração cancelada.")
+
 # === Menu Principal ===
 def mostrar_menu():
     while True:
@@ -54,6 +100,14 @@ def mostrar_menu():
             print("5 - Adicionar Novo Par de Moedas")
             print("6 - Configurar Aplicativo (caminho de exports)")
             print("7 - Otimizador de Estratégia (Grid Search)")
+            print("8 - Retomar Otimização Interrompida")
+            print("9 - Walk-Forward (Otimização em Janelas Rolantes)")
+            print("10 - Backtest em Lote (Todos os Pares e Intervalos)")
+            print("11 - Backtest Contínuo (Estado Atual por Par)")
+            print("12 - Migrar Candles para Tabela Única (Layout Unificado)")
+            print("13 - Verificar e Reparar Lacunas nos Candles")
+            print("14 - Consultar Resultados do Otimizador (Top N)")
+            print("15 - Restaurar Backup de Candles")
             print("0 - Sair")
 
             escolha = entrada_segura("\nEscolha uma opção: ")
@@ -172,6 +226,85 @@ def mostrar_menu():
                     else:
                         raise
 
+            # === 8 - RETOMAR OTIMIZAÇÃO ===
+            elif escolha == "8":
+                limpar_tela()
+                try:
+                    retomar_otimizacao(db_path)
+                except SystemExit as e:
+                    if str(e) == "MENU":
+                        continue
+                    else:
+                        raise
+
+            # === 9 - WALK-FORWARD ===
+            elif escolha == "9":
+                limpar_tela()
+                try:
+                    executar_walk_forward(db_path)
+                except SystemExit as e:
+                    if str(e) == "MENU":
+                        continue
+                    else:
+                        raise
+
+            # === 10 - BACKTEST EM LOTE ===
+            elif escolha == "10":
+                limpar_tela()
+                try:
+                    executar_backtest_lote(db_path)
+                except SystemExit as e:
+                    if str(e) == "MENU":
+                        continue
+                    else:
+                        raise
+
+            # === 11 - BACKTEST CONTÍNUO ===
+            elif escolha == "11":
+                limpar_tela()
+                exibir_backtests_continuos(db_path)
+
+            # === 12 - MIGRAR PARA LAYOUT UNIFICADO ===
+            elif escolha == "12":
+                limpar_tela()
+                print("\n🗃️ As tabelas candles_<par>_<intervalo> serão copiadas para a tabela única 'candles'")
+                print("   e substituídas por VIEWs com o mesmo nome (consultas existentes continuam funcionando).")
+                confirmacao = entrada_segura("Confirmar migração? (s/n): ").lower()
+                if confirmacao == "s":
+                    total = migrar_para_layout_unificado(db_path)
+                    print(f"\n✅ Migração concluída: {total} candles na tabela única.")
+                else:
+                    print("❌ Migração cancelada.")
+                entrada_segura("\nPressione Enter para voltar ao menu...")
+
+            # === 13 - LACUNAS NOS CANDLES ===
+            elif escolha == "13":
+                limpar_tela()
+                simbolo = entrada_segura("Par para verificar (ex: BTCUSDT) ou Enter para TODOS: ").upper()
+                print("\n🔎 Procurando lacunas...\n")
+                resultado = verificar_lacunas(db_path, simbolo or None)
+                com_lacunas = {serie: lacunas for serie, lacunas in resultado.items() if lacunas}
+                if com_lacunas:
+                    confirmacao = entrada_segura("\nBaixar apenas os candles faltantes? (s/n): ").lower()
+                    if confirmacao == "s":
+                        total = 0
+                        for (par, intervalo), lacunas in com_lacunas.items():
+                            total += reparar_lacunas(db_path, par, intervalo, lacunas)
+                        print(f"\n✅ Reparo concluído: {total} candles inseridos.")
+                entrada_segura("\nPressione Enter para voltar ao menu...")
+
+            # === 14 - RESULTADOS DO OTIMIZADOR ===
+            elif escolha == "14":
+                limpar_tela()
+                exibir_melhores_resultados(db_path)
+                entrada_segura("\nPressione Enter para voltar ao menu...")
+
+            # === 15 - RESTAURAR BACKUP ===
+            elif escolha == "15":
+                limpar_tela()
+                restaurar_backup_interativo()
+                entrada_segura("\nPressione Enter para voltar ao menu...")
+
             # === 0 - Sair ===
             elif escolha == "0":
                 limpar_tela()
@@ -198,10 +331,11 @@ def main():
         if banco_possui_tabelas_candles(db_path):
             print("✅ Tabelas de candles encontradas.")
             print("📡 Atualizando automaticamente todas as tabelas de candles para todos os pares...")
-            # Atualiza todas as tabelas de todos os pares
+            # Atualiza todas as tabelas de todos os pares (downloads em paralelo)
             pares = listar_pares_disponiveis(db_path)
-            for par in pares:
-                atualizar_banco(db_path, par)
+            atualizar_banco(db_path, pares)
+            # Simula apenas os candles recém-importados a partir do estado salvo
+            atualizar_backtests_continuos(db_path)
         else:
             print("⚠️ Nenhuma tabela de candles encontrada.")
             simbolo = input("Digite o par de moedas inicial (ex: BTCUSDT): ").upper()
@@ -222,4 +356,6 @@ def main():
             raise
 
 if __name__ == "__main__":
+    # Necessário para o Pool do otimizador no executável gerado pelo PyInstaller (Windows)
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
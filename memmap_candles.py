@@ -0,0 +1,164 @@
+﻿import os
+import json
+import numpy as np
+from armazenamento import conectar
+from config import ler_config
+
+# === Armazenamento em colunas binárias (np.memmap) das tabelas de candles ===
+# Estrutura: <pasta_memmap>/<PAR>_<intervalo>/<coluna>.bin (dtype fixo, sem cabeçalho) + _meta.json
+# Os arquivos são mapeados somente leitura: vários processos (otimizador, backtest em lote)
+# compartilham as mesmas páginas do sistema operacional, sem conversão nem cópia na leitura.
+# Ativado pela chave "cache_memmap": true do app_config.json.
+
+COLUNAS_MEMMAP = {
+    "timestamp": "int64",
+    "open": "float64",
+    "high": "float64",
+    "low": "float64",
+    "close": "float64",
+    "volume": "float64",
+    "close_time": "int64",
+    "quote_asset_volume": "float64",
+    "number_of_trades": "int64",
+    "taker_buy_base_asset_volume": "float64",
+    "taker_buy_quote_asset_volume": "float64",
+}
+
+
+def cache_memmap_ativo():
+    return bool(ler_config().get("cache_memmap", False))
+
+
+def pasta_memmap(db_path, simbolo, intervalo):
+    base = ler_config().get("pasta_memmap") or os.path.join(os.path.dirname(os.path.abspath(db_path)), "memmap")
+    return os.path.join(base, f"{simbolo.upper()}_{intervalo}")
+
+
+def _ler_meta(pasta):
+    try:
+        with open(os.path.join(pasta, "_meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _mapear(pasta, coluna, linhas):
+    """Mapeia <coluna>.bin somente leitura (np.memmap não aceita arquivo vazio)."""
+    dtype = np.dtype(COLUNAS_MEMMAP[coluna])
+    if linhas == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(os.path.join(pasta, f"{coluna}.bin"), dtype=dtype, mode="r", shape=(linhas,))
+
+
+def _copiar_inicio(caminho, destino, n_bytes, bloco=16 * 1024 * 1024):
+    """Copia os primeiros n_bytes do arquivo caminho para o arquivo aberto destino."""
+    with open(caminho, "rb") as origem:
+        while n_bytes > 0:
+            dados = origem.read(min(bloco, n_bytes))
+            if not dados:
+                break
+            destino.write(dados)
+            n_bytes -= len(dados)
+
+
+def atualizar_memmap(db_path, simbolo, intervalo, desde_ms=None):
+    """
+    Espelha a tabela candles_<par>_<intervalo> nos arquivos de coluna.
+    As linhas com timestamp >= desde_ms (ou >= último timestamp já gravado) são descartadas e regravadas;
+    sem arquivos anteriores (ou desde_ms=None sem meta) a tabela inteira é exportada.
+    Cada coluna é gravada num arquivo novo e trocada com os.replace: processos que já mapearam
+    os arquivos antigos continuam lendo a versão anterior (truncar no lugar causaria SIGBUS).
+    """
+    pasta = pasta_memmap(db_path, simbolo, intervalo)
+    tabela = f"candles_{simbolo.lower()}_{intervalo}"
+    conn = conectar(db_path)
+
+    tipo = conn.execute(f"SELECT typeof(timestamp) FROM {tabela} LIMIT 1").fetchone()
+    if not tipo or tipo[0] != "integer":
+        conn.close()
+        return
+
+    meta = _ler_meta(pasta)
+    manter = 0
+    corte = None
+    if meta is not None and meta["linhas"] > 0:
+        marcos = [m for m in (desde_ms, meta["ultimo_timestamp"]) if m is not None]
+        corte = min(marcos)
+        # Busca binária: linhas anteriores ao corte continuam válidas
+        timestamps = _mapear(pasta, "timestamp", meta["linhas"])
+        manter = int(np.searchsorted(timestamps, corte, side="left"))
+        del timestamps
+
+    colunas = ", ".join(COLUNAS_MEMMAP)
+    if corte is None:
+        linhas = conn.execute(f"SELECT {colunas} FROM {tabela} ORDER BY timestamp").fetchall()
+    else:
+        linhas = conn.execute(f"SELECT {colunas} FROM {tabela} WHERE timestamp >= ? ORDER BY timestamp", (corte,)).fetchall()
+    ultimo, total = conn.execute(f"SELECT MAX(timestamp), COUNT(*) FROM {tabela}").fetchone()
+    conn.close()
+
+    os.makedirs(pasta, exist_ok=True)
+    # A meta é invalidada antes de mexer nos arquivos: leitores caem no SQLite durante a gravação
+    caminho_meta = os.path.join(pasta, "_meta.json")
+    if os.path.exists(caminho_meta):
+        os.remove(caminho_meta)
+
+    valores = list(zip(*linhas)) if linhas else [()] * len(COLUNAS_MEMMAP)
+    for (coluna, dtype), dados in zip(COLUNAS_MEMMAP.items(), valores):
+        arr = np.asarray(dados, dtype=dtype)
+        caminho = os.path.join(pasta, f"{coluna}.bin")
+        with open(caminho + ".tmp", "wb") as f:
+            if manter:
+                _copiar_inicio(caminho, f, manter * arr.itemsize)
+            f.write(arr.tobytes())
+        os.replace(caminho + ".tmp", caminho)
+
+    with open(caminho_meta, "w", encoding="utf-8") as f:
+        json.dump({"linhas": manter + len(linhas), "ultimo_timestamp": ultimo, "total_candles": total}, f)
+
+
+def abrir_memmap(db_path, simbolo, intervalo, colunas=None):
+    """
+    Retorna {coluna: np.memmap somente leitura} com a série inteira,
+    ou None se os arquivos não existirem ou estiverem desatualizados em relação ao banco.
+    """
+    pasta = pasta_memmap(db_path, simbolo, intervalo)
+    meta = _ler_meta(pasta)
+    if meta is None:
+        return None
+
+    tabela = f"candles_{simbolo.lower()}_{intervalo}"
+    conn = conectar(db_path)
+    ultimo, total = conn.execute(f"SELECT MAX(timestamp), COUNT(*) FROM {tabela}").fetchone()
+    conn.close()
+    # Candles gravados ou removidos no meio da série não mudam o MAX: a quantidade também precisa bater
+    if ultimo != meta["ultimo_timestamp"] or total != meta.get("total_candles"):
+        return None
+
+    return {c: _mapear(pasta, c, meta["linhas"]) for c in (colunas or COLUNAS_MEMMAP)}
+
+
+def indices_periodo(timestamps, inicio_ms, fim_ms, barras_aquecimento=0):
+    """
+    Busca binária na coluna de timestamps (ordenada): retorna (i, j, aquecimento)
+    tal que timestamps[i:j] cobre [inicio_ms, fim_ms] mais as barras de aquecimento anteriores.
+    """
+    inicio = int(np.searchsorted(timestamps, inicio_ms, side="left"))
+    i = max(0, inicio - barras_aquecimento)
+    j = max(i, int(np.searchsorted(timestamps, fim_ms, side="right")))
+    return i, j, min(j, inicio) - i
+
+
+def fatia_memmap(db_path, simbolo, intervalo, inicio_ms, fim_ms, colunas=None, barras_aquecimento=0):
+    """
+    Views (sem cópia) das colunas no período: ({coluna: array}, barras de aquecimento incluídas),
+    ou None se o armazenamento não estiver em dia com o banco.
+    """
+    arquivos = abrir_memmap(db_path, simbolo, intervalo, colunas)
+    if arquivos is None:
+        return None
+    timestamps = arquivos["timestamp"] if "timestamp" in arquivos else _mapear(
+        pasta_memmap(db_path, simbolo, intervalo), "timestamp", len(next(iter(arquivos.values())))
+    )
+    i, j, aquecimento = indices_periodo(timestamps, inicio_ms, fim_ms, barras_aquecimento)
+    return {c: arr[i:j] for c, arr in arquivos.items()}, aquecimento
@@ -1,57 +1,920 @@
 ﻿import pandas as pd
 import numpy as np
-from backtest import backtest_bollinger
-from db_utils import listar_pares_disponiveis, listar_intervalos_disponiveis, carregar_candles
+from backtest import preparar_pacote_indicadores, backtest_com_indicadores
+from db_utils import listar_pares_disponiveis, listar_intervalos_disponiveis, carregar_candles, periodo_disponivel, obter_catalogo, data_para_epoch_ms
 from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+import multiprocessing as mp
+import itertools
+import random
+import math
+import signal
+import json
+import hashlib
 import sqlite3
 import os
 import time
+from indicadores import classificar_nota
+from config import ler_config
+from armazenamento import conectar
+
+# === Armazenamento dos resultados ===
+# execucoes_otimizacao: uma linha por execução (par, intervalo, período, grade, status).
+# parametros_otimizacao: cada combinação (dist, stop, nota, ema, lucro_min) uma única vez, pelo hash.
+# resultados_execucao: só ids + métricas, chave (execução, parâmetros, fração dos dados) sem duplicatas,
+#   com índices (série, fração, métrica) para o "top N por métrica" de um par/intervalo sem varrer a tabela.
+# resultados_otimizacao continua existindo como VIEW com as colunas antigas.
+METRICAS_RESULTADOS = ("lucro_liquido", "win_rate", "profit_factor", "total_trades")
+# Versão da simulação (motor, regras da estratégia, aquecimento dos indicadores): faz parte do hash dos
+# dados da execução, então incrementar aqui impede o reaproveitamento de resultados calculados antes
+VERSAO_RESULTADOS = 2
+COLUNAS_PARAMETROS = ("distancia_banda", "stop_loss", "nota_minima", "ema_periodo", "lucro_minimo")
+
+def hash_parametros(combinacao):
+    """Hash estável de uma combinação (dist, stop, nota, ema, lucro_min); 40 e 40.0 dão o mesmo hash."""
+    valores = [float(v) if v is not None else None for v in combinacao[:5]]
+    return hashlib.sha1(json.dumps(valores).encode()).hexdigest()
+
+def _registro_parametros(combinacao):
+    dist, stop, nota, ema, lucro_min = combinacao[:5]
+    return (hash_parametros(combinacao), float(dist), stop, nota, int(ema) if ema is not None else None, lucro_min)
 
 def inicializar_tabela_resultados(db_path):
-    """Cria a tabela de resultados se não existir."""
-    conn = sqlite3.connect(db_path)
+    """Cria as tabelas de execuções, parâmetros, resultados e progresso se não existirem."""
+    conn = conectar(db_path)
     cursor = conn.cursor()
-    
+
+    # Cada execução guarda a grade completa para poder ser retomada
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS resultados_otimizacao (
+        CREATE TABLE IF NOT EXISTS execucoes_otimizacao (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             data_execucao TEXT,
             simbolo TEXT,
             intervalo TEXT,
+            data_inicio TEXT,
+            data_fim TEXT,
+            grade TEXT,
+            total_combinacoes INTEGER,
+            status TEXT,
+            hash_dados TEXT
+        )
+    """)
+    colunas = [row[1] for row in cursor.execute("PRAGMA table_info(execucoes_otimizacao)")]
+    if "hash_dados" not in colunas:
+        cursor.execute("ALTER TABLE execucoes_otimizacao ADD COLUMN hash_dados TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_execucoes_hash_dados ON execucoes_otimizacao (hash_dados)")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS series_otimizacao (
+            id INTEGER PRIMARY KEY,
+            simbolo TEXT NOT NULL,
+            intervalo TEXT NOT NULL,
+            UNIQUE (simbolo, intervalo)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS parametros_otimizacao (
+            id INTEGER PRIMARY KEY,
+            hash TEXT UNIQUE NOT NULL,
             distancia_banda REAL,
             stop_loss REAL,
             nota_minima INTEGER,
             ema_periodo INTEGER,
-            lucro_minimo REAL,
+            lucro_minimo REAL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS resultados_execucao (
+            execucao_id INTEGER NOT NULL,
+            parametros_id INTEGER NOT NULL,
+            fracao_dados REAL NOT NULL DEFAULT 1.0,
+            serie_id INTEGER NOT NULL,
             lucro_liquido REAL,
             win_rate REAL,
             total_trades INTEGER,
-            profit_factor REAL
-        )
+            profit_factor REAL,
+            PRIMARY KEY (execucao_id, parametros_id, fracao_dados)
+        ) WITHOUT ROWID
+    """)
+    for metrica in METRICAS_RESULTADOS:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_resultados_{metrica} ON resultados_execucao (serie_id, fracao_dados, {metrica})")
+
+    # Índices (posição no produto cartesiano da grade) já avaliados em cada execução
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS progresso_otimizacao (
+            execucao_id INTEGER,
+            indice INTEGER,
+            PRIMARY KEY (execucao_id, indice)
+        ) WITHOUT ROWID
+    """)
+    # Execuções criadas antes da tabela de séries
+    cursor.execute("""
+        INSERT OR IGNORE INTO series_otimizacao (simbolo, intervalo)
+        SELECT DISTINCT simbolo, intervalo FROM execucoes_otimizacao WHERE simbolo IS NOT NULL AND intervalo IS NOT NULL
+    """)
+    conn.commit()
+
+    tipo = cursor.execute("SELECT type FROM sqlite_master WHERE name='resultados_otimizacao'").fetchone()
+    if tipo and tipo[0] == "table":
+        _migrar_resultados_antigos(conn)
+    cursor.execute("""
+        CREATE VIEW IF NOT EXISTS resultados_otimizacao AS
+        SELECT e.data_execucao, s.simbolo, s.intervalo,
+               p.distancia_banda, p.stop_loss, p.nota_minima, p.ema_periodo, p.lucro_minimo,
+               r.lucro_liquido, r.win_rate, r.total_trades, r.profit_factor, r.execucao_id, r.fracao_dados
+        FROM resultados_execucao r
+        JOIN execucoes_otimizacao e ON e.id = r.execucao_id
+        JOIN parametros_otimizacao p ON p.id = r.parametros_id
+        JOIN series_otimizacao s ON s.id = r.serie_id
     """)
     conn.commit()
     conn.close()
 
-def salvar_lote_resultados(db_path, dados):
-    """Salva uma lista de resultados no banco de uma só vez."""
-    if not dados:
+def _migrar_resultados_antigos(conn):
+    """
+    Move a tabela resultados_otimizacao (texto repetido em cada linha) para o formato normalizado.
+    Resultados sem execução (versões antigas) ganham uma execução 'LEGADO' por (data, par, intervalo).
+    """
+    cursor = conn.cursor()
+    colunas = [row[1] for row in cursor.execute("PRAGMA table_info(resultados_otimizacao)")]
+    coluna_execucao = "execucao_id" if "execucao_id" in colunas else "NULL"
+    coluna_fracao = "fracao_dados" if "fracao_dados" in colunas else "NULL"
+    try:
+        cursor.execute("BEGIN")
+        cursor.execute(f"""
+            INSERT INTO execucoes_otimizacao (data_execucao, simbolo, intervalo, grade, status)
+            SELECT DISTINCT data_execucao, simbolo, intervalo, '{{}}', 'LEGADO'
+            FROM resultados_otimizacao WHERE {coluna_execucao} IS NULL
+        """)
+        cursor.execute("""
+            INSERT OR IGNORE INTO series_otimizacao (simbolo, intervalo)
+            SELECT DISTINCT simbolo, intervalo FROM resultados_otimizacao
+        """)
+        combinacoes = cursor.execute(f"""
+            SELECT DISTINCT {', '.join(COLUNAS_PARAMETROS)} FROM resultados_otimizacao
+        """).fetchall()
+        cursor.executemany(f"""
+            INSERT OR IGNORE INTO parametros_otimizacao (hash, {', '.join(COLUNAS_PARAMETROS)})
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [_registro_parametros(c) for c in combinacoes])
+        # Mesmos valores gravados nas duas tabelas: a junção por igualdade é exata
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO resultados_execucao (
+                execucao_id, parametros_id, fracao_dados, serie_id,
+                lucro_liquido, win_rate, total_trades, profit_factor
+            )
+            SELECT COALESCE(r.{coluna_execucao}, (
+                       SELECT e.id FROM execucoes_otimizacao e
+                       WHERE e.status = 'LEGADO' AND e.data_execucao IS r.data_execucao
+                         AND e.simbolo IS r.simbolo AND e.intervalo IS r.intervalo
+                   )),
+                   p.id, COALESCE(r.{coluna_fracao}, 1.0), s.id,
+                   r.lucro_liquido, r.win_rate, r.total_trades, r.profit_factor
+            FROM resultados_otimizacao r
+            JOIN parametros_otimizacao p
+              ON p.distancia_banda IS r.distancia_banda AND p.stop_loss IS r.stop_loss
+             AND p.nota_minima IS r.nota_minima AND p.ema_periodo IS r.ema_periodo
+             AND p.lucro_minimo IS r.lucro_minimo
+            JOIN series_otimizacao s ON s.simbolo = r.simbolo AND s.intervalo = r.intervalo
+        """)
+        migrados = cursor.rowcount
+        cursor.execute("DROP TABLE resultados_otimizacao")
+        cursor.execute("COMMIT")
+    except Exception:
+        conn.rollback()
+        raise
+    print(f"✅ {migrados} resultados de otimização migrados para o formato normalizado.")
+
+def salvar_lote_resultados(db_path, dados, execucao_id, indices_concluidos=None, fracao_dados=None):
+    """
+    Salva uma lista de resultados (tuplas de avaliar_combinacao) da execução de uma só vez.
+    Marca também 'indices_concluidos' como avaliados, na mesma transação
+    (o progresso nunca fica à frente dos resultados gravados).
+    fracao_dados identifica resultados avaliados só numa parte do período (busca adaptativa).
+    Uma combinação já gravada na execução (mesma fração) é ignorada.
+    """
+    if not dados and not indices_concluidos:
         return
 
-    conn = sqlite3.connect(db_path)
+    conn = conectar(db_path)
     cursor = conn.cursor()
-    
-    query = """
-        INSERT INTO resultados_otimizacao (
-            data_execucao, simbolo, intervalo, 
-            distancia_banda, stop_loss, nota_minima, ema_periodo, lucro_minimo,
+    serie_id = cursor.execute("""
+        SELECT s.id FROM execucoes_otimizacao e
+        JOIN series_otimizacao s ON s.simbolo = e.simbolo AND s.intervalo = e.intervalo
+        WHERE e.id = ?
+    """, (execucao_id,)).fetchone()[0]
+
+    cursor.executemany(f"""
+        INSERT OR IGNORE INTO parametros_otimizacao (hash, {', '.join(COLUNAS_PARAMETROS)})
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [_registro_parametros(d) for d in dados])
+    cursor.executemany("""
+        INSERT OR IGNORE INTO resultados_execucao (
+            execucao_id, parametros_id, fracao_dados, serie_id,
             lucro_liquido, win_rate, total_trades, profit_factor
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        )
+        SELECT ?, id, ?, ?, ?, ?, ?, ? FROM parametros_otimizacao WHERE hash = ?
+    """, [
+        (execucao_id, fracao_dados if fracao_dados is not None else 1.0, serie_id) + tuple(d[5:9]) + (hash_parametros(d),)
+        for d in dados
+    ])
+    if indices_concluidos:
+        cursor.executemany(
+            "INSERT OR IGNORE INTO progresso_otimizacao (execucao_id, indice) VALUES (?, ?)",
+            [(execucao_id, i) for i in indices_concluidos]
+        )
+    conn.commit()
+    conn.close()
+
+def hash_dados_execucao(db_path, simbolo, intervalo, data_inicio, data_fim, barras_aquecimento=0):
     """
-    
-    cursor.executemany(query, dados)
+    Identifica os dados de uma execução: par, intervalo, período, o estado da série no catálogo
+    (último candle e quantidade) e como ela é simulada (PARAMETROS_FIXOS, barras de aquecimento e
+    VERSAO_RESULTADOS). Se algo disso mudou, o hash muda e nada é reaproveitado.
+    O período é limitado aos candles existentes antes do hash: "até agora" (data_fim = now())
+    e "até o último candle" carregam os mesmos dados e precisam gerar o mesmo hash.
+    """
+    serie = next((c for c in obter_catalogo(db_path) if c["simbolo"] == simbolo.upper() and c["intervalo"] == intervalo), {})
+    inicio_ms = data_para_epoch_ms(data_inicio)
+    fim_ms = data_para_epoch_ms(data_fim)
+    if serie:
+        inicio_ms = max(inicio_ms, serie["primeiro_timestamp"])
+        fim_ms = min(fim_ms, serie["ultimo_timestamp"])
+    chave = [
+        simbolo.upper(), intervalo, inicio_ms, fim_ms, serie.get("ultimo_timestamp"), serie.get("total_candles"),
+        PARAMETROS_FIXOS, int(barras_aquecimento), VERSAO_RESULTADOS
+    ]
+    return hashlib.sha1(json.dumps(chave).encode()).hexdigest()
+
+def criar_execucao(db_path, simbolo, intervalo, data_inicio, data_fim, grade, total_combinacoes=None):
+    """Registra uma nova execução com a definição da grade. Retorna o id da execução."""
+    inicializar_tabela_resultados(db_path)
+    total = total_combinacoes if total_combinacoes is not None else len(combinacoes_da_grade(grade))
+    hash_dados = hash_dados_execucao(db_path, simbolo, intervalo, data_inicio, data_fim, barras_aquecimento_grade(grade))
+
+    conn = conectar(db_path)
+    cursor = conn.cursor()
+    cursor.execute("INSERT OR IGNORE INTO series_otimizacao (simbolo, intervalo) VALUES (?, ?)", (simbolo, intervalo))
+    cursor.execute("""
+        INSERT INTO execucoes_otimizacao (
+            data_execucao, simbolo, intervalo, data_inicio, data_fim, grade, total_combinacoes, status, hash_dados
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, 'EM_ANDAMENTO', ?)
+    """, (
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"), simbolo, intervalo,
+        data_inicio, data_fim, json.dumps(grade), total, hash_dados
+    ))
+    execucao_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    return execucao_id
+
+def carregar_execucao(db_path, execucao_id):
+    """Retorna a execução como dicionário (grade já decodificada) ou None."""
+    conn = conectar(db_path)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM execucoes_otimizacao WHERE id = ?", (execucao_id,))
+    row = cursor.fetchone()
+    conn.close()
+    if not row:
+        return None
+    execucao = dict(row)
+    execucao["grade"] = json.loads(execucao["grade"])
+    return execucao
+
+def atualizar_status_execucao(db_path, execucao_id, status):
+    conn = conectar(db_path)
+    conn.execute("UPDATE execucoes_otimizacao SET status = ? WHERE id = ?", (status, execucao_id))
     conn.commit()
     conn.close()
 
+def listar_execucoes_pendentes(db_path):
+    """Lista execuções de grade não concluídas com a contagem de combinações já avaliadas."""
+    inicializar_tabela_resultados(db_path)
+    conn = conectar(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT e.id, e.data_execucao, e.simbolo, e.intervalo, e.total_combinacoes,
+               (SELECT COUNT(*) FROM progresso_otimizacao p WHERE p.execucao_id = e.id),
+               e.grade
+        FROM execucoes_otimizacao e
+        WHERE e.status IN ('EM_ANDAMENTO', 'INTERROMPIDA')
+        ORDER BY e.id
+    """)
+    linhas = cursor.fetchall()
+    conn.close()
+    # Só execuções de grade completa são retomáveis (a busca adaptativa é refeita do zero)
+    return [
+        linha[:6] for linha in linhas
+        if json.loads(linha[6]).get("estrategia", "grade") == "grade"
+    ]
+
+def indices_concluidos(db_path, execucao_id):
+    conn = conectar(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT indice FROM progresso_otimizacao WHERE execucao_id = ?", (execucao_id,))
+    concluidos = {row[0] for row in cursor.fetchall()}
+    conn.close()
+    return concluidos
+
+def combinacoes_da_grade(grade):
+    """Produto cartesiano da grade na ordem fixa (dist, stop, nota, ema, lucro_min)."""
+    return list(itertools.product(
+        grade["distancias"], grade["stops"], grade["notas"], grade["emas"], grade["lucros"]
+    ))
+
+def calcular_metricas(operacoes, saldo_inicial=1000.0):
+    """Retorna (lucro, win_rate, total_trades, profit_factor) de uma lista de operações."""
+    if not operacoes:
+        return 0.0, 0.0, 0, 0.0
+
+    saldo_final = operacoes[-1][4]
+    lucro = saldo_final - saldo_inicial
+
+    fechamentos = [op for op in operacoes if op[1] in ["VENDA", "STOP LOSS", "TRAILING STOP"]]
+    total_trades = len(fechamentos)
+    wins = len([op for op in fechamentos if op[3] > 0])
+    win_rate = (wins / total_trades * 100) if total_trades > 0 else 0.0
+
+    lucro_bruto = sum([op[3] for op in fechamentos if op[3] > 0])
+    prejuizo_bruto = abs(sum([op[3] for op in fechamentos if op[3] < 0]))
+    profit_factor = (lucro_bruto / prejuizo_bruto) if prejuizo_bruto > 0 else 0
+    return lucro, win_rate, total_trades, profit_factor
+
+# 5 DIMENSÕES DE TESTE (Conforme solicitado)
+# Incluindo distâncias negativas e positivas
+GRADE_PADRAO = {
+    "distancias": [-2.0, -1.0, 0.0, 1.0, 2.0, 3.0, 4.0, 5.0],
+    "stops": [0.0, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0],
+    "notas": [20, 30, 40, 50, 60],
+    "emas": [70, 80, 90, 100, 110],
+    "lucros": [0.0, 0.1, 0.2, 0.3],
+}
+
+# Parâmetros da estratégia que não variam na grade de otimização
+PARAMETROS_FIXOS = dict(
+    taxa_corretagem=0.1,
+    saldo_inicial=1000.0,
+    usar_trailing_stop=True,
+    sair_na_banda_superior=True,
+    mover_alvo_com_preco=False,
+    estrategia_adaptativa=True
+)
+
+def avaliar_combinacao(pacote, combinacao, inicio=1, fim=None, parametros_fixos=None):
+    """
+    Simula uma combinação (dist, stop, nota, ema, lucro_min) sobre o pacote de indicadores.
+    Retorna a tupla da combinação seguida de (lucro, win_rate, total_trades, profit_factor).
+    parametros_fixos substitui PARAMETROS_FIXOS (taxa, saldo e flags da estratégia) quando informado.
+    """
+    fixos = parametros_fixos or PARAMETROS_FIXOS
+    dist, stop, nota, ema, lucro_min = combinacao
+    operacoes = backtest_com_indicadores(
+        pacote,
+        periodo_ema=int(ema) if ema else None,
+        distancia_bollinger=float(dist),
+        stop_loss_perc=stop,
+        lucro_minimo_perc=lucro_min,
+        nota_minima=nota,
+        inicio=inicio,
+        fim=fim,
+        **fixos
+    )
+    return tuple(combinacao) + calcular_metricas(operacoes, fixos["saldo_inicial"])
+
+# === Execução paralela (process pool + shared memory) ===
+
+def obter_workers_configurados():
+    """Número de processos do otimizador (app_config.json: 'workers_otimizacao')."""
+    try:
+        return max(1, int(ler_config().get("workers_otimizacao", os.cpu_count() or 1)))
+    except (TypeError, ValueError):
+        return 1
+
+def _publicar_pacote(pacote):
+    """
+    Copia os arrays numéricos do pacote de indicadores para um bloco de memória compartilhada.
+    Retorna (shm, meta); meta é pequeno e picklável, os workers só recebem o nome do bloco.
+    """
+    dados = pacote["dados"]
+    colunas = {
+        "timestamp": np.asarray(dados["timestamp"]),
+        "close": dados["close"],
+        "BB_down": dados["BB_down"],
+        "BB_up": dados["BB_up"],
+        "media": dados["media"],
+        "nota": dados["nota"],
+    }
+    for periodo, valores in pacote["emas"].items():
+        colunas[f"ema_{periodo}"] = valores
+
+    layout = {}
+    offset = 0
+    for nome, valores in colunas.items():
+        layout[nome] = (offset, valores.dtype.str, len(valores))
+        offset += valores.nbytes
+        offset += (-offset) % 8  # Alinhamento de 8 bytes
+
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for nome, valores in colunas.items():
+        inicio, dtype, n = layout[nome]
+        destino = np.ndarray((n,), dtype=np.dtype(dtype), buffer=shm.buf, offset=inicio)
+        destino[:] = valores
+    return shm, {"nome": shm.name, "colunas": layout}
+
+def _abrir_memoria_compartilhada(nome):
+    """Anexa ao bloco sem registrá-lo no resource_tracker (quem cria é o responsável pelo unlink)."""
+    try:
+        return shared_memory.SharedMemory(name=nome, track=False)
+    except TypeError:  # Python < 3.13
+        return shared_memory.SharedMemory(name=nome)
+
+_SHM_WORKER = None
+_PACOTE_WORKER = None
+
+def _inicializar_worker(meta):
+    """Initializer do Pool: monta o pacote de indicadores como views sobre a memória compartilhada."""
+    global _SHM_WORKER, _PACOTE_WORKER
+    # Ctrl+C é tratado apenas pelo processo principal (que grava o progresso)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _SHM_WORKER = _abrir_memoria_compartilhada(meta["nome"])
+
+    arrays = {}
+    for nome, (offset, dtype, n) in meta["colunas"].items():
+        arr = np.ndarray((n,), dtype=np.dtype(dtype), buffer=_SHM_WORKER.buf, offset=offset)
+        arr.flags.writeable = False
+        arrays[nome] = arr
+
+    dados = {
+        "timestamp": arrays["timestamp"],
+        "close": arrays["close"],
+        "BB_down": arrays["BB_down"],
+        "BB_up": arrays["BB_up"],
+        "media": arrays["media"],
+        "nota": arrays["nota"],
+        "status": classificar_nota(arrays["nota"]).astype(object),
+        "volume_compra": None,
+        "volume_venda": None,
+        "ema": None,
+    }
+    emas = {int(nome[4:]): arr for nome, arr in arrays.items() if nome.startswith("ema_")}
+    _PACOTE_WORKER = {"df": None, "dados": dados, "emas": emas}
+
+def _executar_tarefa_worker(item):
+    funcao, tarefa = item
+    return funcao(_PACOTE_WORKER, tarefa)
+
+def mapear_com_pacote(pacote, funcao, tarefas, n_workers=1):
+    """
+    Gerador que aplica funcao(pacote, tarefa) a cada tarefa, NA ORDEM das tarefas.
+    Com n_workers > 1 usa um Pool cujos processos leem o pacote via shared_memory
+    (publicado uma única vez). 'funcao' precisa ser definida no nível de módulo.
+    """
+    if n_workers <= 1 or len(tarefas) < 2:
+        for tarefa in tarefas:
+            yield funcao(pacote, tarefa)
+        return
+
+    shm, meta = _publicar_pacote(pacote)
+    try:
+        with mp.Pool(min(n_workers, len(tarefas)), initializer=_inicializar_worker, initargs=(meta,)) as pool:
+            # imap (ordenado) garante resultados idênticos e na mesma ordem da execução serial
+            yield from pool.imap(_executar_tarefa_worker, [(funcao, t) for t in tarefas])
+    finally:
+        shm.close()
+        shm.unlink()
+
+def _avaliar_lote(pacote, tarefa):
+    lote, inicio, fim = tarefa
+    return [avaliar_combinacao(pacote, c, inicio, fim) for c in lote]
+
+def barras_aquecimento_indicadores(periodos_ema):
+    """Candles anteriores ao período necessários para a Bollinger (20) e a maior EMA já estarem válidas."""
+    return max([20] + [int(e) for e in periodos_ema if e])
+
+def barras_aquecimento_grade(grade):
+    """Barras de aquecimento de uma execução: EMAs da grade ou, na busca adaptativa, dos candidatos sorteados."""
+    if "espaco" in grade:
+        candidatos = amostrar_candidatos(grade["espaco"], grade["candidatos"], grade["semente"])
+        return barras_aquecimento_indicadores({c[3] for c in candidatos})
+    return barras_aquecimento_indicadores(grade["emas"])
+
+def executar_grade(pacote, combinacoes, n_workers=1, inicio=1, fim=None):
+    """
+    Gerador que avalia as combinações e produz os resultados NA MESMA ORDEM de 'combinacoes'.
+    Com n_workers > 1 distribui lotes num Pool de processos que leem os arrays via shared_memory.
+    """
+    if n_workers <= 1 or len(combinacoes) < 2:
+        for combinacao in combinacoes:
+            yield avaliar_combinacao(pacote, combinacao, inicio, fim)
+        return
+
+    tamanho_lote = max(1, min(64, len(combinacoes) // (n_workers * 4)))
+    tarefas = [
+        (combinacoes[i:i + tamanho_lote], inicio, fim)
+        for i in range(0, len(combinacoes), tamanho_lote)
+    ]
+    for resultados in mapear_com_pacote(pacote, _avaliar_lote, tarefas, n_workers):
+        yield from resultados
+
+def processar_execucao(db_path, execucao_id, n_workers=1):
+    """
+    Executa (ou retoma) uma execução registrada, avaliando só as combinações ainda não concluídas.
+    Resultados e progresso são gravados juntos em lotes; Ctrl+C grava o lote pendente
+    e deixa a execução como INTERROMPIDA para ser retomada depois.
+    Retorna True se a execução foi concluída.
+    """
+    execucao = carregar_execucao(db_path, execucao_id)
+    if not execucao:
+        print(f"❌ Execução {execucao_id} não encontrada.")
+        return False
+
+    simbolo = execucao["simbolo"]
+    intervalo = execucao["intervalo"]
+    grade = execucao["grade"]
+
+    combinacoes = combinacoes_da_grade(grade)
+    reaproveitados = reaproveitar_resultados(db_path, execucao_id, combinacoes)
+    concluidos = indices_concluidos(db_path, execucao_id)
+    pendentes = [i for i in range(len(combinacoes)) if i not in concluidos]
+
+    print(f"\n🆔 Execução #{execucao_id}: {simbolo} {intervalo} | {execucao['data_inicio']} → {execucao['data_fim']}")
+    print(f"🔄 Combinações: {len(combinacoes)} | Já avaliadas: {len(concluidos)} | Pendentes: {len(pendentes)}")
+    if reaproveitados:
+        print(f"♻️  {reaproveitados} combinações reaproveitadas de execuções anteriores com os mesmos dados.")
+
+    if not pendentes:
+        atualizar_status_execucao(db_path, execucao_id, "CONCLUIDA")
+        return True
+
+    # === Carregamento dos Dados ===
+    print("\n⏳ Carregando candles na memória...")
+    # Candles anteriores ao período entram só para aquecer os indicadores; a simulação começa em data_inicio
+    df_base = carregar_candles(
+        db_path, simbolo, intervalo, execucao["data_inicio"], execucao["data_fim"],
+        barras_aquecimento=barras_aquecimento_grade(grade)
+    )
+    aquecimento = df_base.attrs.get("barras_aquecimento", 0)
+
+    if len(df_base) <= aquecimento:
+        print("❌ Nenhum candle encontrado.")
+        atualizar_status_execucao(db_path, execucao_id, "SEM_DADOS")
+        return False
+
+    # Indicadores calculados uma única vez (Bollinger/RSI) + uma vez por período de EMA
+    print("🧮 Pré-calculando indicadores...")
+    pacote = preparar_pacote_indicadores(df_base.copy(), periodos_ema=[int(e) for e in grade["emas"]])
+
+    dados_para_salvar = []
+    indices_lote = []
+    
+    print("\n▶️  Iniciando execuções... (Ctrl+C interrompe e salva o progresso)")
+    print(f"⚙️  Processos paralelos: {n_workers}")
+    print(f"{'Dist':<4} | {'Stop':<4} | {'Nota':<4} | {'EMA':<4} | {'Min%':<4} | {'Lucro($)':<10} | {'Win%':<6}")
+    print("-" * 65)
+
+    start_time = time.time()
+    atualizar_status_execucao(db_path, execucao_id, "EM_ANDAMENTO")
+
+    try:
+        # Único escritor: os workers só devolvem tuplas, a gravação acontece aqui em lotes
+        resultados = executar_grade(pacote, [combinacoes[i] for i in pendentes], n_workers, inicio=max(1, aquecimento))
+        for indice, resultado in zip(pendentes, resultados):
+            dist, stop, nota, ema, lucro_min, lucro, win_rate, total_trades, profit_factor = resultado
+            indices_lote.append(indice)
+
+            # Se houve trades, prepara para salvar
+            if total_trades > 0:
+                dados_para_salvar.append(resultado)
+                
+                # Feedback visual se for lucrativo
+                if lucro > 0:
+                     print(f"{dist:<4} | {stop:<4} | {nota:<4} | {ema:<4} | {lucro_min:<4.1f} | {lucro:<10.2f} | {win_rate:<6.1f}")
+
+            # Salva em lotes de 500 para não ocupar muita memória RAM
+            if len(indices_lote) >= 500:
+                salvar_lote_resultados(db_path, dados_para_salvar, execucao_id, indices_lote)
+                dados_para_salvar = []
+                indices_lote = []
+    except KeyboardInterrupt:
+        salvar_lote_resultados(db_path, dados_para_salvar, execucao_id, indices_lote)
+        atualizar_status_execucao(db_path, execucao_id, "INTERROMPIDA")
+        feitos = len(indices_concluidos(db_path, execucao_id))
+        print(f"\n⏸️  Execução #{execucao_id} interrompida: {feitos}/{len(combinacoes)} combinações salvas.")
+        print("   Use 'Retomar Otimização Interrompida' no menu para continuar de onde parou.")
+        return False
+
+    # Salva o restante
+    salvar_lote_resultados(db_path, dados_para_salvar, execucao_id, indices_lote)
+    atualizar_status_execucao(db_path, execucao_id, "CONCLUIDA")
+
+    tempo_total = time.time() - start_time
+    print(f"\n✅ Finalizado em {tempo_total:.2f} segundos.")
+    print("💾 Todos os resultados foram salvos (consulta: menu 'Consultar Resultados do Otimizador').")
+    return True
+
+# === Busca adaptativa (amostragem aleatória + successive halving) ===
+
+# Espaço mais fino que a grade completa (~600 mil combinações): inviável exaustivamente
+ESPACO_BUSCA_ADAPTATIVA = {
+    "distancias": [round(-2.0 + 0.25 * i, 2) for i in range(29)],
+    "stops": [round(0.25 * i, 2) for i in range(13)],
+    "notas": list(range(20, 61, 5)),
+    "emas": list(range(50, 201, 10)),
+    "lucros": [round(0.05 * i, 2) for i in range(11)],
+}
+
+def amostrar_candidatos(espaco, quantidade, semente=None):
+    """Sorteia combinações distintas do espaço sem materializar o produto cartesiano."""
+    dimensoes = [espaco["distancias"], espaco["stops"], espaco["notas"], espaco["emas"], espaco["lucros"]]
+    total = math.prod(len(d) for d in dimensoes)
+    sorteados = random.Random(semente).sample(range(total), min(quantidade, total))
+
+    candidatos = []
+    for indice in sorted(sorteados):
+        combinacao = []
+        # Decodifica o índice em base mista (última dimensão varia mais rápido, como itertools.product)
+        for valores in reversed(dimensoes):
+            indice, posicao = divmod(indice, len(valores))
+            combinacao.append(valores[posicao])
+        candidatos.append(tuple(reversed(combinacao)))
+    return candidatos
+
+def fracoes_successive_halving(total_candles, eta=3, rodadas=3, minimo_candles=500):
+    """Frações crescentes do período, ex.: eta=3, rodadas=3 -> [1/9, 1/3, 1]."""
+    minimo = min(1.0, minimo_candles / max(total_candles, 1))
+    fracoes = []
+    for r in reversed(range(rodadas)):
+        fracao = max(eta ** -r, minimo)
+        if fracao not in fracoes:
+            fracoes.append(fracao)
+    return fracoes
+
+def processar_busca_adaptativa(db_path, execucao_id, n_workers=1):
+    """
+    Successive halving: todos os candidatos são avaliados na janela mais curta (candles mais
+    recentes); só a melhor fração 1/eta (por lucro) é promovida para a janela seguinte,
+    até o período completo. Cada ponto avaliado é gravado com sua fração de dados.
+    Os indicadores são calculados uma vez sobre o período inteiro (mais as barras de aquecimento
+    anteriores a data_inicio), então todas as janelas começam com Bollinger/EMA/RSI aquecidos.
+    """
+    execucao = carregar_execucao(db_path, execucao_id)
+    simbolo = execucao["simbolo"]
+    intervalo = execucao["intervalo"]
+    grade = execucao["grade"]
+
+    espaco = grade["espaco"]
+    candidatos = amostrar_candidatos(espaco, grade["candidatos"], grade["semente"])
+    periodos_ema = sorted({int(c[3]) for c in candidatos})
+
+    print("\n⏳ Carregando candles na memória...")
+    df_base = carregar_candles(
+        db_path, simbolo, intervalo, execucao["data_inicio"], execucao["data_fim"],
+        barras_aquecimento=barras_aquecimento_grade(grade)
+    )
+    aquecimento = df_base.attrs.get("barras_aquecimento", 0)
+    if len(df_base) <= aquecimento:
+        print("❌ Nenhum candle encontrado.")
+        atualizar_status_execucao(db_path, execucao_id, "SEM_DADOS")
+        return False
+
+    print("🧮 Pré-calculando indicadores...")
+    pacote = preparar_pacote_indicadores(df_base.copy(), periodos_ema=periodos_ema)
+    total_candles = len(df_base) - aquecimento
+    fracoes = fracoes_successive_halving(total_candles, grade["eta"], grade["rodadas"])
+
+    start_time = time.time()
+    dados_para_salvar = []
+    fracao = None
+    try:
+        for rodada, fracao in enumerate(fracoes, start=1):
+            inicio = max(1, len(df_base) - int(round(total_candles * fracao)))
+            print(f"\n🔎 Rodada {rodada}/{len(fracoes)}: {len(candidatos)} candidatos em {len(df_base) - inicio} candles ({fracao:.1%} do período)")
+
+            resultados = []
+            for resultado in executar_grade(pacote, candidatos, n_workers, inicio=inicio):
+                resultados.append(resultado)
+                dist, stop, nota, ema, lucro_min, lucro, win_rate, total_trades, profit_factor = resultado
+                if total_trades > 0:
+                    dados_para_salvar.append(resultado)
+                if len(dados_para_salvar) >= 500:
+                    salvar_lote_resultados(db_path, dados_para_salvar, execucao_id, fracao_dados=fracao)
+                    dados_para_salvar = []
+
+            salvar_lote_resultados(db_path, dados_para_salvar, execucao_id, fracao_dados=fracao)
+            dados_para_salvar = []
+
+            # Promove a melhor fração (ordenação estável: empates mantêm a ordem de amostragem)
+            ranking = sorted(resultados, key=lambda r: r[5], reverse=True)
+            melhor = ranking[0]
+            print(f"   ➤ Melhor da rodada: Lucro $ {melhor[5]:.2f} | Dist {melhor[0]}% | Stop {melhor[1]}% | Nota {melhor[2]} | EMA {melhor[3]} | Min {melhor[4]}%")
+            if rodada < len(fracoes):
+                manter = max(1, math.ceil(len(ranking) / grade["eta"]))
+                candidatos = [r[:5] for r in ranking[:manter]]
+    except KeyboardInterrupt:
+        salvar_lote_resultados(db_path, dados_para_salvar, execucao_id, fracao_dados=fracao)
+        atualizar_status_execucao(db_path, execucao_id, "INTERROMPIDA")
+        print(f"\n⏸️  Busca adaptativa #{execucao_id} interrompida. Os pontos avaliados foram salvos.")
+        return False
+
+    atualizar_status_execucao(db_path, execucao_id, "CONCLUIDA")
+    tempo_total = time.time() - start_time
+    print(f"\n✅ Finalizado em {tempo_total:.2f} segundos.")
+    print("💾 Todos os pontos avaliados foram salvos com a fração do período usada (fracao_dados).")
+    return True
+
+def reaproveitar_resultados(db_path, execucao_id, combinacoes):
+    """
+    Copia para a execução os resultados (período completo) de execuções anteriores com o mesmo
+    hash de dados e marca essas combinações como concluídas: a mesma combinação sobre os mesmos
+    candles não é simulada nem gravada de novo. Retorna quantas combinações foram reaproveitadas.
+    """
+    conn = conectar(db_path)
+    cursor = conn.cursor()
+    concluidos = {row[0] for row in cursor.execute("SELECT indice FROM progresso_otimizacao WHERE execucao_id = ?", (execucao_id,))}
+    anteriores = cursor.execute("""
+        SELECT r.parametros_id, p.hash, r.lucro_liquido, r.win_rate, r.total_trades, r.profit_factor
+        FROM execucoes_otimizacao atual
+        JOIN execucoes_otimizacao e ON e.hash_dados = atual.hash_dados AND e.id <> atual.id
+        JOIN resultados_execucao r ON r.execucao_id = e.id AND r.fracao_dados = 1.0
+        JOIN parametros_otimizacao p ON p.id = r.parametros_id
+        WHERE atual.id = ? AND atual.hash_dados IS NOT NULL
+    """, (execucao_id,)).fetchall()
+    por_hash = {linha[1]: linha for linha in anteriores}
+    if not por_hash:
+        conn.close()
+        return 0
+
+    reaproveitados = [
+        (i, por_hash[h]) for i, h in enumerate(hash_parametros(c) for c in combinacoes)
+        if i not in concluidos and h in por_hash
+    ]
+    if reaproveitados:
+        cursor.executemany("""
+            INSERT OR IGNORE INTO resultados_execucao (
+                execucao_id, parametros_id, fracao_dados, serie_id,
+                lucro_liquido, win_rate, total_trades, profit_factor
+            )
+            SELECT ?, ?, 1.0, s.id, ?, ?, ?, ?
+            FROM execucoes_otimizacao e
+            JOIN series_otimizacao s ON s.simbolo = e.simbolo AND s.intervalo = e.intervalo
+            WHERE e.id = ?
+        """, [(execucao_id, linha[0]) + tuple(linha[2:]) + (execucao_id,) for _, linha in reaproveitados])
+        cursor.executemany(
+            "INSERT OR IGNORE INTO progresso_otimizacao (execucao_id, indice) VALUES (?, ?)",
+            [(execucao_id, i) for i, _ in reaproveitados]
+        )
+        conn.commit()
+    conn.close()
+    return len(reaproveitados)
+
+def consultar_resultados(db_path, simbolo=None, intervalo=None, metrica="lucro_liquido", limite=20,
+                         execucao_id=None, fracao_dados=1.0, min_trades=None, parametros=None):
+    """
+    Top N resultados ordenados por 'metrica' (decrescente), direto no SQLite.
+    Filtros opcionais: par/intervalo (usam os índices por série), execução, fração dos dados
+    (None = todas), mínimo de trades e valores exatos de parâmetros, ex.: {"ema_periodo": 90}.
+    Retorna uma lista de dicionários.
+    """
+    if metrica not in METRICAS_RESULTADOS:
+        raise ValueError(f"Métrica inválida: {metrica} (use {', '.join(METRICAS_RESULTADOS)})")
+    inicializar_tabela_resultados(db_path)
+
+    condicoes, valores = [], []
+    if simbolo and intervalo:
+        condicoes.append("r.serie_id = (SELECT id FROM series_otimizacao WHERE simbolo = ? AND intervalo = ?)")
+        valores += [simbolo.upper(), intervalo]
+    elif simbolo or intervalo:
+        coluna = "simbolo" if simbolo else "intervalo"
+        condicoes.append(f"r.serie_id IN (SELECT id FROM series_otimizacao WHERE {coluna} = ?)")
+        valores.append(simbolo.upper() if simbolo else intervalo)
+    if fracao_dados is not None:
+        condicoes.append("r.fracao_dados = ?")
+        valores.append(float(fracao_dados))
+    if execucao_id is not None:
+        condicoes.append("r.execucao_id = ?")
+        valores.append(execucao_id)
+    if min_trades is not None:
+        condicoes.append("r.total_trades >= ?")
+        valores.append(min_trades)
+    for coluna, valor in (parametros or {}).items():
+        if coluna not in COLUNAS_PARAMETROS:
+            raise ValueError(f"Parâmetro inválido: {coluna}")
+        condicoes.append(f"p.{coluna} = ?")
+        valores.append(valor)
+
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    conn = conectar(db_path)
+    conn.row_factory = sqlite3.Row
+    linhas = conn.execute(f"""
+        SELECT r.execucao_id, e.data_execucao, s.simbolo, s.intervalo,
+               p.distancia_banda, p.stop_loss, p.nota_minima, p.ema_periodo, p.lucro_minimo,
+               r.lucro_liquido, r.win_rate, r.total_trades, r.profit_factor, r.fracao_dados
+        FROM resultados_execucao r
+        JOIN parametros_otimizacao p ON p.id = r.parametros_id
+        JOIN series_otimizacao s ON s.id = r.serie_id
+        JOIN execucoes_otimizacao e ON e.id = r.execucao_id
+        {where}
+        ORDER BY r.{metrica} DESC
+        LIMIT ?
+    """, valores + [int(limite)]).fetchall()
+    conn.close()
+    return [dict(linha) for linha in linhas]
+
+def exibir_campeoes(db_path, execucao_id):
+    """Exibe no console o top 3 (por lucro) de uma execução."""
+    print("\n" + "="*50)
+    print("🏆 TOP 3 DESTA EXECUÇÃO")
+    print("="*50)
+
+    ranking = consultar_resultados(db_path, execucao_id=execucao_id, limite=3)
+
+    if not ranking:
+        print("⚠️ Nenhum trade realizado.")
+        return
+
+    def print_setup(rank, r):
+        print(f"\n{rank} LUGAR (Lucro: $ {r['lucro_liquido']:.2f} | Win: {r['win_rate']:.1f}%)")
+        print(f"   ➤ Parâmetros: Dist {r['distancia_banda']}% | Stop {r['stop_loss']}% | Nota {r['nota_minima']} | EMA {r['ema_periodo']} | Min {r['lucro_minimo']}%")
+
+    for rank, r in zip(["🥇 PRIMEIRO", "🥈 SEGUNDO", "🥉 TERCEIRO"], ranking):
+        print_setup(rank, r)
+
+def exibir_melhores_resultados(db_path):
+    """Consulta interativa: top N de um par/intervalo (todas as execuções) pela métrica escolhida."""
+    print("\n🏆 === MELHORES RESULTADOS DO OTIMIZADOR ===")
+    inicializar_tabela_resultados(db_path)
+    conn = conectar(db_path)
+    series = conn.execute("SELECT simbolo, intervalo FROM series_otimizacao ORDER BY simbolo, intervalo").fetchall()
+    conn.close()
+    if not series:
+        print("⚠️ Nenhum resultado de otimização salvo.")
+        return
+
+    for i, (simbolo, intervalo) in enumerate(series, start=1):
+        print(f"{i} - {simbolo} {intervalo}")
+    escolha = input("Par/intervalo (Enter = todos): ").strip()
+    simbolo = intervalo = None
+    if escolha:
+        if not escolha.isdigit() or not 1 <= int(escolha) <= len(series):
+            print("❌ Opção inválida.")
+            return
+        simbolo, intervalo = series[int(escolha) - 1]
+
+    for i, metrica in enumerate(METRICAS_RESULTADOS, start=1):
+        print(f"{i} - {metrica}")
+    escolha = input("Ordenar por (Enter = 1): ").strip() or "1"
+    if not escolha.isdigit() or not 1 <= int(escolha) <= len(METRICAS_RESULTADOS):
+        print("❌ Opção inválida.")
+        return
+    metrica = METRICAS_RESULTADOS[int(escolha) - 1]
+
+    resp = input("Quantidade (Enter = 20): ").strip()
+    limite = int(resp) if resp.isdigit() and int(resp) > 0 else 20
+
+    resultados = consultar_resultados(db_path, simbolo, intervalo, metrica, limite)
+    if not resultados:
+        print("⚠️ Nenhum resultado encontrado.")
+        return
+    print(f"\n{'Exec':>5} | {'Par':<10} | {'Int':<4} | {'Dist':>5} | {'Stop':>4} | {'Nota':>4} | {'EMA':>4} | {'Min%':>4} | {'Lucro($)':>10} | {'Win%':>6} | {'Trades':>6} | {'PF':>5}")
+    print("-" * 100)
+    for r in resultados:
+        print(
+            f"{r['execucao_id']:>5} | {r['simbolo']:<10} | {r['intervalo']:<4} | {r['distancia_banda']:>5} | {r['stop_loss']:>4} | "
+            f"{r['nota_minima']:>4} | {r['ema_periodo']:>4} | {r['lucro_minimo']:>4} | {r['lucro_liquido']:>10.2f} | "
+            f"{r['win_rate']:>6.1f} | {r['total_trades']:>6} | {r['profit_factor']:>5.2f}"
+        )
+
+def perguntar_workers():
+    n_workers = obter_workers_configurados()
+    resp_workers = input(f"Processos paralelos (Enter = {n_workers}, 1 = serial): ").strip()
+    if resp_workers.isdigit() and int(resp_workers) > 0:
+        n_workers = int(resp_workers)
+    return n_workers
+
+def retomar_otimizacao(db_path):
+    """Lista execuções interrompidas e retoma a escolhida (só as combinações faltantes)."""
+    print("\n⏯️  === RETOMAR OTIMIZAÇÃO INTERROMPIDA ===")
+    pendentes = listar_execucoes_pendentes(db_path)
+    if not pendentes:
+        print("✅ Nenhuma execução pendente.")
+        input("\nPressione Enter para voltar ao menu...")
+        return
+
+    for execucao_id, data_execucao, simbolo, intervalo, total, feitos in pendentes:
+        print(f"{execucao_id} - {data_execucao} | {simbolo} {intervalo} | {feitos}/{total} combinações")
+
+    escolha = input("ID da execução a retomar: ").strip()
+    if not escolha.isdigit() or int(escolha) not in [p[0] for p in pendentes]:
+        print("❌ Opção inválida.")
+        return
+    execucao_id = int(escolha)
+
+    n_workers = perguntar_workers()
+    if processar_execucao(db_path, execucao_id, n_workers):
+        exibir_campeoes(db_path, execucao_id)
+    input("\nPressione Enter para voltar ao menu...")
+
 def executar_otimizacao(db_path):
     print("\n🚀 === OTIMIZADOR DE PARÂMETROS (GRID SEARCH 5D -> SQL) ===")
     print("Testando variáveis e salvando em BANCO DE DADOS.\n")
@@ -89,12 +952,7 @@ def executar_otimizacao(db_path):
     
     if not data_inicio_str:
         try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            tbl = f"candles_{simbolo.lower()}_{intervalo}"
-            cursor.execute(f"SELECT MIN(timestamp) FROM {tbl}")
-            min_ts = cursor.fetchone()[0]
-            conn.close()
+            min_ts, _ = periodo_disponivel(db_path, simbolo, intervalo)
             data_inicio = datetime.fromtimestamp(min_ts/1000).strftime("%Y-%m-%d %H:%M:%S")
         except:
             print("❌ Erro ao buscar datas.")
@@ -106,145 +964,64 @@ def executar_otimizacao(db_path):
     if not data_fim:
         data_fim = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    # === 3. Definição dos Ranges de Teste ===
+    # === 3. Estratégia de Busca ===
+    print("\n🧭 Estratégia de busca:")
+    print("1 - Grade completa (5D, exaustiva)")
+    print("2 - Busca adaptativa (amostragem aleatória + successive halving, espaço mais fino)")
+    estrategia = input("Opção (Enter = 1): ").strip()
+
+    if estrategia == "2":
+        candidatos = 2000
+        resp = input(f"Quantidade de candidatos sorteados (Enter = {candidatos}): ").strip()
+        if resp.isdigit() and int(resp) > 0:
+            candidatos = int(resp)
+
+        eta = 3
+        resp = input(f"Fator de corte por rodada - mantém 1/eta (Enter = {eta}): ").strip()
+        if resp.isdigit() and int(resp) >= 2:
+            eta = int(resp)
+
+        grade = {
+            "estrategia": "adaptativa",
+            "espaco": ESPACO_BUSCA_ADAPTATIVA,
+            "candidatos": candidatos,
+            "eta": eta,
+            "rodadas": 3,
+            "semente": random.randrange(2**31),
+        }
+        print(f"🔄 {candidatos} candidatos sorteados de {math.prod(len(v) for v in ESPACO_BUSCA_ADAPTATIVA.values())} combinações possíveis.")
+
+        n_workers = perguntar_workers()
+        input("Pressione Enter para iniciar...")
+
+        execucao_id = criar_execucao(db_path, simbolo, intervalo, data_inicio, data_fim, grade, total_combinacoes=candidatos)
+        if not processar_busca_adaptativa(db_path, execucao_id, n_workers):
+            return
+        exibir_campeoes(db_path, execucao_id)
+        input("\nPressione Enter para voltar ao menu...")
+        return
+
+    # === Definição dos Ranges de Teste (Grade Completa) ===
     print("\n⚙️  Configurando Grade de Testes Completa...")
     
-    # 5 DIMENSÕES DE TESTE (Conforme solicitado)
-    # Incluindo distâncias negativas e positivas
-    distancias = [-2.0, -1.0, 0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
-    stops = [0.0, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0]
-    notas = [20, 30, 40, 50, 60]
-    emas = [70, 80, 90, 100, 110]
-    lucros = [0.0, 0.1, 0.2, 0.3]
+    grade = dict(GRADE_PADRAO)
     
-    total_combinacoes = len(distancias) * len(stops) * len(notas) * len(emas) * len(lucros)
+    total_combinacoes = len(combinacoes_da_grade(grade))
     print(f"🔄 Total de simulações a executar: {total_combinacoes}")
     print("⚠️  Isso pode levar alguns minutos. Os resultados serão salvos no DB.")
-    input("Pressione Enter para iniciar...")
 
-    # === 4. Carregamento dos Dados ===
-    print("\n⏳ Carregando candles na memória...")
-    df_base = carregar_candles(db_path, simbolo, intervalo, data_inicio, data_fim)
-    
-    if df_base.empty:
-        print("❌ Nenhum candle encontrado.")
-        return
-
-    # Inicializa tabela no banco
-    inicializar_tabela_resultados(db_path)
-
-    # === 5. Loop de Otimização ===
-    dados_para_salvar = []
-    resultados_memoria = [] # Apenas para exibir o top 3 no final no console
-    
-    print("\n▶️  Iniciando execuções...")
-    print(f"{'Dist':<4} | {'Stop':<4} | {'Nota':<4} | {'EMA':<4} | {'Min%':<4} | {'Lucro($)':<10} | {'Win%':<6}")
-    print("-" * 65)
-
-    start_time = time.time()
-    contador = 0
-    data_execucao = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    for dist in distancias:
-        for stop in stops:
-            for nota in notas:
-                for ema in emas:
-                    for lucro_min in lucros:
-                        contador += 1
-                        
-                        # Executa o backtest
-                        _, operacoes = backtest_bollinger(
-                            df_base.copy(),
-                            distancia_bollinger=float(dist),
-                            stop_loss_perc=stop,
-                            taxa_corretagem=0.1,
-                            periodo_ema=int(ema),
-                            saldo_inicial=1000.0,
-                            arquivo_operacoes=None,
-                            usar_trailing_stop=True,
-                            sair_na_banda_superior=True,
-                            mover_alvo_com_preco=False,
-                            lucro_minimo_perc=lucro_min,
-                            nota_minima=nota,
-                            estrategia_adaptativa=True
-                        )
-                        
-                        # Calcula métricas
-                        if operacoes:
-                            saldo_final = operacoes[-1][4]
-                            lucro = saldo_final - 1000.0
-                            
-                            fechamentos = [op for op in operacoes if op[1] in ["VENDA", "STOP LOSS", "TRAILING STOP"]]
-                            total_trades = len(fechamentos)
-                            wins = len([op for op in fechamentos if op[3] > 0])
-                            win_rate = (wins / total_trades * 100) if total_trades > 0 else 0.0
-                            
-                            lucro_bruto = sum([op[3] for op in fechamentos if op[3] > 0])
-                            prejuizo_bruto = abs(sum([op[3] for op in fechamentos if op[3] < 0]))
-                            profit_factor = (lucro_bruto / prejuizo_bruto) if prejuizo_bruto > 0 else 0
-                        else:
-                            lucro = 0.0
-                            win_rate = 0.0
-                            total_trades = 0
-                            profit_factor = 0.0
-                        
-                        # Se houve trades, prepara para salvar
-                        if total_trades > 0:
-                            # Tupla para o SQLite
-                            registro_db = (
-                                data_execucao, simbolo, intervalo,
-                                float(dist), stop, nota, int(ema), lucro_min,
-                                lucro, win_rate, total_trades, profit_factor
-                            )
-                            dados_para_salvar.append(registro_db)
-                            
-                            # Dicionário para ranking em memória (console)
-                            registro_memoria = {
-                                "dist": dist, "stop": stop, "nota": nota,
-                                "ema": ema, "lucro_min": lucro_min,
-                                "lucro": lucro, "win_rate": win_rate,
-                                "trades": total_trades
-                            }
-                            resultados_memoria.append(registro_memoria)
-                            
-                            # Feedback visual se for lucrativo
-                            if lucro > 0:
-                                 print(f"{dist:<4} | {stop:<4} | {nota:<4} | {ema:<4} | {lucro_min:<4.1f} | {lucro:<10.2f} | {win_rate:<6.1f}")
-
-                        # Salva em lotes de 500 para não ocupar muita memória RAM
-                        if len(dados_para_salvar) >= 500:
-                            salvar_lote_resultados(db_path, dados_para_salvar)
-                            dados_para_salvar = []
+    n_workers = perguntar_workers()
 
-    # Salva o restante
-    if dados_para_salvar:
-        salvar_lote_resultados(db_path, dados_para_salvar)
+    input("Pressione Enter para iniciar...")
 
-    tempo_total = time.time() - start_time
-    print(f"\n✅ Finalizado em {tempo_total:.2f} segundos.")
-    print("💾 Todos os resultados foram salvos na tabela 'resultados_otimizacao'.")
+    # === 4. Registro da Execução (permite retomar se interrompida) ===
+    execucao_id = criar_execucao(db_path, simbolo, intervalo, data_inicio, data_fim, grade)
 
-    # === 6. Exibição Rápida dos Campeões (Console) ===
-    print("\n" + "="*50)
-    print("🏆 TOP 3 DESTA EXECUÇÃO")
-    print("="*50)
-    
-    if not resultados_memoria:
-        print("⚠️ Nenhum trade realizado.")
+    # === 5. Loop de Otimização ===
+    if not processar_execucao(db_path, execucao_id, n_workers):
         return
 
-    ranking = sorted(resultados_memoria, key=lambda x: x['lucro'], reverse=True)
-    
-    def print_setup(rank, r):
-        print(f"\n{rank} LUGAR (Lucro: $ {r['lucro']:.2f} | Win: {r['win_rate']:.1f}%)")
-        print(f"   ➤ Parâmetros: Dist {r['dist']}% | Stop {r['stop']}% | Nota {r['nota']} | EMA {r['ema']} | Min {r['lucro_min']}%")
-
-    print_setup("🥇 PRIMEIRO", ranking[0])
-    
-    if len(ranking) > 1:
-        print_setup("🥈 SEGUNDO", ranking[1])
-
-    if len(ranking) > 2:
-        print_setup("🥉 TERCEIRO", ranking[2])
+    # === 6. Exibição Rápida dos Campeões (Console) ===
+    exibir_campeoes(db_path, execucao_id)
 
-    input("\nPressione Enter para voltar ao menu...")
\ No newline at end of file
+    input("\nPressione Enter para voltar ao menu...")
@@ -0,0 +1,184 @@
+﻿import argparse
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from agregacao import duracao_intervalo_ms
+from fontes import PESO_KLINES, FonteBinance, FonteSintetica, LimitadorPeso, kline_sintetico
+
+# === Servidor local que imita GET /api/v3/klines da Binance ===
+# Usado para testar/medir o download concorrente sem rede: gera klines determinísticos
+# (mesmo par/intervalo/timestamp = mesmo candle), conta o peso por janela fixa como a Binance
+# (cabeçalho X-MBX-USED-WEIGHT-1M, HTTP 429 + Retry-After ao estourar) e pode injetar falhas 5xx.
+# Os candles são os mesmos da FonteSintetica (fontes.kline_sintetico).
+
+
+class ServidorKlinesStub(ThreadingHTTPServer):
+    """
+    inicio_ms: primeiro candle disponível de toda série; fim_ms: "agora" (último candle aberto).
+    peso_por_janela/janela_segundos: limite aplicado; taxa_falhas: fração de respostas 500.
+    """
+    daemon_threads = True
+
+    def __init__(self, inicio_ms, fim_ms, peso_por_janela=6000, janela_segundos=60.0, taxa_falhas=0.0, porta=0):
+        super().__init__(("127.0.0.1", porta), _TratadorKlines)
+        self.inicio_ms, self.fim_ms = inicio_ms, fim_ms
+        self.peso_por_janela, self.janela_segundos = peso_por_janela, janela_segundos
+        self.taxa_falhas = taxa_falhas
+        self.trava = threading.Lock()
+        self.janela_atual, self.peso_usado = None, 0
+        self.requisicoes = self.recusadas = self.falhas = 0
+        self.pico_peso = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def registrar(self):
+        """Conta o peso da requisição; retorna (status, peso usado, segundos até a próxima janela)."""
+        with self.trava:
+            agora = time.monotonic()
+            janela = int(agora // self.janela_segundos)
+            if janela != self.janela_atual:
+                self.janela_atual, self.peso_usado = janela, 0
+            restante = (janela + 1) * self.janela_segundos - agora
+            self.requisicoes += 1
+            if self.peso_usado + PESO_KLINES > self.peso_por_janela:
+                self.recusadas += 1
+                return 429, self.peso_usado, restante
+            self.peso_usado += PESO_KLINES
+            self.pico_peso = max(self.pico_peso, self.peso_usado)
+            # Falhas determinísticas: a cada 1/taxa requisições
+            if self.taxa_falhas and self.requisicoes % max(1, round(1 / self.taxa_falhas)) == 0:
+                self.falhas += 1
+                return 500, self.peso_usado, restante
+            return 200, self.peso_usado, restante
+
+    def estatisticas(self):
+        return {
+            "requisicoes": self.requisicoes, "recusadas_429": self.recusadas, "falhas_500": self.falhas,
+            "pico_peso_janela": self.pico_peso, "limite_peso_janela": self.peso_por_janela,
+        }
+
+
+class _TratadorKlines(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status, corpo, cabecalhos):
+        dados = json.dumps(corpo).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        for nome, valor in cabecalhos.items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/api/v3/klines":
+            self._responder(404, {"code": -1, "msg": "not found"}, {})
+            return
+        status, peso, restante = self.server.registrar()
+        cabecalhos = {"X-MBX-USED-WEIGHT-1M": str(peso)}
+        if status == 429:
+            cabecalhos["Retry-After"] = str(max(1, math.ceil(restante)))
+            self._responder(429, {"code": -1003, "msg": "Too many requests"}, cabecalhos)
+            return
+        if status == 500:
+            self._responder(500, {"code": -1000, "msg": "erro simulado"}, cabecalhos)
+            return
+
+        parametros = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            duracao = duracao_intervalo_ms(parametros["interval"])
+            simbolo = parametros["symbol"]
+        except (KeyError, ValueError):
+            self._responder(400, {"code": -1120, "msg": "Invalid interval."}, cabecalhos)
+            return
+        limite = min(int(parametros.get("limit", 500)), 1000)
+        inicio = max(int(parametros.get("startTime", self.server.inicio_ms)), self.server.inicio_ms)
+        fim = min(int(parametros.get("endTime", self.server.fim_ms)), self.server.fim_ms)
+        primeiro = -(-inicio // duracao) * duracao
+        klines = [
+            kline_sintetico(simbolo, t, duracao)
+            for t in range(primeiro, min(fim, primeiro + limite * duracao - 1) + 1, duracao)
+        ]
+        self._responder(200, klines, cabecalhos)
+
+
+def iniciar_servidor_stub(**kwargs):
+    """Sobe o servidor numa thread; retorna o servidor (use .url e, ao final, .shutdown())."""
+    servidor = ServidorKlinesStub(**kwargs)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def main():
+    """Mede o download concorrente (downloader.baixar_series) contra o servidor local."""
+    from armazenamento import conectar, fechar_conexoes
+    from db_utils import criar_tabela_candles, gravar_candles
+    from downloader import baixar_series
+
+    parser = argparse.ArgumentParser(description="Benchmark offline do download concorrente de candles.")
+    parser.add_argument("--pares", type=int, default=8)
+    parser.add_argument("--intervalos", nargs="+", default=["1m", "5m", "1h"])
+    parser.add_argument("--candles", type=int, default=20_000, help="Candles de 1m disponíveis por série.")
+    parser.add_argument("--peso-por-janela", type=int, default=600)
+    parser.add_argument("--janela", type=float, default=10.0, help="Duração da janela de peso em segundos.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--taxa-falhas", type=float, default=0.02)
+    parser.add_argument("--sem-http", action="store_true", help="Usa a FonteSintetica (mede só a gravação).")
+    args = parser.parse_args()
+
+    fim = (int(time.time() * 1000) // 60_000) * 60_000
+    servidor = iniciar_servidor_stub(
+        inicio_ms=fim - args.candles * 60_000, fim_ms=fim, peso_por_janela=args.peso_por_janela,
+        janela_segundos=args.janela, taxa_falhas=args.taxa_falhas
+    )
+    pasta = tempfile.mkdtemp(prefix="benchmark_download_")
+    db_path = os.path.join(pasta, "candles_download.db")
+    series = [(f"PAR{i}USDT", intervalo) for i in range(args.pares) for intervalo in args.intervalos]
+
+    # Banco vazio: baixar_series começaria LIMITE_KLINES candles atrás; semeia o primeiro candle para baixar tudo
+    conn = conectar(db_path)
+    cursor = conn.cursor()
+    for simbolo, intervalo in series:
+        tabela = f"candles_{simbolo.lower()}_{intervalo}"
+        criar_tabela_candles(cursor, tabela)
+        duracao = duracao_intervalo_ms(intervalo)
+        primeiro = -(-servidor.inicio_ms // duracao) * duracao
+        gravar_candles(conn, tabela, [kline_sintetico(simbolo, primeiro, duracao)])
+    conn.commit()
+    conn.close()
+
+    if args.sem_http:
+        fonte = FonteSintetica(servidor.inicio_ms, fim)
+    else:
+        fonte = FonteBinance(servidor.url, LimitadorPeso(args.peso_por_janela, args.janela), args.workers)
+    try:
+        inicio = time.perf_counter()
+        novos = baixar_series(db_path, series, n_workers=args.workers, fonte=fonte)
+        segundos = time.perf_counter() - inicio
+    finally:
+        fonte.fechar()
+        servidor.shutdown()
+        fechar_conexoes(db_path)
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    total = sum(novos.values())
+    print(f"\n📊 {len(series)} séries | {total:,} candles em {segundos:.2f}s ({total / segundos:,.0f} candles/s)")
+    if not args.sem_http:
+        for nome, valor in servidor.estatisticas().items():
+            print(f"   {nome}: {valor}")
+
+
+if __name__ == "__main__":
+    main()
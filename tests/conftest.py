@@ -0,0 +1,35 @@
+﻿import os
+import sys
+
+import pandas as pd
+import pytest
+
+# Os módulos do aplicativo ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from armazenamento import fechar_conexoes
+from benchmark import gerar_candles_sinteticos, criar_banco_sintetico
+
+
+@pytest.fixture(autouse=True)
+def pasta_isolada(tmp_path, monkeypatch):
+    """Cada teste roda numa pasta vazia: sem app_config.json (configuração padrão) e sem arquivos soltos."""
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    fechar_conexoes()
+
+
+@pytest.fixture
+def candles():
+    """2000 candles de 1h sintéticos com o timestamp já convertido, como devolve carregar_candles."""
+    df = gerar_candles_sinteticos(2000, "1h", seed=7, volatilidade=0.01)
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
+    return df
+
+
+@pytest.fixture
+def banco(tmp_path):
+    """Banco SQLite temporário com BTCUSDT 1m (3000 candles sintéticos). Retorna (db_path, DataFrame gerado)."""
+    db_path = str(tmp_path / "candles.db")
+    df = criar_banco_sintetico(db_path, 3000, "BTCUSDT", "1m", seed=3)
+    return db_path, df
@@ -0,0 +1,75 @@
+﻿import numpy as np
+import pytest
+
+from agregacao import agregar_candles, duracao_intervalo_ms
+from benchmark import gerar_candles_sinteticos
+
+HORA = 3_600_000
+
+
+def _colunas(df):
+    return {c: df[c].to_numpy() for c in df.columns}
+
+
+def _referencia(df, intervalo):
+    """Agregação ingênua período a período (groupby do pandas) para comparar com o reduceat."""
+    duracao = duracao_intervalo_ms(intervalo)
+    grupos = df.groupby(df["timestamp"] - df["timestamp"] % duracao, sort=True)
+    ref = grupos.agg(
+        open=("open", "first"), high=("high", "max"), low=("low", "min"), close=("close", "last"),
+        volume=("volume", "sum"), quote_asset_volume=("quote_asset_volume", "sum"),
+        number_of_trades=("number_of_trades", "sum"),
+        taker_buy_base_asset_volume=("taker_buy_base_asset_volume", "sum"),
+        taker_buy_quote_asset_volume=("taker_buy_quote_asset_volume", "sum"),
+    )
+    return [
+        [int(p), r.open, r.high, r.low, r.close, r.volume, int(p) + duracao - 1, r.quote_asset_volume,
+         int(r.number_of_trades), r.taker_buy_base_asset_volume, r.taker_buy_quote_asset_volume]
+        for p, r in ref.iterrows()
+    ]
+
+
+@pytest.mark.parametrize("intervalo", ["5m", "15m", "1h", "4h"])
+def test_agregar_periodos_completos(intervalo):
+    df = gerar_candles_sinteticos(24 * 60, intervalo="1m", seed=5)
+
+    klines = agregar_candles(_colunas(df), intervalo)
+
+    assert len(klines) == 24 * 60 * 60_000 // duracao_intervalo_ms(intervalo)
+    np.testing.assert_allclose(np.array(klines, dtype=float), np.array(_referencia(df, intervalo), dtype=float), rtol=1e-12)
+
+
+def test_descarta_primeiro_periodo_parcial():
+    # 1m começando às 00:20: a hora 00h está incompleta
+    df = gerar_candles_sinteticos(3 * 60 - 20, intervalo="1m", seed=5, inicio="2020-01-01 00:20:00")
+
+    klines = agregar_candles(_colunas(df), "1h")
+
+    assert [k[0] % (24 * HORA) for k in klines] == [HORA, 2 * HORA]
+    np.testing.assert_allclose(np.array(klines, dtype=float), np.array(_referencia(df, "1h")[1:], dtype=float), rtol=1e-12)
+
+
+def test_descarta_periodo_com_buraco():
+    df = gerar_candles_sinteticos(3 * 60, intervalo="1m", seed=5)
+    df = df.drop(index=90).reset_index(drop=True)  # Falta o 1m das 01:30
+
+    klines = agregar_candles(_colunas(df), "1h")
+
+    assert [k[0] % (24 * HORA) for k in klines] == [0, 2 * HORA]
+
+
+def test_manter_ultimo_periodo_incompleto():
+    df = gerar_candles_sinteticos(2 * 60 + 25, intervalo="1m", seed=5)
+
+    assert len(agregar_candles(_colunas(df), "1h")) == 2
+
+    klines = agregar_candles(_colunas(df), "1h", manter_ultimo=True)
+    assert len(klines) == 3
+    ultimo = klines[-1]
+    assert ultimo[0] % (24 * HORA) == 2 * HORA
+    assert ultimo[4] == df["close"].iloc[-1]
+    assert ultimo[5] == pytest.approx(df["volume"].iloc[-25:].sum(), rel=1e-12)
+
+
+def test_agregar_vazio():
+    assert agregar_candles({"timestamp": np.array([], dtype=np.int64)}, "1h") == []
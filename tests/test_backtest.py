@@ -0,0 +1,46 @@
+﻿import itertools
+
+import pytest
+
+from backtest import backtest_bollinger
+
+# Combinações que passam por todos os ramos da máquina de estados (stop, trailing, alvo móvel, adaptativa)
+COMBINACOES = list(itertools.product(
+    [0.5, 2.0],            # distância da banda
+    [None, 1.5],           # stop loss
+    [0, 40],               # nota mínima
+    [None, 50],            # EMA
+    [False, True],         # estratégia adaptativa
+    [False, True],         # trailing stop
+    [False, True],         # mover alvo com o preço
+))
+
+
+@pytest.mark.parametrize("dist, stop, nota, ema, adaptativa, trailing, mover", COMBINACOES)
+def test_motor_numpy_igual_ao_pandas(candles, dist, stop, nota, ema, adaptativa, trailing, mover):
+    parametros = dict(
+        distancia_bollinger=dist, stop_loss_perc=stop, taxa_corretagem=0.1, periodo_ema=ema,
+        usar_trailing_stop=trailing, mover_alvo_com_preco=mover,
+        nota_minima=nota, estrategia_adaptativa=adaptativa
+    )
+    _, operacoes_pandas = backtest_bollinger(candles.copy(), motor="pandas", **parametros)
+    _, operacoes_numpy = backtest_bollinger(candles.copy(), motor="numpy", **parametros)
+    assert operacoes_pandas
+    assert operacoes_numpy == operacoes_pandas
+
+
+def test_motor_numpy_grava_o_mesmo_csv(candles, tmp_path):
+    arquivos = {}
+    for motor in ("pandas", "numpy"):
+        arquivos[motor] = tmp_path / f"operacoes_{motor}.csv"
+        _, operacoes = backtest_bollinger(
+            candles.copy(), 0.5, stop_loss_perc=2.0, taxa_corretagem=0.1, periodo_ema=50,
+            arquivo_operacoes=str(arquivos[motor]), motor=motor
+        )
+        assert operacoes
+    assert arquivos["numpy"].read_text() == arquivos["pandas"].read_text()
+
+
+def test_motor_desconhecido(candles):
+    with pytest.raises(ValueError):
+        backtest_bollinger(candles.copy(), motor="rust")
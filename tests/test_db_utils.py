@@ -0,0 +1,134 @@
+﻿import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from armazenamento import conectar
+from benchmark import gerar_candles_sinteticos
+from db_utils import (
+    atualizar_caches_candles, carregar_candles, criar_tabela_candles, gravar_candles,
+    inicializar_layout_unificado, obter_catalogo,
+)
+from cache_parquet import ler_cache_parquet
+from memmap_candles import abrir_memmap
+
+COLUNAS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+
+def _texto(ms):
+    return pd.Timestamp(int(ms), unit="ms").strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _ativar_cache(db_path, cache):
+    """Liga o cache pedido no app_config.json da pasta do teste e o preenche a partir do banco."""
+    if cache is None:
+        return
+    with open("app_config.json", "w", encoding="utf-8") as f:
+        json.dump({cache: True}, f)
+    atualizar_caches_candles(db_path, "BTCUSDT", "1m", desde_ms=None)
+    # Garante que a leitura passa mesmo pelo cache (e não cai no SQLite)
+    if cache == "cache_memmap":
+        assert abrir_memmap(db_path, "BTCUSDT", "1m") is not None
+    else:
+        assert ler_cache_parquet(db_path, "BTCUSDT", "1m", 0, 4102444800000, COLUNAS) is not None
+
+
+@pytest.mark.parametrize("cache", [None, "cache_parquet", "cache_memmap"])
+def test_carregar_candles_filtra_o_periodo(banco, cache):
+    db_path, gerado = banco
+    _ativar_cache(db_path, cache)
+    inicio, fim = gerado["timestamp"].iloc[1000], gerado["timestamp"].iloc[1999]
+
+    df = carregar_candles(db_path, "BTCUSDT", "1m", _texto(inicio), _texto(fim))
+
+    esperado = gerado[COLUNAS].iloc[1000:2000].reset_index(drop=True)
+    esperado["timestamp"] = pd.to_datetime(esperado["timestamp"], unit="ms")
+    pd.testing.assert_frame_equal(df.reset_index(drop=True), esperado, check_dtype=False)
+    assert df.attrs["barras_aquecimento"] == 0
+
+
+@pytest.mark.parametrize("cache", [None, "cache_parquet", "cache_memmap"])
+def test_carregar_candles_com_aquecimento(banco, cache):
+    db_path, gerado = banco
+    _ativar_cache(db_path, cache)
+    timestamps = gerado["timestamp"].to_numpy()
+
+    # No meio da série: exatamente as barras pedidas antes de data_inicial
+    df = carregar_candles(db_path, "BTCUSDT", "1m", _texto(timestamps[1000]), _texto(timestamps[1999]), barras_aquecimento=50)
+    assert df.attrs["barras_aquecimento"] == 50
+    assert len(df) == 1050
+    assert df["timestamp"].iloc[50] == pd.Timestamp(int(timestamps[1000]), unit="ms")
+
+    # No início do histórico: só as barras que existem
+    df = carregar_candles(db_path, "BTCUSDT", "1m", _texto(timestamps[10]), _texto(timestamps[99]), barras_aquecimento=50)
+    assert df.attrs["barras_aquecimento"] == 10
+    assert np.array_equal(df["close"].to_numpy(), gerado["close"].to_numpy()[:100])
+
+
+def test_carregar_candles_periodo_vazio(banco):
+    db_path, _ = banco
+    df = carregar_candles(db_path, "BTCUSDT", "1m", "1990-01-01 00:00:00", "1990-12-31 00:00:00")
+    assert df.empty
+
+
+# === gravar_candles: contagem de candles novos ===
+
+TABELA = "candles_ethusdt_1h"
+
+
+@pytest.fixture(params=["por_par", "unificado"])
+def conexao(request, tmp_path):
+    conn = conectar(str(tmp_path / "gravacao.db"))
+    if request.param == "unificado":
+        inicializar_layout_unificado(conn)
+    criar_tabela_candles(conn.cursor(), TABELA)
+    conn.commit()
+    return conn
+
+
+@pytest.fixture
+def klines():
+    return gerar_candles_sinteticos(500, intervalo="1h", seed=11).values.tolist()
+
+
+def _total(conn):
+    return conn.execute(f"SELECT COUNT(*) FROM {TABELA}").fetchone()[0]
+
+
+@pytest.mark.parametrize("modo", ["ignorar", "upsert"])
+def test_gravar_candles_conta_novos_com_sobreposicao(conexao, klines, modo):
+    assert gravar_candles(conexao, TABELA, klines[:300], modo=modo, tamanho_lote=64) == 300
+    # 100 já gravados + 200 novos, em lotes que atravessam a fronteira
+    assert gravar_candles(conexao, TABELA, klines[200:], modo=modo, tamanho_lote=64) == 200
+    # Regravar tudo não cria nada
+    assert gravar_candles(conexao, TABELA, klines, modo=modo, tamanho_lote=64) == 0
+    assert _total(conexao) == 500
+
+    catalogo = obter_catalogo(conexao.execute("PRAGMA database_list").fetchone()[2])
+    assert [(c["simbolo"], c["intervalo"], c["total_candles"]) for c in catalogo] == [("ETHUSDT", "1h", 500)]
+
+
+@pytest.mark.parametrize("modo", ["ignorar", "upsert"])
+def test_gravar_candles_duplicatas_no_mesmo_lote(conexao, klines, modo):
+    repetidos = klines[:50] + klines[:50]
+    assert gravar_candles(conexao, TABELA, repetidos, modo=modo) == 50
+    assert _total(conexao) == 50
+
+
+def test_gravar_candles_upsert_sobrescreve_sem_contar(conexao, klines):
+    gravar_candles(conexao, TABELA, klines[:10])
+    corrigido = list(klines[9])
+    corrigido[4] = corrigido[4] * 2
+
+    assert gravar_candles(conexao, TABELA, [corrigido], modo="ignorar") == 0
+    assert conexao.execute(f"SELECT close FROM {TABELA} WHERE timestamp = ?", (corrigido[0],)).fetchone()[0] == klines[9][4]
+
+    assert gravar_candles(conexao, TABELA, [corrigido], modo="upsert") == 0
+    assert conexao.execute(f"SELECT close FROM {TABELA} WHERE timestamp = ?", (corrigido[0],)).fetchone()[0] == corrigido[4]
+    assert _total(conexao) == 10
+
+
+def test_gravar_candles_modo_invalido(conexao, klines):
+    with pytest.raises(ValueError):
+        gravar_candles(conexao, TABELA, klines[:1], modo="substituir")
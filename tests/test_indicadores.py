@@ -0,0 +1,62 @@
+﻿import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import gerar_candles_sinteticos
+from indicadores import (
+    calcular_bollinger, adicionar_ema_tendencia, calcular_rsi,
+    BollingerIncremental, EMAIncremental, RSIIncremental
+)
+
+
+def _serie(caso):
+    """Fechamentos com os casos que mais quebram somas móveis: preços arredondados, trechos constantes, escala alta."""
+    close = gerar_candles_sinteticos(3000, "1m", seed=11, volatilidade=0.01)["close"].to_numpy()
+    if caso == "arredondado":
+        close = np.round(close, 2)
+    elif caso == "constante":
+        close = close.copy()
+        close[500:700] = close[500]
+    elif caso == "escala":
+        close = close * 1e6
+    return close
+
+
+def _iguais(incremental, referencia):
+    """Comparação bit a bit (NaN == NaN)."""
+    incremental = np.asarray(incremental, dtype=np.float64)
+    referencia = np.asarray(referencia, dtype=np.float64)
+    assert np.array_equal(incremental, referencia, equal_nan=True)
+
+
+@pytest.mark.parametrize("caso", ["aleatorio", "arredondado", "constante", "escala"])
+def test_incrementais_iguais_ao_pandas(caso):
+    close = _serie(caso)
+    df = pd.DataFrame({"close": close})
+    bollinger = calcular_bollinger(df.copy())
+    ema = adicionar_ema_tendencia(df.copy(), 90)["ema_90"]
+    rsi = calcular_rsi(df.copy())["rsi"]
+
+    bb, em, rs = BollingerIncremental(), EMAIncremental(90), RSIIncremental()
+    valores_bb, valores_ema, valores_rsi = [], [], []
+    for i, c in enumerate(close):
+        if i == len(close) // 2:
+            # O estado salvo (JSON) e recarregado continua a série sem diferença
+            bb = BollingerIncremental.de_dict(json.loads(json.dumps(bb.para_dict())))
+            em = EMAIncremental.de_dict(json.loads(json.dumps(em.para_dict())))
+            rs = RSIIncremental.de_dict(json.loads(json.dumps(rs.para_dict())))
+        valores_bb.append(bb.atualizar(c))
+        valores_ema.append(em.atualizar(c))
+        valores_rsi.append(rs.atualizar(c))
+
+    for coluna in ("media", "desvio", "BB_up", "BB_down"):
+        _iguais([v[coluna] for v in valores_bb], bollinger[coluna])
+    _iguais(valores_ema, ema)
+    _iguais(valores_rsi, rsi)
+
+
+def test_atualizar_lote():
+    close = _serie("aleatorio")[:200]
+    _iguais(RSIIncremental().atualizar_lote(close), calcular_rsi(pd.DataFrame({"close": close}))["rsi"])
@@ -0,0 +1,92 @@
+﻿import json
+
+import numpy as np
+import pytest
+
+from agregacao import agregar_candles
+from armazenamento import conectar
+from db_utils import COLUNAS_CANDLES, criar_tabela_candles, gravar_candles
+from fontes import FonteSintetica
+from lacunas import _lacunas_em, encontrar_lacunas, reparar_lacunas
+from memmap_candles import abrir_memmap, atualizar_memmap
+
+MINUTO = 60_000
+TABELA = "candles_btcusdt_1m"
+
+
+def _apagar(db_path, timestamps):
+    conn = conectar(db_path)
+    conn.executemany(f"DELETE FROM {TABELA} WHERE timestamp = ?", [(int(t),) for t in timestamps])
+    conn.commit()
+    conn.close()
+
+
+def _esperadas(ts, faixas):
+    return [(int(ts[i]), int(ts[j - 1]), j - i) for i, j in faixas]
+
+
+# Linhas apagadas: no meio de um bloco, cruzando a borda entre blocos (tamanho_bloco=1000) e um candle isolado
+FAIXAS = [(100, 110), (995, 1005), (2500, 2501)]
+
+
+def test_lacunas_em():
+    ts = np.array([0, 1, 2, 5, 6, 10]) * MINUTO
+    assert _lacunas_em(ts, MINUTO) == [(3 * MINUTO, 4 * MINUTO, 2), (7 * MINUTO, 9 * MINUTO, 3)]
+    assert _lacunas_em(ts[:1], MINUTO) == []
+
+
+@pytest.mark.parametrize("tamanho_bloco", [1000, 64, 100_000])
+def test_encontrar_lacunas(banco, tamanho_bloco):
+    db_path, gerado = banco
+    ts = gerado["timestamp"].to_numpy()
+    assert encontrar_lacunas(db_path, "BTCUSDT", "1m", tamanho_bloco=tamanho_bloco) == []
+
+    _apagar(db_path, np.concatenate([ts[i:j] for i, j in FAIXAS]))
+
+    assert encontrar_lacunas(db_path, "BTCUSDT", "1m", tamanho_bloco=tamanho_bloco) == _esperadas(ts, FAIXAS)
+
+
+def test_encontrar_lacunas_pelo_memmap(banco):
+    db_path, gerado = banco
+    ts = gerado["timestamp"].to_numpy()
+    _apagar(db_path, np.concatenate([ts[i:j] for i, j in FAIXAS]))
+    with open("app_config.json", "w", encoding="utf-8") as f:
+        json.dump({"cache_memmap": True}, f)
+    atualizar_memmap(db_path, "BTCUSDT", "1m")
+    assert abrir_memmap(db_path, "BTCUSDT", "1m") is not None
+
+    assert encontrar_lacunas(db_path, "BTCUSDT", "1m") == _esperadas(ts, FAIXAS)
+
+
+def test_reparar_lacunas_com_fonte(banco):
+    db_path, gerado = banco
+    ts = gerado["timestamp"].to_numpy()
+    _apagar(db_path, np.concatenate([ts[i:j] for i, j in FAIXAS]))
+
+    inseridos = reparar_lacunas(db_path, "BTCUSDT", "1m", fonte=FonteSintetica(inicio_ms=int(ts[0])))
+
+    assert inseridos == sum(j - i for i, j in FAIXAS)
+    assert encontrar_lacunas(db_path, "BTCUSDT", "1m") == []
+    conn = conectar(db_path)
+    assert conn.execute(f"SELECT COUNT(*) FROM {TABELA}").fetchone()[0] == len(ts)
+    conn.close()
+
+
+def test_reparar_intervalo_personalizado_reagrega_do_1m(banco):
+    db_path, gerado = banco
+    klines = agregar_candles({c: gerado[c].to_numpy() for c in COLUNAS_CANDLES}, "15m")
+    tabela = "candles_btcusdt_15m"
+    conn = conectar(db_path)
+    criar_tabela_candles(conn.cursor(), tabela)
+    gravar_candles(conn, tabela, klines)
+    conn.executemany(f"DELETE FROM {tabela} WHERE timestamp = ?", [(k[0],) for k in klines[40:45]])
+    conn.commit()
+    conn.close()
+
+    assert encontrar_lacunas(db_path, "BTCUSDT", "15m") == [(klines[40][0], klines[44][0], 5)]
+    assert reparar_lacunas(db_path, "BTCUSDT", "15m") == 5
+
+    conn = conectar(db_path)
+    linhas = conn.execute(f"SELECT {', '.join(COLUNAS_CANDLES)} FROM {tabela} ORDER BY timestamp").fetchall()
+    conn.close()
+    np.testing.assert_allclose(np.array(linhas, dtype=float), np.array(klines, dtype=float))
@@ -0,0 +1,126 @@
+﻿import pytest
+
+import otimizador
+from benchmark import criar_banco_sintetico
+from otimizador import (
+    combinacoes_da_grade, criar_execucao, carregar_execucao, indices_concluidos,
+    processar_execucao, reaproveitar_resultados,
+)
+
+# Todas as combinações operam nesses dados: só combinações com trades têm resultado gravado para reaproveitar
+GRADE = {
+    "distancias": [0.0, 0.5, 1.0],
+    "stops": [0.0, 1.5],
+    "notas": [0, 40],
+    "emas": [50],
+    "lucros": [0.0],
+}
+PERIODO = ("2020-01-10 00:00:00", "2020-02-28 00:00:00")
+
+
+def _banco(pasta, nome="otimizador.db"):
+    db_path = str(pasta / nome)
+    criar_banco_sintetico(db_path, 1500, "BTCUSDT", "1h", seed=21)
+    return db_path
+
+
+def _nova_execucao(db_path, grade=GRADE):
+    return criar_execucao(db_path, "BTCUSDT", "1h", *PERIODO, grade)
+
+
+def _resultados(db_path, execucao_id):
+    """{hash dos parâmetros: métricas} da execução; falha se alguma combinação foi gravada duas vezes."""
+    conn = otimizador.conectar(db_path)
+    linhas = conn.execute("""
+        SELECT p.hash, r.lucro_liquido, r.win_rate, r.total_trades, r.profit_factor
+        FROM resultados_execucao r JOIN parametros_otimizacao p ON p.id = r.parametros_id
+        WHERE r.execucao_id = ?
+    """, (execucao_id,)).fetchall()
+    conn.close()
+    resultados = {linha[0]: linha[1:] for linha in linhas}
+    assert len(resultados) == len(linhas)
+    return resultados
+
+
+@pytest.fixture
+def avaliadas(monkeypatch):
+    """Registra as combinações que chegam a ser simuladas por processar_execucao."""
+    lista = []
+    original = otimizador.executar_grade
+
+    def espiao(pacote, combinacoes, *args, **kwargs):
+        lista.extend(combinacoes)
+        yield from original(pacote, combinacoes, *args, **kwargs)
+
+    monkeypatch.setattr(otimizador, "executar_grade", espiao)
+    return lista
+
+
+def test_processar_execucao_retoma_sem_repetir(tmp_path, monkeypatch, avaliadas):
+    # Referência: a mesma execução sem interrupção num banco idêntico
+    db_referencia = _banco(tmp_path, "referencia.db")
+    id_referencia = _nova_execucao(db_referencia)
+    assert processar_execucao(db_referencia, id_referencia)
+    esperado = _resultados(db_referencia, id_referencia)
+    assert len(esperado) == len(combinacoes_da_grade(GRADE))
+
+    db_path = _banco(tmp_path)
+    execucao_id = _nova_execucao(db_path)
+    espiao = otimizador.executar_grade
+
+    def interrompe_apos_tres(pacote, combinacoes, *args, **kwargs):
+        for n, resultado in enumerate(espiao(pacote, combinacoes, *args, **kwargs)):
+            if n == 3:
+                raise KeyboardInterrupt
+            yield resultado
+
+    monkeypatch.setattr(otimizador, "executar_grade", interrompe_apos_tres)
+    assert not processar_execucao(db_path, execucao_id)
+    assert carregar_execucao(db_path, execucao_id)["status"] == "INTERROMPIDA"
+    assert indices_concluidos(db_path, execucao_id) == {0, 1, 2}
+
+    monkeypatch.setattr(otimizador, "executar_grade", espiao)
+    avaliadas.clear()
+    assert processar_execucao(db_path, execucao_id)
+
+    combinacoes = combinacoes_da_grade(GRADE)
+    assert avaliadas == combinacoes[3:]
+    assert indices_concluidos(db_path, execucao_id) == set(range(len(combinacoes)))
+    assert carregar_execucao(db_path, execucao_id)["status"] == "CONCLUIDA"
+    assert _resultados(db_path, execucao_id) == esperado
+
+
+def test_reaproveita_resultados_com_os_mesmos_dados(tmp_path, avaliadas):
+    db_path = _banco(tmp_path)
+    primeira = _nova_execucao(db_path)
+    assert processar_execucao(db_path, primeira)
+    avaliadas.clear()
+
+    # Mesma grade: nada é simulado de novo
+    segunda = _nova_execucao(db_path)
+    assert processar_execucao(db_path, segunda)
+    assert avaliadas == []
+    assert _resultados(db_path, segunda) == _resultados(db_path, primeira)
+    assert indices_concluidos(db_path, segunda) == set(range(len(combinacoes_da_grade(GRADE))))
+    # Já concluídas: uma nova chamada não copia nada
+    assert reaproveitar_resultados(db_path, segunda, combinacoes_da_grade(GRADE)) == 0
+
+    # Grade maior: só as combinações novas são simuladas
+    maior = dict(GRADE, stops=[0.0, 1.5, 3.0])
+    terceira = _nova_execucao(db_path, maior)
+    assert processar_execucao(db_path, terceira)
+    assert avaliadas == [c for c in combinacoes_da_grade(maior) if c[1] == 3.0]
+    assert set(_resultados(db_path, primeira).items()) <= set(_resultados(db_path, terceira).items())
+
+
+def test_nao_reaproveita_com_parametros_fixos_diferentes(tmp_path, monkeypatch):
+    db_path = _banco(tmp_path)
+    primeira = _nova_execucao(db_path)
+    assert processar_execucao(db_path, primeira)
+
+    monkeypatch.setitem(otimizador.PARAMETROS_FIXOS, "taxa_corretagem", 0.2)
+    segunda = _nova_execucao(db_path)
+
+    assert carregar_execucao(db_path, segunda)["hash_dados"] != carregar_execucao(db_path, primeira)["hash_dados"]
+    assert reaproveitar_resultados(db_path, segunda, combinacoes_da_grade(GRADE)) == 0
+    assert indices_concluidos(db_path, segunda) == set()
@@ -0,0 +1,203 @@
+﻿import numpy as np
+import pandas as pd
+from backtest import preparar_pacote_indicadores
+from db_utils import listar_pares_disponiveis, listar_intervalos_disponiveis, carregar_candles
+from otimizador import GRADE_PADRAO, PARAMETROS_FIXOS, avaliar_combinacao, barras_aquecimento_indicadores, combinacoes_da_grade, mapear_com_pacote, perguntar_workers
+from datetime import datetime
+from armazenamento import conectar
+import time
+
+def inicializar_tabela_walk_forward(db_path):
+    """Cria a tabela com o resultado de cada janela do walk-forward."""
+    conn = conectar(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS walk_forward_janelas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data_execucao TEXT,
+            simbolo TEXT,
+            intervalo TEXT,
+            janela INTEGER,
+            treino_inicio TEXT,
+            treino_fim TEXT,
+            teste_inicio TEXT,
+            teste_fim TEXT,
+            distancia_banda REAL,
+            stop_loss REAL,
+            nota_minima INTEGER,
+            ema_periodo INTEGER,
+            lucro_minimo REAL,
+            lucro_treino REAL,
+            lucro_teste REAL,
+            trades_teste INTEGER,
+            win_rate_teste REAL,
+            saldo_acumulado REAL
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+def definir_janelas(timestamps, inicio, dias_treino, dias_teste):
+    """
+    Divide a série em janelas rolantes (treino, teste) pelo tempo.
+    Retorna uma lista de (a, b, c): treino = [a, b), teste = [b, c) em índices de candles.
+    A janela avança pelo tamanho do teste, então os testes são contíguos e não se sobrepõem.
+    """
+    ts = np.asarray(timestamps).astype("datetime64[ns]").view(np.int64)
+    n = len(ts)
+    treino = int(dias_treino * 86_400 * 1e9)
+    teste = int(dias_teste * 86_400 * 1e9)
+
+    janelas = []
+    a = inicio
+    while a < n:
+        b = int(np.searchsorted(ts, ts[a] + treino))
+        if b >= n:
+            break
+        c = int(np.searchsorted(ts, ts[b] + teste))
+        janelas.append((a, b, min(c, n)))
+        a = int(np.searchsorted(ts, ts[a] + teste))
+    return janelas
+
+def _processar_janela(pacote, tarefa):
+    """Otimiza a grade no treino [a, b) e avalia o vencedor (por lucro) no teste [b, c)."""
+    combinacoes, a, b, c = tarefa
+    melhor = None
+    for combinacao in combinacoes:
+        resultado = avaliar_combinacao(pacote, combinacao, inicio=a, fim=b)
+        # Só considera combinações que efetivamente operaram
+        if resultado[7] > 0 and (melhor is None or resultado[5] > melhor[5]):
+            melhor = resultado
+    if melhor is None:
+        return None, None
+    return melhor, avaliar_combinacao(pacote, melhor[:5], inicio=b, fim=c)
+
+def executar_walk_forward(db_path):
+    print("\n🚶 === WALK-FORWARD (TREINO/TESTE ROLANTE) ===")
+    print("Otimiza a grade em cada janela de treino e avalia o vencedor no período seguinte.\n")
+
+    # === 1. Seleção do Par e Intervalo ===
+    pares = listar_pares_disponiveis(db_path)
+    if not pares:
+        print("⚠️ Nenhum dado disponível.")
+        return
+
+    print("📊 Escolha o Par:")
+    for i, par in enumerate(pares, start=1):
+        print(f"{i} - {par}")
+
+    escolha_par = input("Opção: ").strip()
+    if not escolha_par.isdigit() or int(escolha_par) < 1 or int(escolha_par) > len(pares):
+        print("❌ Opção inválida.")
+        return
+    simbolo = pares[int(escolha_par) - 1]
+
+    intervalos = listar_intervalos_disponiveis(db_path, simbolo)
+    print("\n⏱ Escolha o Intervalo:")
+    for i, inter in enumerate(intervalos, start=1):
+        print(f"{i} - {inter}")
+
+    escolha_inter = input("Opção: ").strip()
+    if not escolha_inter.isdigit() or int(escolha_inter) < 1 or int(escolha_inter) > len(intervalos):
+        print("❌ Opção inválida.")
+        return
+    intervalo = intervalos[int(escolha_inter) - 1]
+
+    # === 2. Período e Janelas ===
+    print(f"\n📅 Período para {simbolo} - {intervalo}")
+    data_inicio = input("Data Inicial (YYYY-MM-DD HH:MM:SS) ou Enter para o início dos dados: ").strip() or "1970-01-01 00:00:00"
+    data_fim = input("Data Final (YYYY-MM-DD HH:MM:SS) ou Enter para Hoje: ").strip() or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    try:
+        dias_treino = float(input("Tamanho da janela de TREINO em dias (Enter = 90): ").strip() or 90)
+        dias_teste = float(input("Tamanho da janela de TESTE em dias (Enter = 30): ").strip() or 30)
+    except ValueError:
+        print("❌ Valor inválido.")
+        return
+    if dias_treino <= 0 or dias_teste <= 0:
+        print("❌ As janelas devem ter tamanho positivo.")
+        return
+
+    n_workers = perguntar_workers()
+
+    # === 3. Dados e Indicadores (uma única vez sobre a série inteira) ===
+    grade = dict(GRADE_PADRAO)
+    combinacoes = combinacoes_da_grade(grade)
+    aquecimento = barras_aquecimento_indicadores(grade["emas"])
+
+    print("\n⏳ Carregando candles na memória...")
+    # Os candles anteriores a data_inicio aquecem a Bollinger e a maior EMA: o primeiro treino começa
+    # em data_inicio (ou, no início do histórico, assim que os indicadores ficam válidos)
+    df_base = carregar_candles(db_path, simbolo, intervalo, data_inicio, data_fim, barras_aquecimento=aquecimento)
+    if len(df_base) <= df_base.attrs.get("barras_aquecimento", 0):
+        print("❌ Nenhum candle encontrado.")
+        return
+
+    print("🧮 Pré-calculando indicadores...")
+    pacote = preparar_pacote_indicadores(df_base.copy(), periodos_ema=[int(e) for e in grade["emas"]])
+
+    timestamps = pd.to_datetime(np.asarray(pacote["dados"]["timestamp"]))
+    janelas = definir_janelas(timestamps, aquecimento, dias_treino, dias_teste)
+    if not janelas:
+        print("⚠️ Período insuficiente para uma janela de treino + teste.")
+        return
+
+    print(f"🪟 {len(janelas)} janelas | {len(combinacoes)} combinações por treino | Processos: {n_workers}")
+    start_time = time.time()
+
+    # === 4. Janelas em paralelo (cada processo otimiza uma janela inteira) ===
+    tarefas = [(combinacoes, a, b, c) for a, b, c in janelas]
+    resultados = list(mapear_com_pacote(pacote, _processar_janela, tarefas, n_workers))
+
+    # === 5. Curva out-of-sample costurada ===
+    # A estratégia investe todo o saldo, então o resultado é proporcional ao saldo inicial
+    saldo_inicial = PARAMETROS_FIXOS["saldo_inicial"]
+    saldo = saldo_inicial
+    data_execucao = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    registros = []
+
+    def fmt(i):
+        return timestamps[min(i, len(timestamps) - 1)].strftime("%Y-%m-%d %H:%M")
+
+    print(f"\n{'#':<3} | {'Teste':<35} | {'Dist':<5} | {'Stop':<4} | {'Nota':<4} | {'EMA':<4} | {'Min%':<4} | {'Treino($)':<10} | {'Teste($)':<10} | {'Saldo OOS':<10}")
+    print("-" * 115)
+
+    for numero, ((a, b, c), (melhor, teste)) in enumerate(zip(janelas, resultados), start=1):
+        periodo_teste = f"{fmt(b)} → {fmt(c - 1)}"
+        if melhor is None:
+            print(f"{numero:<3} | {periodo_teste:<35} | sem trades no treino: fica fora do mercado")
+            continue
+
+        dist, stop, nota, ema, lucro_min, lucro_treino = melhor[:6]
+        lucro_teste, win_rate_teste, trades_teste = teste[5], teste[6], teste[7]
+        saldo *= 1 + lucro_teste / saldo_inicial
+
+        print(f"{numero:<3} | {periodo_teste:<35} | {dist:<5} | {stop:<4} | {nota:<4} | {ema:<4} | {lucro_min:<4.1f} | {lucro_treino:<10.2f} | {lucro_teste:<10.2f} | {saldo:<10.2f}")
+        registros.append((
+            data_execucao, simbolo, intervalo, numero,
+            fmt(a), fmt(b - 1), fmt(b), fmt(c - 1),
+            float(dist), stop, nota, int(ema), lucro_min,
+            lucro_treino, lucro_teste, trades_teste, win_rate_teste, saldo
+        ))
+
+    inicializar_tabela_walk_forward(db_path)
+    if registros:
+        conn = conectar(db_path)
+        conn.executemany("""
+            INSERT INTO walk_forward_janelas (
+                data_execucao, simbolo, intervalo, janela,
+                treino_inicio, treino_fim, teste_inicio, teste_fim,
+                distancia_banda, stop_loss, nota_minima, ema_periodo, lucro_minimo,
+                lucro_treino, lucro_teste, trades_teste, win_rate_teste, saldo_acumulado
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, registros)
+        conn.commit()
+        conn.close()
+
+    tempo_total = time.time() - start_time
+    lucro_total = saldo - saldo_inicial
+    print("\n" + "=" * 50)
+    print(f"📈 Equity OUT-OF-SAMPLE: $ {saldo_inicial:.2f} → $ {saldo:.2f} ({lucro_total / saldo_inicial * 100:.2f}%)")
+    print(f"⏱️  Finalizado em {tempo_total:.2f} segundos.")
+    print("💾 Janelas salvas na tabela 'walk_forward_janelas'.")
+    input("\nPressione Enter para voltar ao menu...")